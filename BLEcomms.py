@@ -2,6 +2,9 @@ import asyncio
 import os
 from bleak import BleakClient
 from datetime import datetime
+import metrics
+from capture import CapturePipeline, SessionWriter
+from ackpolicy import AckPolicy
 
 # BLE Device Address
 DEVICE_ADDRESS = "C9:6D:69:38:E7:03"
@@ -10,6 +13,17 @@ DEVICE_ADDRESS = "C9:6D:69:38:E7:03"
 WRITE_CHAR_UUID = "6e400002-b5a3-f393-e0a9-e50e24dcca9e"
 READ_CHAR_UUID = "6e400003-b5a3-f393-e0a9-e50e24dcca9e"
 
+# ACK strategy while recording: "every" (one per reading), "every_n",
+# "window" (at most one per ACK_WINDOW seconds) or "coalesce" (one in flight).
+# The firmware may expect one ACK per reading, so anything but "every" is opt-in
+ACK_MODE = "every"
+ACK_EVERY_N = 10
+ACK_WINDOW = 0.1  # Seconds
+
+# Per-stage timings and counters, exported to metrics_blecomms.prom; see metrics.py
+METRICS = False
+stages = metrics.setup("blecomms", enabled=METRICS)
+
 # Folder path for saving files
 FOLDER_PATH = r"C:\Users\User\Documents\RobotRead"  # Update this to your folder path
 
@@ -18,38 +32,28 @@ if not os.path.exists(FOLDER_PATH):
     os.makedirs(FOLDER_PATH)
 
 # Global variables for managing readings
-readings = []
+pipeline = None  # Capture pipeline of the current recording session
+ack_policy = None  # Decides when readings are acknowledged
 is_recording = False
 
+ACK_MESSAGE = b'ACK\n'
+
 async def send_ack(client):
     """Send acknowledgment to the device"""
     try:
-        ack_message = b'ACK\n'
-        await client.write_gatt_char(WRITE_CHAR_UUID, ack_message)
+        await client.write_gatt_char(WRITE_CHAR_UUID, ACK_MESSAGE)
     except Exception as e:
         print(f"Failed to send ACK: {e}")
 
 # Callback to handle incoming notifications
 def notification_handler(sender, data, client):
-    global readings, is_recording
+    # Runs on the event loop: only hand the raw frame to the capture pipeline,
+    # which timestamps, formats and writes it off the loop
     try:
-        message = data.decode('utf-8').strip()
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
-        formatted_message = f"{timestamp}: {message}"
-        #print(f"\n[BLE Received] {formatted_message}", end="\n> ")
-        
         if is_recording:
-            readings.append(formatted_message)
-            #print(f"[Recording] {formatted_message}")
-            # Send acknowledgment after receiving data in recording mode
-            
-            asyncio.create_task(send_ack(client))  # Instead of sender.client
-
-        
-        if len(readings) >= 5:
-            save_to_file()
-            readings = []
-            print(f"Saved 5 readings to {get_filename()}")
+            pipeline.submit(data)
+            # Acknowledge according to ACK_MODE (may be coalesced with other readings)
+            ack_policy.on_reading()
     except Exception as e:
         print(f"Error processing notification: {e}")
 
@@ -62,16 +66,19 @@ async def listen_for_notifications(client):
 
 async def send_messages(client):
     """ Handles user input without blocking BLE listening. """
-    global is_recording
+    global is_recording, pipeline, ack_policy
     while True:
         user_input = await asyncio.to_thread(input, "> Type 'start' to begin recording or 'stop' to stop: ")
         if user_input.lower() == "exit":
             break
         elif user_input.lower() == "start":
-            # Start recording and reset the readings list
+            # Start recording into a new session
             if not is_recording:
+                # New session file, appended to in batches by the writer
+                pipeline = start_session()
+                ack_policy = AckPolicy(lambda: client.write_gatt_char(WRITE_CHAR_UUID, ACK_MESSAGE),
+                                       mode=ACK_MODE, every_n=ACK_EVERY_N, window=ACK_WINDOW)
                 is_recording = True
-                readings = []  # Clear any previous data
                 # Send initial START acknowledgment
                 await send_ack(client)
                 print("Recording started!")
@@ -79,25 +86,22 @@ async def send_messages(client):
             # Stop recording
             if is_recording:
                 is_recording = False
+                await ack_policy.close()
                 # Send final STOP acknowledgment
                 await send_ack(client)
-                await save_to_file()
-                print("Recording stopped and saved.")
+                await pipeline.stop()
+                print(f"Recording stopped and saved to {pipeline.writer.file_path}.")
+                print(f"[Capture] {pipeline.stats()}")
+                print(f"[ACK] {ack_policy.stats()}")
         else:
             print("Invalid command. Type 'start' to record or 'stop' to stop.")
 
-async def save_to_file():
-    try:
-        filename = get_filename()
-        file_path = os.path.join(FOLDER_PATH, filename)
-        with open(file_path, "w") as file:
-            file.write(f"Recording Session: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            file.write("-" * 50 + "\n")
-            for reading in readings:
-                file.write(f"{reading}\n")
-        print(f"Successfully saved readings to {filename}")
-    except Exception as e:
-        print(f"Error saving to file: {e}")
+def start_session():
+    """Starts a capture pipeline writing to a new session file."""
+    file_path = os.path.join(FOLDER_PATH, get_filename())
+    header = (f"Recording Session: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+              + "-" * 50 + "\n")
+    return CapturePipeline(SessionWriter(file_path, header=header)).start()
 
 async def ble_read_write():
     max_retries = 3
@@ -121,9 +125,12 @@ async def ble_read_write():
                     finally:
                         listen_task.cancel()
                         await client.stop_notify(READ_CHAR_UUID)
+                        if pipeline is not None:
+                            await pipeline.stop()
                     break
         except Exception as e:
             retry_count += 1
+            stages.count("connect_failures")
             print(f"Connection failed: {e}")
             if retry_count < max_retries:
                 print(f"Retrying in 5 seconds...")
@@ -137,5 +144,10 @@ def get_filename():
     current_time = datetime.now()
     return f"reading_{current_time.strftime('%y%m%d_%H%M')}.txt"
 
-asyncio.run(ble_read_write())
+try:
+    asyncio.run(ble_read_write())
+finally:
+    stages.close()
+    if stages.enabled:
+        print(stages.summary())
 
@@ -1,5 +1,11 @@
 import asyncio
+import sys
 from bleak import BleakScanner, BleakClient
+from acquisition import DeviceRegistry
+
+# Cached scan and service results; pass --rescan to ignore them
+registry = DeviceRegistry()
+RESCAN = "--rescan" in sys.argv
 
 async def scan_devices():
     """ Scans for nearby BLE devices and prints their addresses and names. """
@@ -7,29 +13,42 @@ async def scan_devices():
     devices = await BleakScanner.discover()
     for device in devices:
         print(f"Found device: {device.name} - {device.address}")
+    registry.record_scan(devices)
+    registry.save()
     return devices
 
+def print_services(device_address, services):
+    for service_uuid, characteristics in services.items():
+        print(f"Service: {service_uuid}")
+        for char_uuid, properties in characteristics.items():
+            print(f"  ├── Characteristic: {char_uuid} (Properties: {properties})")
+
 async def get_services(device_address):
     """ Fetches and prints the services and characteristics of the connected BLE device. """
     async with BleakClient(device_address) as client:
-        services = await client.get_services()
         print(f"\nConnected to {device_address}")
-        for service in services:
-            print(f"Service: {service.uuid}")
-            for char in service.characteristics:
-                print(f"  ├── Characteristic: {char.uuid} (Properties: {char.properties})")
+        registry.record_services(device_address, client.services)
+        registry.save()
+        print_services(device_address, registry.services(device_address))
 
 async def main():
-    # Step 1: Scan for devices and get their addresses
+    # Step 1: Choose the device address (you can modify this to pick a specific device or use its name)
+    device_address = "C9:6D:69:38:E7:03"
+
+    # Services don't change between runs, so reuse the cached ones when we have them
+    cached = registry.services(device_address)
+    if cached and not RESCAN:
+        print(f"[Cached services for {device_address}] (run with --rescan to refresh)")
+        print_services(device_address, cached)
+        return
+
+    # Step 2: Scan for devices and get their addresses
     devices = await scan_devices()
-    
+
     if not devices:
         print("[Error] No devices found.")
         return
 
-    # Step 2: Choose the device address (you can modify this to pick a specific device or use its name)
-    # For now, let's pick the first available device from the scan
-    device_address = "C9:6D:69:38:E7:03"
     print(f"Connecting to {device_address}...\n")
 
     # Step 3: Fetch services and characteristics of the chosen device
@@ -1,53 +1,174 @@
 import os
+import sys
 import csv
+import json
+import time
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from frameparser import RecordParser
 
-# Folder containing the files
+# Folder containing the files (searched recursively); pass one or more folders
+# on the command line to convert other campaigns
 folder_path = r"C:\Users\User\Documents\RobotRead\JashData1103\Isoprop15"
 
 # Required sensor names
 required_sensors = ["BME688", "SGPVRaw", "SGPNRaw", "SGPVin", "SGPNin", "STCCO2", "ENSVoc",
                     "MiCO", "MiNO2", "MiNH3", "GMVOC", "GNH2S", "GMSMO", "GMETH", "GMWIN"]
 
-# Process all .txt files in the folder
-for file_name in os.listdir(folder_path):
-    if file_name.endswith(".txt"):
-        txt_file_path = os.path.join(folder_path, file_name)
-        csv_file_path = os.path.splitext(txt_file_path)[0] + ".csv"  # Change extension to .csv
+# Shared line parser; sensor positions are resolved once instead of a dict per row
+parser = RecordParser(required_sensors)
 
-        # Check if CSV already exists
-        if os.path.exists(csv_file_path):
-            print(f"Skipping {file_name}, CSV already exists.")
-            continue
+# Per-folder record of converted files (size, mtime, content hash)
+MANIFEST_NAME = ".csvprocess_manifest.json"
 
-        cleaned_data = []
+# Worker processes (None = one per CPU)
+MAX_WORKERS = None
 
-        # Read and process the text file
-        with open(txt_file_path, "r") as file:
-            for line in file:
-                line = line.strip()
-                if not line:
-                    continue
 
-                data_dict = {sensor: "" for sensor in required_sensors}  # Initialize empty values
-                key_value_pairs = line.split(";")
+def parse_line(line):
+    """Returns the sensor values of one raw line as a list in required_sensors
+    order ("" for missing sensors), or None if it has no known sensor."""
+    row = [""] * len(required_sensors)
+    if parser.split_into(line, row) == 0:
+        return None  # Only store known sensors
+    return row
 
-                for pair in key_value_pairs:
-                    if ":" in pair:
-                        key, value = pair.split(":")
-                        if key in data_dict:  # Only store known sensors
-                            data_dict[key] = value.strip()
 
-                cleaned_data.append(data_dict)
+def convert_file(txt_file_path):
+    """Converts one .txt session to .csv. Returns (path, rows, dropped, sha1),
+    `dropped` being the non-empty lines with no known sensor."""
+    with open(txt_file_path, "rb") as file:
+        content = file.read()
+    digest = hashlib.sha1(content).hexdigest()
 
-        # If no valid data, skip file
-        if not cleaned_data:
-            print(f"Skipping {file_name}, no valid data found.")
+    cleaned_data = []
+    dropped = 0
+    for line in content.splitlines():
+        if not line.strip():
             continue
+        row = parse_line(line)
+        if row is None:
+            dropped += 1
+        else:
+            cleaned_data.append(row)
+
+    # If no valid data, skip file
+    if not cleaned_data:
+        return txt_file_path, 0, dropped, digest
+
+    # Write to a temporary file first so an interrupted run never leaves a partial CSV
+    csv_file_path = os.path.splitext(txt_file_path)[0] + ".csv"  # Change extension to .csv
+    tmp_path = csv_file_path + ".tmp"
+    with open(tmp_path, "w", newline="") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(required_sensors)
+        writer.writerows(cleaned_data)
+    os.replace(tmp_path, csv_file_path)
+    return txt_file_path, len(cleaned_data), dropped, digest
+
+
+def file_hash(path):
+    with open(path, "rb") as file:
+        return hashlib.sha1(file.read()).hexdigest()
+
+
+def load_manifest(root):
+    try:
+        with open(os.path.join(root, MANIFEST_NAME)) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(root, manifest):
+    path = os.path.join(root, MANIFEST_NAME)
+    with open(path + ".tmp", "w") as file:
+        json.dump(manifest, file, indent=1, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def find_work(root, manifest):
+    """Returns (todo, unchanged): the .txt files under `root` that are new or
+    changed since the last run, and how many are not. Manifest entries of
+    files no longer on disk are removed."""
+    todo = []
+    seen = set()
+    for directory, _, file_names in os.walk(root):
+        for file_name in file_names:
+            if not file_name.endswith(".txt"):
+                continue
+            txt_file_path = os.path.join(directory, file_name)
+            csv_file_path = os.path.splitext(txt_file_path)[0] + ".csv"
+            key = os.path.relpath(txt_file_path, root)
+            seen.add(key)
+            stat = os.stat(txt_file_path)
+            entry = manifest.get(key)
+
+            if entry is None and os.path.exists(csv_file_path) \
+                    and os.stat(csv_file_path).st_mtime_ns >= stat.st_mtime_ns:
+                # Converted before the manifest existed and not modified since
+                entry = manifest[key] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+                                         "sha1": file_hash(txt_file_path), "rows": None}
+            if entry is not None and (entry["rows"] == 0 or os.path.exists(csv_file_path)):
+                if entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+                    continue
+                # Touched but possibly unchanged: compare content before reconverting
+                if entry["size"] == stat.st_size and entry["sha1"] == file_hash(txt_file_path):
+                    entry["mtime_ns"] = stat.st_mtime_ns
+                    continue
+            todo.append((key, txt_file_path, stat))
+    for key in set(manifest) - seen:
+        del manifest[key]  # Deleted or moved since the last run
+    return todo, len(seen) - len(todo)
+
+
+def process_folder(root, executor):
+    """Converts the new and changed files under `root`. Returns (converted,
+    unchanged, failed, rows, dropped lines). A file that fails is reported
+    and left out of the manifest, so the next run retries it."""
+    manifest = load_manifest(root)
+    todo, unchanged = find_work(root, manifest)
+    converted = failed = total_rows = total_dropped = 0
+    futures = {executor.submit(convert_file, txt_file_path): (key, stat) for key, txt_file_path, stat in todo}
+    try:
+        for future in as_completed(futures):
+            key, stat = futures[future]
+            try:
+                _, rows, dropped, digest = future.result()
+            except Exception as e:
+                failed += 1
+                manifest.pop(key, None)
+                print(f"Failed to convert {key}: {e}")
+                continue
+            manifest[key] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha1": digest, "rows": rows}
+            converted += 1
+            total_rows += rows
+            total_dropped += dropped
+            note = f", {dropped} lines without a known sensor dropped" if dropped else ""
+            if rows:
+                print(f"Processed {key} -> {os.path.splitext(key)[0]}.csv ({rows} rows{note})")
+            else:
+                print(f"Skipping {key}, no valid data found{note}.")
+    finally:
+        # Keep what was converted even if the run is interrupted
+        save_manifest(root, manifest)
+    return converted, unchanged, failed, total_rows, total_dropped
 
-        # Write to CSV
-        with open(csv_file_path, "w", newline="") as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=required_sensors)
-            writer.writeheader()
-            writer.writerows(cleaned_data)
 
-        print(f"Processed {file_name} -> {csv_file_path}")
+if __name__ == "__main__":
+    roots = sys.argv[1:] or [folder_path]
+    start = time.perf_counter()
+    n_files = n_skipped = n_failed = n_rows = n_dropped = 0
+    with ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        for root in roots:
+            files, skipped, failed, rows, dropped = process_folder(root, executor)
+            n_files += files
+            n_skipped += skipped
+            n_failed += failed
+            n_rows += rows
+            n_dropped += dropped
+    elapsed = time.perf_counter() - start
+    print(f"\nConverted {n_files} files ({n_rows} rows), {n_skipped} unchanged, {n_failed} failed, in {elapsed:.2f}s: "
+          f"{n_files / elapsed:.1f} files/s, {n_rows / elapsed:.0f} rows/s")
+    if n_dropped:
+        print(f"Dropped {n_dropped} lines without a known sensor")
@@ -2,6 +2,8 @@ import asyncio
 import os
 from bleak import BleakClient
 from datetime import datetime
+import metrics
+from capture import CapturePipeline, FragmentFramer, SessionWriter
 
 # BLE Device Address
 DEVICE_ADDRESS = "C9:6D:69:38:E7:03"
@@ -16,55 +18,43 @@ SAVE_FILENAME = "BLE_Readings.txt"
 FILE_PATH = os.path.join(SAVE_FOLDER, SAVE_FILENAME)
 
 # Data storage
-received_data = []
-full_messages = []
 MAX_MESSAGES = 30  # Save exactly 30 messages per file
-collecting_data = False  # Flag to track if we should collect messages
+pipeline = None  # Capture pipeline of the current collection, None when not collecting
+
+# Per-stage timings and counters, exported to metrics_save_data.prom; see metrics.py
+METRICS = False
+stages = metrics.setup("save_data", enabled=METRICS)
 
 # Ensure folder exists
 os.makedirs(SAVE_FOLDER, exist_ok=True)
 
 def notification_handler(sender, data):
-    """Handles BLE notifications and stores data only when collecting_data is True."""
-    global received_data, full_messages, collecting_data
-
-    if not collecting_data:
+    """Handles BLE notifications and queues them only while collecting."""
+    if pipeline is None or pipeline.done.is_set():
         return  # Ignore messages when not in collection mode
 
-    text = data.decode("utf-8")  # Convert bytes to string
-    received_data.append(text)  # Store fragment
-
-    # Detect full message (assuming newline "\n" or known ending like ";GMWIN:")
-    if "\n" in text or text.endswith(";GMWIN:"):
-        full_message = "".join(received_data).strip()
-        full_messages.append(full_message)
-        
-        # Show the current count
-        print(f"\n📥 Message {len(full_messages)} received: {full_message}\n> ")
-
-        received_data.clear()  # Reset buffer
-
-        # If 30 messages are stored, write to file and stop collecting
-        if len(full_messages) >= MAX_MESSAGES:
-            save_to_file()
-            full_messages.clear()  # Reset buffer after saving
-            collecting_data = False  # Stop collecting until "save" is typed again
-
-def save_to_file():
-    """Saves exactly 30 readings to a file and stops data collection."""
-    if len(full_messages) < MAX_MESSAGES:
-        print("\n⚠️ Not enough messages collected yet (need 30).\n")
-        return
+    # Fragments are joined into messages and written by the pipeline's writer,
+    # never on the event loop
+    pipeline.submit(data)
 
+def start_collection():
+    """Collects the next 30 messages into a new file, then stops by itself."""
     timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
     file_name = f"BLE_Readings_{timestamp}.txt"
     file_path = os.path.join(SAVE_FOLDER, file_name)
-
-    with open(file_path, "w", encoding="utf-8") as file:
-        for msg in full_messages:
-            file.write(msg + "\n")
-
-    print(f"\n✅ Data saved to: {file_path}\n")
+    writer = SessionWriter(file_path, timestamps=False, verbose=True)
+    return CapturePipeline(writer, framer=FragmentFramer(), max_records=MAX_MESSAGES).start()
+
+async def report_when_saved(collection):
+    """Prints where the messages went once the collection has finished."""
+    await collection.done.wait()
+    await collection.stop()
+    if collection.records_written >= MAX_MESSAGES:
+        print(f"\n✅ Data saved to: {collection.writer.file_path}\n")
+    else:
+        print(f"\n⚠️ Only {collection.records_written} of {MAX_MESSAGES} messages saved to: "
+              f"{collection.writer.file_path}\n")
+    print(f"[Capture] {collection.stats()}\n> ")
 
 async def receive_notifications(client):
     """ Continuously listens for BLE notifications. """
@@ -78,7 +68,7 @@ async def receive_notifications(client):
 
 async def send_commands(client):
     """Allows user to send messages while notifications are running."""
-    global collecting_data
+    global pipeline
 
     while True:
         user_input = await asyncio.to_thread(input, "> Type message (or 'exit' to quit, 'save' to start saving): ")
@@ -86,9 +76,10 @@ async def send_commands(client):
         if user_input.lower() == "exit":
             break
         elif user_input.lower() == "save":
-            if not collecting_data:
+            if pipeline is None or pipeline.done.is_set():
                 print("\n📡 Now collecting the next 30 messages...\n")
-                collecting_data = True  # Start collecting data
+                pipeline = start_collection()  # Start collecting data
+                asyncio.create_task(report_when_saved(pipeline))
             else:
                 print("\n⚠️ Already collecting data! Waiting for 30 messages...\n")
         else:
@@ -110,5 +101,12 @@ async def ble_read_write():
             # Stop notifications before disconnecting
             await client.stop_notify(READ_CHAR_UUID)
             receive_task.cancel()  # Stop the receive loop
-
-asyncio.run(ble_read_write())
+            if pipeline is not None:
+                await pipeline.stop()  # Write whatever was collected
+
+try:
+    asyncio.run(ble_read_write())
+finally:
+    stages.close()
+    if stages.enabled:
+        print(stages.summary())
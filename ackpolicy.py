@@ -0,0 +1,115 @@
+import asyncio
+import collections
+import time
+
+ACK_MODES = ("every", "every_n", "window", "coalesce")
+
+
+class AckPolicy:
+    """Decides when to acknowledge readings and tracks how the ACK writes go.
+
+    Modes:
+      "every"    one ACK per reading (the original behaviour)
+      "every_n"  one ACK per `every_n` readings
+      "window"   at most one ACK per `window` seconds; readings inside the
+                 window are covered by an ACK sent when it closes
+      "coalesce" a single ACK in flight; readings that arrive meanwhile are
+                 covered by one more ACK sent when it completes
+
+    on_reading() is called from the notification callback and never awaits.
+    `send` is an async callable doing the GATT write; its latency is recorded
+    as the ACK round-trip time and exceptions are counted as failures.
+    """
+
+    def __init__(self, send, mode="every", every_n=10, window=0.1, latency_samples=1024):
+        if mode not in ACK_MODES:
+            raise ValueError(f"Unknown ACK mode {mode!r}, expected one of {ACK_MODES}")
+        self.send = send
+        self.mode = mode
+        self.every_n = every_n
+        self.window = window
+
+        # Counters
+        self.readings = 0
+        self.acks_sent = 0
+        self.acks_failed = 0
+        self.readings_coalesced = 0
+        self.latencies = collections.deque(maxlen=latency_samples)
+        self.max_latency = 0.0
+
+        self._in_flight = 0
+        self._pending = 0  # Readings not yet covered by an ACK
+        self._last_sent = 0.0
+        self._timer = None
+        self._tasks = set()
+
+    def on_reading(self):
+        """Registers one reading and schedules an ACK if the mode calls for one."""
+        self.readings += 1
+        self._pending += 1
+        if self.mode == "every":
+            self._schedule()
+        elif self.mode == "every_n":
+            if self._pending >= self.every_n:
+                self._schedule()
+        elif self.mode == "window":
+            remaining = self._last_sent + self.window - time.monotonic()
+            if remaining <= 0:
+                self._schedule()
+            elif self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(remaining, self._window_closed)
+        elif self._in_flight == 0:
+            self._schedule()
+
+    def _window_closed(self):
+        self._timer = None
+        if self._pending:
+            self._schedule()
+
+    def _schedule(self):
+        self.readings_coalesced += self._pending - 1
+        self._pending = 0
+        self._in_flight += 1
+        self._last_sent = time.monotonic()
+        task = asyncio.create_task(self._send())
+        # Keep a reference so the task isn't garbage collected mid-write
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self):
+        start = time.monotonic()
+        try:
+            await self.send()
+        except Exception:
+            self.acks_failed += 1
+        else:
+            latency = time.monotonic() - start
+            self.acks_sent += 1
+            self.latencies.append(latency)
+            self.max_latency = max(self.max_latency, latency)
+        finally:
+            self._in_flight -= 1
+        if self.mode == "coalesce" and self._pending:
+            self._schedule()
+
+    async def close(self):
+        """Acknowledges any uncovered readings and waits for in-flight ACKs."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._pending and not (self.mode == "coalesce" and self._in_flight):
+            self._schedule()
+        while self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def latency_percentile(self, q):
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+    def stats(self):
+        return (f"ACK mode {self.mode}: {self.readings} readings, {self.acks_sent} ACKs sent, "
+                f"{self.acks_failed} failed, {self.readings_coalesced} readings coalesced, "
+                f"RTT p50 {self.latency_percentile(50) * 1e3:.1f} ms / "
+                f"p99 {self.latency_percentile(99) * 1e3:.1f} ms / max {self.max_latency * 1e3:.1f} ms")
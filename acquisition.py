@@ -0,0 +1,231 @@
+import asyncio
+import json
+import os
+import random
+import time
+from bleak import BleakClient, BleakScanner
+import metrics
+from ackpolicy import ACK_MODES, AckPolicy
+
+# Nordic UART service characteristics used by the sensor arrays
+WRITE_CHAR_UUID = "6e400002-b5a3-f393-e0a9-e50e24dcca9e"
+READ_CHAR_UUID = "6e400003-b5a3-f393-e0a9-e50e24dcca9e"
+ACK_MESSAGE = b'ACK\n'
+
+# Cached scan/service results shared by BLEdetection.py and the acquisition engine
+REGISTRY_PATH = "ble_devices.json"
+
+
+class DeviceRegistry:
+    """Small JSON cache of discovered devices and their services, so devices
+    and characteristics don't have to be rediscovered on every run."""
+
+    def __init__(self, path=REGISTRY_PATH):
+        self.path = path
+        try:
+            with open(path) as file:
+                self.devices = json.load(file)
+        except (OSError, ValueError):
+            self.devices = {}
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(self.devices, file, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def get(self, address):
+        return self.devices.get(address.upper())
+
+    def record_scan(self, devices):
+        now = time.time()
+        for device in devices:
+            entry = self.devices.setdefault(device.address.upper(), {})
+            entry["name"] = device.name
+            entry["last_seen"] = now
+
+    def record_services(self, address, services):
+        """Stores {service uuid: {characteristic uuid: [properties]}} for a device."""
+        entry = self.devices.setdefault(address.upper(), {})
+        entry["services"] = {
+            service.uuid: {char.uuid: list(char.properties) for char in service.characteristics}
+            for service in services
+        }
+        entry["services_updated"] = time.time()
+
+    def services(self, address):
+        entry = self.get(address)
+        return entry.get("services") if entry else None
+
+    def find_characteristic(self, address, prop, default):
+        """`default` (the known UUID) if the device has it or nothing is
+        cached; otherwise the first cached characteristic with property `prop`
+        (e.g. "notify"). Devices often expose other notify/write
+        characteristics, e.g. battery or DFU, before the UART ones."""
+        services = self.services(address)
+        if not services:
+            return default
+        wanted = default.lower()
+        if any(uuid.lower() == wanted for characteristics in services.values() for uuid in characteristics):
+            return default
+        for characteristics in services.values():
+            for uuid, properties in characteristics.items():
+                if prop in properties:
+                    return uuid
+        return default
+
+
+def backoff_delays(initial=1.0, maximum=60.0, factor=2.0, jitter=0.2):
+    """Exponential backoff with jitter: 1, 2, 4, ... seconds, capped at `maximum`."""
+    delay = initial
+    while True:
+        yield delay * random.uniform(1 - jitter, 1 + jitter)
+        delay = min(delay * factor, maximum)
+
+
+async def scan(registry=None, timeout=5.0):
+    """Scans for nearby devices and records them in the registry."""
+    devices = await BleakScanner.discover(timeout=timeout)
+    if registry is not None:
+        registry.record_scan(devices)
+        registry.save()
+    return devices
+
+
+class DeviceStats:
+    def __init__(self, address):
+        self.address = address
+        self.connects = 0
+        self.reconnects = 0
+        self.failures = 0
+        self.frames = 0
+        self.connected = False
+        self.last_error = None
+
+    def __str__(self):
+        state = "connected" if self.connected else "disconnected"
+        return (f"{self.address}: {state}, {self.frames} frames, {self.connects} connects, "
+                f"{self.reconnects} reconnects, {self.failures} failures"
+                + (f" (last error: {self.last_error})" if self.last_error else ""))
+
+
+class AcquisitionEngine:
+    """Connects to several sensor arrays concurrently from one event loop.
+
+    Each device runs its own connect/notify loop and reconnects with
+    exponential backoff whenever the link drops or a connect fails. Raw
+    notifications go to `pipeline.submit(data, source=address)`; with a
+    capture.DeviceFramer the pipeline keeps a reassembly buffer per device and
+    writes one merged, device-tagged stream. Characteristic UUIDs come from the
+    DeviceRegistry when cached and are recorded after the first connection.
+    With `ack_mode`, each device gets its own AckPolicy with `ack_every_n`
+    and `ack_window`; `ack_devices` ({address: {"mode", "every_n",
+    "window"}}) overrides any of them for one device.
+    """
+
+    def __init__(self, addresses, pipeline, registry=None, connect_timeout=20.0,
+                 ack_mode=None, max_backoff=60.0, ack_every_n=10, ack_window=0.1, ack_devices=None):
+        self.addresses = [address.upper() for address in addresses]
+        self.pipeline = pipeline
+        self.registry = registry or DeviceRegistry()
+        self.connect_timeout = connect_timeout
+        self.ack_mode = ack_mode
+        self.ack_every_n = ack_every_n
+        self.ack_window = ack_window
+        self.ack_devices = {address.upper(): settings for address, settings in (ack_devices or {}).items()}
+        self.max_backoff = max_backoff
+        for address in self.addresses:
+            # Checked here rather than failing every connect of the device
+            mode = self.ack_settings(address)["mode"]
+            if mode and mode not in ACK_MODES:
+                raise ValueError(f"Unknown ACK mode {mode!r} for {address}, expected one of {ACK_MODES}")
+        self.stats = {address: DeviceStats(address) for address in self.addresses}
+        self.ack_policies = {}
+        self.metrics = metrics.get()
+        self._stopping = asyncio.Event()
+
+    async def run(self):
+        """Runs until stop() is called."""
+        await asyncio.gather(*(self._device_loop(address) for address in self.addresses))
+
+    def stop(self):
+        self._stopping.set()
+
+    async def _device_loop(self, address):
+        stats = self.stats[address]
+        delays = backoff_delays(maximum=self.max_backoff)
+        while not self._stopping.is_set():
+            connects = stats.connects
+            try:
+                await self._session(address, stats)
+                delays = backoff_delays(maximum=self.max_backoff)  # Clean disconnect, start over
+            except Exception as e:
+                stats.failures += 1
+                stats.last_error = str(e) or type(e).__name__
+                self.metrics.count("connect_failures")
+            if self._stopping.is_set():
+                break
+            delay = next(delays)
+            if stats.connects > connects:
+                # Only a session that actually connected can be reconnected
+                stats.reconnects += 1
+                self.metrics.count("reconnects")
+                print(f"[{address}] Disconnected, reconnecting in {delay:.1f}s")
+            else:
+                print(f"[{address}] Connect failed, retrying in {delay:.1f}s")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def ack_settings(self, address):
+        """AckPolicy mode, every_n and window for a device (mode None: no ACKs)."""
+        settings = {"mode": self.ack_mode, "every_n": self.ack_every_n, "window": self.ack_window}
+        settings.update(self.ack_devices.get(address.upper(), {}))
+        return settings
+
+    async def _session(self, address, stats):
+        disconnected = asyncio.Event()
+        read_uuid = self.registry.find_characteristic(address, "notify", READ_CHAR_UUID)
+        write_uuid = self.registry.find_characteristic(address, "write", WRITE_CHAR_UUID)
+
+        client = BleakClient(address, timeout=self.connect_timeout,
+                             disconnected_callback=lambda _: disconnected.set())
+        await client.connect()
+        try:
+            stats.connects += 1
+            stats.connected = True
+            self.metrics.count("connects")
+            print(f"[{address}] Connected")
+            if self.registry.services(address) is None:
+                self.registry.record_services(address, client.services)
+                self.registry.save()
+
+            ack = None
+            ack_settings = self.ack_settings(address)
+            if ack_settings["mode"]:
+                ack = self.ack_policies[address] = AckPolicy(
+                    lambda: client.write_gatt_char(write_uuid, ACK_MESSAGE), **ack_settings)
+
+            def handler(sender, data):
+                # Only enqueue; reassembly and writing happen in the pipeline
+                stats.frames += 1
+                self.pipeline.submit(data, source=address)
+                if ack is not None:
+                    ack.on_reading()
+
+            await client.start_notify(read_uuid, handler)
+            stopping = asyncio.create_task(self._stopping.wait())
+            lost = asyncio.create_task(disconnected.wait())
+            await asyncio.wait([stopping, lost], return_when=asyncio.FIRST_COMPLETED)
+            stopping.cancel()
+            lost.cancel()
+            if ack is not None:
+                await ack.close()
+        finally:
+            stats.connected = False
+            if client.is_connected:
+                await client.disconnect()
+
+    def summary(self):
+        return "\n".join(str(stats) for stats in self.stats.values())
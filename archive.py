@@ -0,0 +1,664 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import sqlite3
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from dataset import LABEL_COLUMN, compact_dtype, load_config, save_dataset
+from frameparser import DATA_PREFIX, RecordParser
+from sensors import FEATURE_COLUMNS, LABELS, SENSOR_ALIASES
+
+# Ingest-once archive of captured sessions. Every capture layout is parsed
+# once into chunked columnar storage (one .npy per sensor column per chunk,
+# memory-mappable, compact dtypes) with a sqlite index of where each session
+# came from and what it holds:
+#
+#   archive/index.sqlite   sources -> sessions (device, label, time range,
+#                          sensor schema) -> segments (row ranges of chunks)
+#   archive/chunks/<id>/   <column>.npy for the chunk's schema + Timestamp.npy
+#
+# Layouts read:
+#   reading_YYMMDD_HHMM.txt          BLEcomms.py (one session per "Recording
+#                                    Session" header; later sessions in the
+#                                    same minute are appended to the file)
+#   multi_reading_YYMMDD_HHMMSS.txt  multi_capture.py (one session per device)
+#   BLE_Readings_<timestamp>.txt     Save_data.py (no per-reading timestamps)
+#   *.csv                            CSVprocess.py output, collectResult.py
+#                                    latest_*.csv (and rotated segments),
+#                                    combined CSVs with a Label column
+#
+# Files are re-read only if they changed, or if --label/--device differ from
+# what they were ingested with; a re-read file replaces its earlier sessions
+# (keeping the label and device it was ingested with unless new ones are
+# given). --label and --device only fill in what a file doesn't record: the
+# device tags of multi_capture.py files and the Label column of combined CSVs
+# win. A file with the same content as one already read is indexed without
+# sessions, and read after all if that one is later changed.
+# Times are local wall-clock times, as the capture scripts write them.
+#
+#   python archive.py ingest D:\RobotRead\Ethanol --label Ethanol --device C9:6D:69:38:E7:03
+#   python archive.py sessions --label ethanol --since 2025-03-01
+#   python archive.py export latest_dataset --since 2025-03-01 --until 2025-04-01
+
+ARCHIVE_PATH = "archive"
+INDEX_FILENAME = "index.sqlite"
+CHUNKS_DIRNAME = "chunks"
+FORMAT_VERSION = 1
+
+# Rows per chunk; small sessions ingested together share a chunk
+CHUNK_ROWS = 100_000
+
+# Per-reading capture time, NaT where the layout has none
+TIMESTAMP_COLUMN = "Timestamp"
+
+# Class names for CSVs with a numeric Label column, and for recognising the
+# per-class files listed there (collectResult.py output)
+CONFIG_PATH = "dataset.json"
+
+# Session start taken from the file name when the readings carry no timestamps
+FILENAME_TIMES = [
+    (re.compile(r"^multi_reading_(\d{6}_\d{6})"), "%y%m%d_%H%M%S"),
+    (re.compile(r"^reading_(\d{6}_\d{4})"), "%y%m%d_%H%M"),
+    (re.compile(r"^BLE_Readings_(\d{4}-\d\d-\d\d_\d\d-\d\d-\d\d)"), "%Y-%m-%d_%H-%M-%S"),
+    (re.compile(r"_(\d{8}_\d{6})(?:_\d+)?$"), "%Y%m%d_%H%M%S"),  # CSVRecordSink segments
+]
+ROTATED_SUFFIX = re.compile(r"_\d{8}_\d{6}(?:_\d+)?$")
+
+# "<time>: " prefix of SessionWriter lines, "[<device>] " tag of DeviceFramer
+# messages and the header BLEcomms.py writes at the start of every session
+LINE_TIMESTAMP = re.compile(rb"^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d(?:\.\d+)?): ")
+DEVICE_TAG = re.compile(rb"^\[([^\]]+)\] ")
+SESSION_HEADER = re.compile(rb"^Recording Session: (\d{4}-\d\d-\d\d \d\d:\d\d:\d\d)")
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS sources (
+    id INTEGER PRIMARY KEY, path TEXT UNIQUE, layout TEXT, size INTEGER, mtime_ns INTEGER, sha1 TEXT,
+    label TEXT, device TEXT, ingested_at TEXT);
+CREATE INDEX IF NOT EXISTS sources_sha1 ON sources (sha1);
+CREATE TABLE IF NOT EXISTS schemas (id INTEGER PRIMARY KEY, columns TEXT UNIQUE);
+CREATE TABLE IF NOT EXISTS chunks (id INTEGER PRIMARY KEY, schema_id INTEGER REFERENCES schemas, rows INTEGER);
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY, source_id INTEGER REFERENCES sources ON DELETE CASCADE,
+    device TEXT COLLATE NOCASE, label TEXT COLLATE NOCASE, schema_id INTEGER REFERENCES schemas,
+    start_time INTEGER, end_time INTEGER, rows INTEGER);
+CREATE INDEX IF NOT EXISTS sessions_label ON sessions (label, start_time);
+CREATE INDEX IF NOT EXISTS sessions_device ON sessions (device, start_time);
+CREATE INDEX IF NOT EXISTS sessions_time ON sessions (start_time, end_time);
+CREATE INDEX IF NOT EXISTS sessions_schema ON sessions (schema_id);
+CREATE TABLE IF NOT EXISTS segments (
+    session_id INTEGER REFERENCES sessions ON DELETE CASCADE, chunk_id INTEGER REFERENCES chunks,
+    start_row INTEGER, rows INTEGER, start_time INTEGER, end_time INTEGER);
+CREATE INDEX IF NOT EXISTS segments_session ON segments (session_id);
+CREATE INDEX IF NOT EXISTS segments_chunk ON segments (chunk_id);
+"""
+
+
+def to_ms(value):
+    """Milliseconds since the epoch (of local wall-clock time) for a
+    datetime, numpy datetime64 or a string like "2025-03-11 14:00"."""
+    if value is None:
+        return None
+    return int(np.datetime64(value, "ms").astype(np.int64))
+
+
+def format_ms(ms):
+    return "" if ms is None else str(np.datetime64(ms, "ms")).replace("T", " ")
+
+
+def file_time(path):
+    """Session start encoded in the file name, or None."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    for pattern, fmt in FILENAME_TIMES:
+        match = pattern.search(stem)
+        if match:
+            try:
+                return to_ms(datetime.strptime(match.group(1), fmt))
+            except ValueError:
+                return None
+    return None
+
+
+def layout(path):
+    """Name of the capture layout of a file, recorded in the index."""
+    name = os.path.basename(path)
+    if name.startswith("multi_reading_"):
+        return "multi_capture"
+    if name.startswith("reading_"):
+        return "blecomms" if name.endswith(".txt") else "csvprocess"
+    if name.startswith("BLE_Readings_"):
+        return "save_data" if name.endswith(".txt") else "csvprocess"
+    if name.startswith("latest_"):
+        return "collect"
+    return "csv" if name.endswith(".csv") else "text"
+
+
+def find_files(paths):
+    """Capture files under `paths` (files or folders, searched recursively).
+    CSVs converted by CSVprocess.py are skipped when their .txt is there,
+    since the .txt also has the timestamps."""
+    files = []
+    for path in paths:
+        if os.path.isfile(path):
+            files.append(path)
+            continue
+        for directory, _, file_names in os.walk(path):
+            for file_name in sorted(file_names):
+                stem, ext = os.path.splitext(file_name)
+                if ext == ".txt" or (ext == ".csv" and stem + ".txt" not in file_names):
+                    files.append(os.path.join(directory, file_name))
+    return files
+
+
+def canonical_columns(keys):
+    """Training column names (SENSOR_ALIASES applied) for sensor keys, in
+    order and without duplicates."""
+    columns = []
+    for key in keys:
+        name = SENSOR_ALIASES.get(key, key)
+        if name not in columns:
+            columns.append(name)
+    return columns
+
+
+def read_text_sessions(path):
+    """Sessions of a session text file as a list of (device, header time,
+    frames, timestamps). BLEcomms.py files can hold several sessions and
+    multi_capture.py files several devices."""
+    with open(path, "rb") as file:
+        content = file.read()
+    sessions = {}
+    header_time = None
+    n_headers = 0
+    for line in content.splitlines():
+        line = line.strip()
+        stamp = "NaT"
+        match = LINE_TIMESTAMP.match(line)
+        if match:
+            stamp = match.group(1).decode()
+            line = line[match.end():]
+        device = None
+        match = DEVICE_TAG.match(line)
+        if match:
+            device = match.group(1).decode("utf-8", errors="replace")
+            line = line[match.end():]
+        if not line.startswith(DATA_PREFIX):
+            match = SESSION_HEADER.match(line)
+            if match:
+                n_headers += 1
+                header_time = to_ms(match.group(1).decode())
+            continue
+        session = sessions.get((n_headers, device))
+        if session is None:
+            session = sessions[(n_headers, device)] = (device, header_time, [], [])
+        session[2].append(line)
+        session[3].append(stamp)
+    return list(sessions.values())
+
+
+def parse_frames(frames):
+    """(columns, float32 values) of Data; frames; keys missing from a frame
+    are NaN."""
+    keys = []
+    seen = set()
+    for frame in frames:
+        for part in frame[len(DATA_PREFIX):].split(b";"):
+            key, sep, _ = part.partition(b":")
+            if sep and key not in seen:
+                seen.add(key)
+                keys.append(key.strip().decode("utf-8", errors="replace"))
+    parser = RecordParser(canonical_columns(keys), aliases=SENSOR_ALIASES, fill_value=np.nan)
+    values = parser.new_batch(len(frames))
+    for i, frame in enumerate(frames):
+        parser.parse_into(frame, values[i])
+    return parser.columns, values
+
+
+def class_names(config_path=CONFIG_PATH):
+    """({label: name}, {file name: class name}) from the dataset config, or
+    the default labels if there is none."""
+    if not os.path.exists(config_path):
+        return dict(LABELS), {}
+    config = load_config(config_path)
+    names = {entry["label"]: entry["name"] for entry in config["classes"]}
+    files = {os.path.basename(path): entry["name"] for entry in config["classes"] for path in entry["files"]}
+    return names, files
+
+
+class Archive:
+    """Index and chunk store at `path`, created on first use."""
+
+    def __init__(self, path=ARCHIVE_PATH, chunk_rows=CHUNK_ROWS, config_path=CONFIG_PATH):
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.label_names, self.file_labels = class_names(config_path)
+        os.makedirs(os.path.join(path, CHUNKS_DIRNAME), exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(path, INDEX_FILENAME))
+        self.db.execute("PRAGMA foreign_keys = ON")
+        version = self.db.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, FORMAT_VERSION):
+            raise ValueError(f"Unsupported archive format in {path}: {version}")
+        self.db.executescript(SCHEMA_SQL)
+        self.db.execute(f"PRAGMA user_version = {FORMAT_VERSION}")
+        self._buffers = {}  # schema_id -> rows waiting for a chunk
+        self._mmaps = {}
+
+    def close(self):
+        self.db.close()
+
+    # Ingest
+
+    def ingest(self, paths, label=None, device=None):
+        """Adds every capture file under `paths` that is new or changed since
+        it was last ingested, tagging its sessions with `label` and `device`
+        where the file doesn't say. Unchanged files ingested with another
+        label or device are re-read with the new ones. Returns {"files",
+        "unchanged", "relabelled", "sessions", "rows"}."""
+        summary = {"files": 0, "unchanged": 0, "relabelled": 0, "sessions": 0, "rows": 0}
+        archive_dir = os.path.abspath(self.path)
+        replaced = False
+        with self.db:
+            for path in find_files(paths):
+                path = os.path.abspath(path)
+                if path.startswith(archive_dir + os.sep):
+                    continue
+                stat = os.stat(path)
+                known = self.db.execute("SELECT id, size, mtime_ns, sha1, label, device FROM sources WHERE path = ?",
+                                        (path,)).fetchone()
+                relabel = known is not None and ((label and label != known[4]) or (device and device != known[5]))
+                if known is not None and not relabel and known[1:3] == (stat.st_size, stat.st_mtime_ns):
+                    summary["unchanged"] += 1
+                    continue
+                with open(path, "rb") as file:
+                    digest = hashlib.sha1(file.read()).hexdigest()
+                if known is not None and known[3] == digest:
+                    if not relabel:
+                        # Touched but not changed
+                        self.db.execute("UPDATE sources SET mtime_ns = ? WHERE id = ?", (stat.st_mtime_ns, known[0]))
+                        summary["unchanged"] += 1
+                        continue
+                    # Same content, new tags: re-read so sessions are split as a fresh ingest would
+                    summary["relabelled"] += 1
+                file_label, file_device = label, device
+                if known is not None:
+                    file_label, file_device = label or known[4], device or known[5]
+                    self.db.execute("DELETE FROM sources WHERE id = ?", (known[0],))
+                    replaced = True
+                    if known[3] != digest:
+                        sessions, rows = self._reingest_copy(known[3])
+                        summary["sessions"] += sessions
+                        summary["rows"] += rows
+                # Copies skipped as duplicates have no sessions of their own
+                duplicate = self.db.execute(
+                    "SELECT path FROM sources src WHERE sha1 = ? AND EXISTS "
+                    "(SELECT 1 FROM sessions WHERE source_id = src.id)", (digest,)).fetchone()
+                source_id = self.db.execute(
+                    "INSERT INTO sources (path, layout, size, mtime_ns, sha1, label, device, ingested_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (path, layout(path), stat.st_size, stat.st_mtime_ns, digest, file_label, file_device,
+                     datetime.now().isoformat(timespec="seconds"))).lastrowid
+                summary["files"] += 1
+                if duplicate is not None:
+                    print(f"Skipping {path}: same content as {duplicate[0]}")
+                    continue
+                try:
+                    sessions, rows = self._ingest_file(source_id, path, file_label, file_device)
+                except (ValueError, pd.errors.ParserError) as error:
+                    self._discard(source_id)
+                    print(f"Skipping {path}: {error}")
+                    continue
+                summary["sessions"] += sessions
+                summary["rows"] += rows
+            for buffer in self._buffers.values():
+                self._flush(buffer)
+            self._buffers.clear()
+        if replaced:
+            self.vacuum()
+        return summary
+
+    def _reingest_copy(self, digest):
+        """Reads an unchanged copy, skipped at ingest as a duplicate, of
+        content whose file was replaced, so the content stays in the
+        archive. Returns (sessions, rows)."""
+        copies = self.db.execute(
+            "SELECT id, path, size, mtime_ns, label, device FROM sources src WHERE sha1 = ? AND NOT EXISTS "
+            "(SELECT 1 FROM sessions WHERE source_id = src.id) ORDER BY id", (digest,)).fetchall()
+        for source_id, path, size, mtime_ns, label, device in copies:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if (stat.st_size, stat.st_mtime_ns) != (size, mtime_ns):
+                # Changed since: re-read on its own next ingest
+                continue
+            try:
+                return self._ingest_file(source_id, path, label, device)
+            except (ValueError, pd.errors.ParserError) as error:
+                self._discard(source_id)
+                print(f"Skipping {path}: {error}")
+        return 0, 0
+
+    def _ingest_file(self, source_id, path, label, device):
+        """Parses one file into sessions; returns (sessions, rows)."""
+        start = file_time(path)
+        if path.endswith(".csv"):
+            return self._ingest_csv(source_id, path, label, device, start)
+        n_sessions = n_rows = 0
+        for tagged_device, header_time, frames, stamps in read_text_sessions(path):
+            columns, values = parse_frames(frames)
+            timestamps = np.array(stamps, dtype="datetime64[ms]")
+            self._add_session(source_id, tagged_device or device, label, columns, values, timestamps,
+                              header_time if header_time is not None else start)
+            n_sessions += 1
+            n_rows += len(values)
+        return n_sessions, n_rows
+
+    def _ingest_csv(self, source_id, path, label, device, start):
+        """CSV sessions, read a chunk at a time: one session per file, or per
+        class when it has a Label column (rows without one get the file's
+        label)."""
+        stem, ext = os.path.splitext(os.path.basename(path))
+        file_label = label or self.file_labels.get(os.path.basename(path)) \
+            or self.file_labels.get(ROTATED_SUFFIX.sub("", stem) + ext)
+        sessions = {}
+        n_rows = 0
+        for chunk in pd.read_csv(path, chunksize=self.chunk_rows):
+            keys = [str(key).strip() for key in chunk.columns if str(key).strip() != LABEL_COLUMN]
+            chunk.columns = [str(key).strip() for key in chunk.columns]
+            columns = canonical_columns(keys)
+            groups = [(file_label, chunk)]
+            if LABEL_COLUMN in chunk.columns:
+                groups = [(file_label if pd.isna(value) else self._label_name(value), group)
+                          for value, group in chunk.groupby(LABEL_COLUMN, sort=False, dropna=False)]
+            for group_label, group in groups:
+                values = np.column_stack([pd.to_numeric(group[key], errors="coerce").to_numpy(dtype=np.float32)
+                                          for key in keys]) if keys else np.empty((len(group), 0), np.float32)
+                # Keys that are aliases of each other keep the first one's values
+                if len(columns) < len(keys):
+                    first = {}
+                    for i, key in enumerate(keys):
+                        first.setdefault(SENSOR_ALIASES.get(key, key), i)
+                    values = values[:, [first[name] for name in columns]]
+                timestamps = np.full(len(group), np.datetime64("NaT"), dtype="datetime64[ms]")
+                session_id = sessions.get(group_label)
+                if session_id is None:
+                    session_id = sessions[group_label] = self._add_session(
+                        source_id, device, group_label, columns, None, None, start)
+                self._append(session_id, columns, values, timestamps)
+                n_rows += len(values)
+        for session_id in sessions.values():
+            self.db.execute("UPDATE sessions SET rows = (SELECT COALESCE(SUM(rows), 0) FROM segments "
+                            "WHERE session_id = ?) + ? WHERE id = ?",
+                            (session_id, self._pending_rows(session_id), session_id))
+        return len(sessions), n_rows
+
+    def _label_name(self, value):
+        """Class name for a value of a Label column (a class number or name)."""
+        try:
+            number = int(float(value))
+        except ValueError:
+            return str(value)
+        return self.label_names.get(number, str(number))
+
+    def _discard(self, source_id):
+        """Drops what was indexed or queued of a file that failed part way."""
+        sessions = {row[0] for row in self.db.execute("SELECT id FROM sessions WHERE source_id = ?", (source_id,))}
+        for buffer in self._buffers.values():
+            buffer["parts"] = [part for part in buffer["parts"] if part[0] not in sessions]
+            buffer["rows"] = sum(len(part[1]) for part in buffer["parts"])
+        self.db.execute("DELETE FROM sessions WHERE source_id = ?", (source_id,))
+
+    def _schema_id(self, columns):
+        key = json.dumps(columns)
+        row = self.db.execute("SELECT id FROM schemas WHERE columns = ?", (key,)).fetchone()
+        if row is not None:
+            return row[0]
+        return self.db.execute("INSERT INTO schemas (columns) VALUES (?)", (key,)).lastrowid
+
+    def _add_session(self, source_id, device, label, columns, values, timestamps, start):
+        """Indexes a session and, given its values, queues them for a chunk.
+        Its time range is that of its timestamped readings, else `start`."""
+        start_time = end_time = start
+        if timestamps is not None and (~np.isnat(timestamps)).any():
+            known = timestamps[~np.isnat(timestamps)].astype(np.int64)
+            start_time, end_time = int(known.min()), int(known.max())
+        session_id = self.db.execute(
+            "INSERT INTO sessions (source_id, device, label, schema_id, start_time, end_time, rows) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (source_id, device, label, self._schema_id(columns), start_time, end_time,
+             0 if values is None else len(values))).lastrowid
+        if values is not None:
+            self._append(session_id, columns, values, timestamps)
+        return session_id
+
+    def _append(self, session_id, columns, values, timestamps):
+        """Queues a session's rows, writing a chunk whenever CHUNK_ROWS are waiting."""
+        schema_id = self._schema_id(columns)
+        buffer = self._buffers.get(schema_id)
+        if buffer is None:
+            buffer = self._buffers[schema_id] = {"schema_id": schema_id, "columns": columns, "parts": [], "rows": 0}
+        pos = 0
+        while pos < len(values):
+            take = min(len(values) - pos, self.chunk_rows - buffer["rows"])
+            buffer["parts"].append((session_id, values[pos:pos + take], timestamps[pos:pos + take]))
+            buffer["rows"] += take
+            pos += take
+            if buffer["rows"] >= self.chunk_rows:
+                self._flush(buffer)
+
+    def _pending_rows(self, session_id):
+        return sum(len(values) for buffer in self._buffers.values()
+                   for part_session, values, _ in buffer["parts"] if part_session == session_id)
+
+    def _flush(self, buffer):
+        """Writes the queued rows of one schema as a new chunk and indexes
+        the session segments in it."""
+        if not buffer["rows"]:
+            return
+        values = np.concatenate([part[1] for part in buffer["parts"]])
+        timestamps = np.concatenate([part[2] for part in buffer["parts"]])
+        chunk_id = self.db.execute("INSERT INTO chunks (schema_id, rows) VALUES (?, ?)",
+                                   (buffer["schema_id"], len(values))).lastrowid
+        chunk_dir = os.path.join(self.path, CHUNKS_DIRNAME, str(chunk_id))
+        tmp_dir = chunk_dir + ".tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        for i, name in enumerate(buffer["columns"]):
+            column = values[:, i]
+            finite = column[~np.isnan(column)]
+            is_integer = len(finite) == len(column) and bool((column == np.round(column)).all())
+            low, high = (finite.min(), finite.max()) if len(finite) else (0, 0)
+            np.save(os.path.join(tmp_dir, name + ".npy"), column.astype(compact_dtype(is_integer, low, high)))
+        np.save(os.path.join(tmp_dir, TIMESTAMP_COLUMN + ".npy"), timestamps)
+        shutil.rmtree(chunk_dir, ignore_errors=True)
+        os.replace(tmp_dir, chunk_dir)
+
+        offset = 0
+        for session_id, part_values, part_timestamps in buffer["parts"]:
+            known = part_timestamps[~np.isnat(part_timestamps)].astype(np.int64)
+            start_time, end_time = (int(known.min()), int(known.max())) if len(known) else (None, None)
+            self.db.execute("INSERT INTO segments (session_id, chunk_id, start_row, rows, start_time, end_time) "
+                            "VALUES (?, ?, ?, ?, ?, ?)",
+                            (session_id, chunk_id, offset, len(part_values), start_time, end_time))
+            offset += len(part_values)
+        buffer["parts"] = []
+        buffer["rows"] = 0
+
+    def vacuum(self):
+        """Deletes chunks no session refers to any more (from replaced files
+        or an interrupted ingest). Rows of replaced sessions in chunks that
+        are still partly in use stay until those are deleted too."""
+        with self.db:
+            unused = [row[0] for row in self.db.execute(
+                "SELECT id FROM chunks WHERE id NOT IN (SELECT DISTINCT chunk_id FROM segments)")]
+            self.db.executemany("DELETE FROM chunks WHERE id = ?", [(chunk_id,) for chunk_id in unused])
+        known = {str(row[0]) for row in self.db.execute("SELECT id FROM chunks")}
+        chunks_dir = os.path.join(self.path, CHUNKS_DIRNAME)
+        removed = 0
+        for name in os.listdir(chunks_dir):
+            if name not in known:
+                shutil.rmtree(os.path.join(chunks_dir, name), ignore_errors=True)
+                removed += 1
+        self._mmaps.clear()
+        return removed
+
+    # Queries
+
+    def sessions(self, device=None, label=None, start=None, end=None, columns=None):
+        """Sessions matching every filter given, oldest first, as dicts.
+        `device` and `label` are a name or a list (case-insensitive); a
+        session matches [start, end) if any of its readings fall in it;
+        `columns` keeps the sessions whose sensor schema has all of them."""
+        where, params = [], []
+        for field, value in (("device", device), ("label", label)):
+            if value is not None:
+                values = [value] if isinstance(value, str) else list(value)
+                where.append(f"s.{field} IN ({', '.join('?' * len(values))})")
+                params += values
+        if start is not None:
+            where.append("s.end_time >= ?")
+            params.append(to_ms(start))
+        if end is not None:
+            where.append("s.start_time < ?")
+            params.append(to_ms(end))
+        query = ("SELECT s.id, src.path, src.layout, s.device, s.label, s.start_time, s.end_time, s.rows, "
+                 "sch.columns FROM sessions s JOIN sources src ON src.id = s.source_id "
+                 "JOIN schemas sch ON sch.id = s.schema_id")
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY s.start_time, s.id"
+        found = []
+        for row in self.db.execute(query, params):
+            session = dict(zip(("id", "path", "layout", "device", "label", "start_time", "end_time", "rows"), row))
+            session["columns"] = json.loads(row[8])
+            if columns is None or set(columns) <= set(session["columns"]):
+                found.append(session)
+        return found
+
+    def _chunk_column(self, chunk_id, name):
+        key = (chunk_id, name)
+        array = self._mmaps.get(key)
+        if array is None:
+            path = os.path.join(self.path, CHUNKS_DIRNAME, str(chunk_id), name + ".npy")
+            array = self._mmaps[key] = np.load(path, mmap_mode="r")
+        return array
+
+    def read(self, device=None, label=None, start=None, end=None, columns=None):
+        """Readings of the matching sessions as one DataFrame: the sensor
+        `columns` (default: every column of those sessions, NaN where a
+        session lacks one), plus Timestamp, Label, Device and Session. Only
+        readings in [start, end) are kept, and only the row ranges of the
+        matching sessions are read from the memory-mapped chunks."""
+        found = self.sessions(device, label, start, end, columns)
+        if columns is None:
+            columns = canonical_columns(name for session in found for name in session["columns"])
+        start_ms, end_ms = to_ms(start), to_ms(end)
+        parts = {name: [] for name in columns + [TIMESTAMP_COLUMN]}
+        session_ids, lengths = [], []
+        for session in found:
+            segments = self.db.execute("SELECT chunk_id, start_row, rows FROM segments WHERE session_id = ? "
+                                       "ORDER BY chunk_id, start_row", (session["id"],)).fetchall()
+            for chunk_id, start_row, rows in segments:
+                rows = slice(start_row, start_row + rows)
+                timestamps = self._chunk_column(chunk_id, TIMESTAMP_COLUMN)[rows]
+                keep = None
+                if start_ms is not None or end_ms is not None:
+                    # Readings without a timestamp count as the session's start
+                    times = np.where(np.isnat(timestamps), session["start_time"], timestamps.astype(np.int64))
+                    keep = np.ones(len(times), dtype=bool)
+                    if start_ms is not None:
+                        keep &= times >= start_ms
+                    if end_ms is not None:
+                        keep &= times < end_ms
+                n = len(timestamps) if keep is None else int(keep.sum())
+                if not n:
+                    continue
+                for name in columns + [TIMESTAMP_COLUMN]:
+                    if name in session["columns"] or name == TIMESTAMP_COLUMN:
+                        values = self._chunk_column(chunk_id, name)[rows]
+                        parts[name].append(values if keep is None else values[keep])
+                    else:
+                        parts[name].append(np.full(n, np.nan, dtype=np.float32))
+                session_ids.append(session["id"])
+                lengths.append(n)
+        by_id = {session["id"]: session for session in found}
+        frame = pd.DataFrame({name: np.concatenate(values) if values else np.empty(0, dtype=np.float32)
+                              for name, values in parts.items()})
+        if not lengths:
+            frame[TIMESTAMP_COLUMN] = frame[TIMESTAMP_COLUMN].astype("datetime64[ms]")
+        # One entry per segment, repeated over its rows
+        index = np.repeat(np.arange(len(session_ids)), lengths)
+        for name, field in ((LABEL_COLUMN, "label"), ("Device", "device")):
+            frame[name] = pd.Categorical([by_id[i][field] for i in session_ids]).take(index)
+        frame["Session"] = np.asarray(session_ids, dtype=np.int64)[index]
+        return frame
+
+    def export_dataset(self, output_dir, config_path=CONFIG_PATH, columns=FEATURE_COLUMNS, **filters):
+        """Writes the matching readings as a training dataset (dataset.py
+        format, read by gridsearchrf.py) with the class numbers of
+        `config_path`. Readings of other classes, or with a missing value,
+        are left out."""
+        names, _ = class_names(config_path)
+        numbers = {name.lower(): number for number, name in names.items()}
+        frame = self.read(columns=list(columns), **filters)
+        y = frame[LABEL_COLUMN].astype(object).map(lambda name: numbers.get(str(name).lower()))
+        keep = y.notna() & frame[list(columns)].notna().all(axis=1)
+        frame = frame[keep]
+        sources = [{"session": int(session_id), "label": int(y[rows.index[0]]), "rows": len(rows)}
+                   for session_id, rows in frame.groupby("Session", sort=False)]
+        schema = save_dataset(frame[list(columns)], y[keep].astype(int), names, output_dir, sources)
+        return schema, int((~keep).sum())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Indexed archive of captured sessions")
+    parser.add_argument("--archive", default=ARCHIVE_PATH, help="archive folder (default %(default)s)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    ingest = commands.add_parser("ingest", help="add new or changed capture files")
+    ingest.add_argument("paths", nargs="+", help="capture files or folders (searched recursively)")
+    ingest.add_argument("--label", help="class of the readings, for files that don't record it")
+    ingest.add_argument("--device", help="device address, for files that don't record it")
+    for name, help_text in (("sessions", "list matching sessions"), ("export", "write a training dataset")):
+        command = commands.add_parser(name, help=help_text)
+        if name == "export":
+            command.add_argument("output", help="dataset folder, e.g. latest_dataset")
+            command.add_argument("--config", default=CONFIG_PATH, help="class numbers (default %(default)s)")
+        command.add_argument("--device", action="append", help="device address (repeatable)")
+        command.add_argument("--label", action="append", help="class name (repeatable)")
+        command.add_argument("--since", help="e.g. 2025-03-01 or '2025-03-01 14:00'")
+        command.add_argument("--until", help="end of the time range (exclusive)")
+    commands.add_parser("vacuum", help="delete chunks no session uses")
+    args = parser.parse_args()
+
+    archive = Archive(args.archive)
+    try:
+        if args.command == "ingest":
+            started = time.perf_counter()
+            summary = archive.ingest(args.paths, label=args.label, device=args.device)
+            print(f"Ingested {summary['files']} files ({summary['sessions']} sessions, {summary['rows']} readings), "
+                  f"{summary['unchanged']} unchanged, {summary['relabelled']} re-read with a new label or device, in {time.perf_counter() - started:.2f}s")
+        elif args.command == "vacuum":
+            print(f"Removed {archive.vacuum()} unused chunks")
+        else:
+            filters = {"device": args.device, "label": args.label, "start": args.since, "end": args.until}
+            if args.command == "sessions":
+                found = archive.sessions(**filters)
+                for session in found:
+                    print(f"{session['id']:>6}  {format_ms(session['start_time']):<23}  {format_ms(session['end_time']):<23}  "
+                          f"{session['rows']:>7}  {session['label'] or '-':<12}  {session['device'] or '-':<17}  "
+                          f"{session['path']}")
+                print(f"{len(found)} sessions, {sum(session['rows'] for session in found)} readings")
+            else:
+                schema, dropped = archive.export_dataset(args.output, args.config, **filters)
+                print(f"Saved {schema['n_rows']} readings from {len(schema['sources'])} sessions to {args.output} "
+                      f"({dropped} without a known class or with missing values left out)")
+    finally:
+        archive.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from dataset import build_dataset, load_dataset
+
+# Load time and memory of the training data as one combined CSV vs the
+# columnar dataset written by combined.py. latest.csv is tiled to SCALE times
+# its length and split back into per-class recordings.
+DATA_PATH = "latest.csv"
+SCALE = 250
+
+
+def measure(function):
+    """(seconds, peak MB traced, result), timed without tracing."""
+    start = time.perf_counter()
+    function()
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    result = function()
+    peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    return seconds, peak, result
+
+
+def size_mb(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path) / 1e6
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path)) / 1e6
+
+
+def main():
+    df = pd.read_csv(DATA_PATH).dropna()
+    df = df.iloc[np.arange(len(df) * SCALE) % len(df)].sort_values("Label", kind="stable")
+    work = tempfile.mkdtemp(prefix="bench_dataset_")
+    try:
+        config = {"classes": []}
+        for label, rows in df.groupby("Label"):
+            path = os.path.join(work, f"class_{label}.csv")
+            rows.drop(columns="Label").to_csv(path, index=False)
+            config["classes"].append({"label": int(label), "name": str(label), "files": [path]})
+        csv_path = os.path.join(work, "combined.csv")
+        df.to_csv(csv_path, index=False)
+        dataset_path = os.path.join(work, "dataset")
+        print(f"{len(df)} readings, {df.shape[1] - 1} columns\n")
+
+        seconds, peak, schema = measure(lambda: build_dataset(config, dataset_path))
+        print(f"Build (streamed, per-class CSVs -> columns): {seconds:.2f} s, peak {peak:.0f} MB\n")
+
+        print(f"{'':<24} {'load':>9} {'peak mem':>10} {'in memory':>10} {'on disk':>9}")
+        seconds, peak, loaded = measure(lambda: pd.read_csv(csv_path).dropna())
+        memory = loaded.memory_usage(index=False).sum() / 1e6
+        print(f"{'CSV (read_csv)':<24} {seconds:>7.3f} s {peak:>7.0f} MB {memory:>7.0f} MB {size_mb(csv_path):>6.0f} MB")
+
+        seconds, peak, (X, y, _) = measure(lambda: load_dataset(dataset_path))
+        memory = (X.memory_usage(index=False).sum() + y.nbytes) / 1e6
+        print(f"{'Columnar (mmap)':<24} {seconds:>7.3f} s {peak:>7.0f} MB {memory:>7.0f} MB "
+              f"{size_mb(dataset_path):>6.0f} MB  (pages mapped, read on first touch)")
+
+        seconds, peak, _ = measure(lambda: load_dataset(dataset_path, mmap=False))
+        print(f"{'Columnar (read)':<24} {seconds:>7.3f} s {peak:>7.0f} MB")
+
+        seconds, peak, _ = measure(lambda: load_dataset(dataset_path)[0].to_numpy(dtype=np.float32))
+        print(f"{'Columnar -> float32 X':<24} {seconds:>7.3f} s {peak:>7.0f} MB")
+
+        dtypes = ", ".join(f"{column['name']}={column['dtype']}" for column in schema["columns"])
+        print(f"\nColumn types: {dtypes}")
+        del X, y, loaded
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import time
+import numpy as np
+import pandas as pd
+from features import RollingFeatures
+
+# Per-sample cost of the streaming rolling-window engine vs recomputing every
+# statistic over the window, for all 15 channels at several window lengths
+DATA_PATH = "latest.csv"
+WINDOWS = [5, 20, 60, 300]
+N_SAMPLES = 2000
+
+
+def naive_update(history, x, window):
+    """Recomputes mean, slope, min, max and EWMA from the last `window` samples."""
+    history.append(x)
+    recent = np.asarray(history[-window:])
+    n = len(recent)
+    t = np.arange(n) - (n - 1) / 2.0
+    slope = (t @ recent) / max((t * t).sum(), 1e-12)
+    weights = (1 - 2.0 / (window + 1)) ** np.arange(n)[::-1]
+    ewma = weights @ recent / weights.sum()
+    return np.concatenate([x, recent.mean(axis=0), slope, recent.min(axis=0), recent.max(axis=0), ewma])
+
+
+def per_sample_us(function, X):
+    start = time.perf_counter()
+    for x in X:
+        function(x)
+    return (time.perf_counter() - start) / len(X) * 1e6
+
+
+def main():
+    df = pd.read_csv(DATA_PATH).dropna()
+    columns = list(df.columns.drop("Label"))
+    X = df[columns].to_numpy(dtype=np.float64)
+    X = X[np.arange(N_SAMPLES) % len(X)]
+    print(f"{len(columns)} channels, {N_SAMPLES} samples, stats: mean, slope, min, max, ewma\n")
+
+    print(f"{'window':>8} {'streaming':>14} {'recompute':>14} {'speedup':>8}")
+    for window in WINDOWS:
+        engine = RollingFeatures(columns, windows=[window])
+        streaming = per_sample_us(engine.update, X)
+        history = []
+        naive = per_sample_us(lambda x: naive_update(history, x, window), X)
+        print(f"{window:>8} {streaming:>11.1f} us {naive:>11.1f} us {naive / streaming:>7.1f}x")
+
+    engine = RollingFeatures(columns, windows=WINDOWS)
+    streaming = per_sample_us(engine.update, X)
+    start = time.perf_counter()
+    engine.transform(X)
+    batch = len(X) / (time.perf_counter() - start)
+    print(f"\nAll windows {WINDOWS} ({len(engine)} features): {streaming:.1f} us/sample streaming, "
+          f"{batch:.0f} rows/s batch transform")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import os
+import tempfile
+import time
+import tracemalloc
+import joblib
+import numpy as np
+import pandas as pd
+from inference import ArrayPredictor
+from compiled_forest import CompiledForest, export_pipeline
+from openset import OpenSetScorer
+from bench_predict import DATA_PATH, load_model, report
+
+# Compiled forest vs the pickled sklearn pipeline: agreement, latency, load time, memory
+N_READINGS = 500
+N_LOADS = 5
+# Agreement check: readings the model hasn't seen (training rows plus noise of
+# NOISE x each column's std) and rows with one value set on a split threshold
+NOISE = 0.01
+N_BOUNDARY = 5000
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def timed_load(load, path):
+    """Best-of-N load time and the peak memory allocated by one load."""
+    times = []
+    for _ in range(N_LOADS):
+        start = time.perf_counter()
+        load(path)
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    load(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(times), peak
+
+
+def boundary_rows(forest, X, n, rng):
+    """Rows of X with one value set to a split threshold of the compiled
+    forest, or one float32 step either side of it: where folding the scaler
+    into the thresholds is most likely to flip a test."""
+    internal = np.flatnonzero(np.isfinite(forest.threshold))
+    nodes = rng.choice(internal, n)
+    rows = X[rng.integers(0, len(X), n)]
+    cutoff = forest.threshold[nodes].astype(np.float32)
+    batches = []
+    for value in (cutoff, np.nextafter(cutoff, np.float32(np.inf)), np.nextafter(cutoff, np.float32(-np.inf))):
+        batch = rows.copy()
+        batch[np.arange(n), forest.feature[nodes]] = value
+        batches.append(batch)
+    return np.vstack(batches)
+
+
+def tree_mismatches(forest, model, X, columns):
+    """Readings (float32) on which any tree of the compiled forest takes
+    another path than the pickle's, seen as a change in the class
+    probabilities. The pickle gets the same values, as float64 like the
+    DataFrames predict.py builds."""
+    expected = model.predict_proba(pd.DataFrame(X.astype(np.float64), columns=columns))
+    return int((np.abs(forest.predict_proba(X) - expected).max(axis=1) > 1e-6).sum())
+
+
+def main():
+    df = pd.read_csv(DATA_PATH).dropna()
+    X = df.drop(columns=["Label"])
+    y = df["Label"]
+    model = load_model(X, y)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pickle_path = os.path.join(tmp, "model.pkl")
+        compiled_path = os.path.join(tmp, "model")
+        joblib.dump(model, pickle_path)
+        meta = export_pipeline(model, compiled_path, openset=OpenSetScorer.fit(X, y))
+        forest = CompiledForest.load(compiled_path)
+
+        # Same trees' answers as the pickle on the training rows, on unseen
+        # readings and right at the split thresholds
+        X_array = X.to_numpy(dtype=np.float32)
+        rng = np.random.default_rng(0)
+        unseen = (X_array + rng.normal(0, NOISE, X_array.shape) * X_array.std(axis=0)).astype(np.float32)
+        print(f"{meta['n_trees']} trees, {meta['n_nodes']} nodes, max depth {meta['max_depth']}")
+        failed = False
+        for name, rows in (("training rows", X_array), ("unseen readings", unseen),
+                           ("split boundaries", boundary_rows(forest, X_array, N_BOUNDARY, rng))):
+            mismatches = tree_mismatches(forest, model, rows, X.columns)
+            print(f"Mismatches vs pickle on {name}: {mismatches} / {len(rows)}")
+            failed = failed or mismatches > 0
+        if failed:
+            raise SystemExit("Compiled forest disagrees with the pickled pipeline")
+
+        rows = X_array[np.random.default_rng(0).choice(len(X_array), N_READINGS)]
+        predictor = ArrayPredictor(model)
+        timings = {"sklearn pipeline": [], "ArrayPredictor": [], "CompiledForest": []}
+        for row in rows:
+            row = row[None, :]
+            frame = pd.DataFrame(row, columns=X.columns)
+            start = time.perf_counter()
+            model.predict(frame)
+            mid = time.perf_counter()
+            predictor.predict_one(row)
+            end = time.perf_counter()
+            forest.predict_one(row)
+            timings["sklearn pipeline"].append(mid - start)
+            timings["ArrayPredictor"].append(end - mid)
+            timings["CompiledForest"].append(time.perf_counter() - end)
+
+        # Timed on its own: right after a sklearn call the caches are cold
+        timings["open-set score"] = []
+        for row in rows:
+            row = row[None, :]
+            start = time.perf_counter()
+            forest.openset.score_one(row)
+            timings["open-set score"].append(time.perf_counter() - start)
+
+        print("\nSingle-sample latency")
+        for name, values in timings.items():
+            report(name, values)
+
+        start = time.perf_counter()
+        forest.predict(X_array)
+        batch = time.perf_counter() - start
+        print(f"CompiledForest batch of {len(X_array)}: {batch * 1e3:.1f} ms "
+              f"({batch / len(X_array) * 1e6:.1f} us/reading)")
+        start = time.perf_counter()
+        forest.openset.score(X_array)
+        batch = time.perf_counter() - start
+        print(f"Open-set batch of {len(X_array)}: {batch * 1e3:.1f} ms ({batch / len(X_array) * 1e6:.2f} us/reading)")
+
+        pickle_load, pickle_peak = timed_load(joblib.load, pickle_path)
+        compiled_load, compiled_peak = timed_load(CompiledForest.load, compiled_path)
+        print("\nLoad time / memory")
+        print(f"{'pickle':<16} load {pickle_load * 1e3:8.2f} ms   peak alloc {pickle_peak / 1e6:8.2f} MB   "
+              f"on disk {os.path.getsize(pickle_path) / 1e6:8.2f} MB")
+        print(f"{'compiled':<16} load {compiled_load * 1e3:8.2f} ms   peak alloc {compiled_peak / 1e6:8.2f} MB   "
+              f"on disk {directory_size(compiled_path) / 1e6:8.2f} MB   arrays {forest.nbytes() / 1e6:.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
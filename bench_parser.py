@@ -0,0 +1,117 @@
+import random
+import time
+import pandas as pd
+import binframe
+from frameparser import FrameReassembler, RecordParser
+
+# Throughput benchmark: the old str/dict frame handling vs FrameReassembler + RecordParser
+DATA_PATH = "latest.csv"
+N_MESSAGES = 20000
+# Largest chunk per read: default BLE MTU payload, BLE 4.2 extended payload, bulk serial read
+FRAGMENT_SIZES = [20, 244, 4096]
+# Each case is timed this many times and the best run kept (single runs are noisy)
+REPEATS = 5
+
+
+def make_stream(X, n_messages, max_fragment, seed=0, binary=False):
+    """Builds newline-terminated 'Data;KEY:VAL;...' messages (or binary
+    frames) cut into random fragments of 1..max_fragment bytes, so keys and
+    values get split too."""
+    columns = list(X.columns)
+    rows = X.sample(n=n_messages, replace=True, random_state=seed).itertuples(index=False)
+    if binary:
+        payload = b"".join(binframe.encode(values, seq=i) for i, values in enumerate(rows))
+    else:
+        payload = "".join("Data;" + ";".join(f"{key}:{value}" for key, value in zip(columns, values)) + "\n"
+                          for values in rows).encode()
+    rng = random.Random(seed)
+    fragments = []
+    pos = 0
+    while pos < len(payload):
+        step = rng.randint(1, max_fragment)
+        fragments.append(payload[pos:pos + step])
+        pos += step
+    return fragments
+
+
+def legacy_str(fragments, columns):
+    """Old serial/BLE handling: str concatenation, split, dict per message, reindex."""
+    buffer = ""
+    count = 0
+    for fragment in fragments:
+        buffer += fragment.decode("utf-8", errors="replace")
+        while "\n" in buffer:
+            line, buffer = buffer.split("\n", 1)
+            data_parts = line.replace("Data;", "").split(";")
+            data_dict = {kv.split(":")[0]: float(kv.split(":")[1]) for kv in data_parts if ":" in kv}
+            row = [data_dict.get(column, 0.0) for column in columns]
+            count += len(row) > 0
+    return count
+
+
+def legacy_fragments(fragments, columns):
+    """Old BLE handling: list of decoded fragments joined when a message completes."""
+    parts = []
+    count = 0
+    for fragment in fragments:
+        text = fragment.decode("utf-8", errors="replace")
+        if "\n" not in text:
+            parts.append(text)
+            continue
+        head, _, rest = text.partition("\n")
+        parts.append(head)
+        for line in ("".join(parts) + "\n" + rest).split("\n")[:-1]:
+            data_dict = dict(kv.split(":", 1) for kv in line.replace("Data;", "").split(";") if ":" in kv)
+            row = [float(data_dict.get(column, 0.0)) for column in columns]
+            count += len(row) > 0
+        parts = [rest.rsplit("\n", 1)[-1]] if "\n" in rest else [rest]
+    return count
+
+
+def best_rate(function, fragments, columns):
+    """Returns (messages, best messages/s over REPEATS runs)."""
+    best = None
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        count = function(fragments, columns)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return count, count / best
+
+
+def reassembler_parser(fragments, columns):
+    reassembler = FrameReassembler()
+    parser = RecordParser(columns)
+    row = parser.new_row()[0]
+    count = 0
+    for fragment in fragments:
+        for frame in reassembler.feed(fragment):
+            if parser.parse_into(frame, row) >= 0:
+                count += 1
+    return count
+
+
+def main():
+    X = pd.read_csv(DATA_PATH).dropna().drop(columns=["Label"])
+    columns = list(X.columns)
+    for max_fragment in FRAGMENT_SIZES:
+        fragments = make_stream(X, N_MESSAGES, max_fragment)
+        print(f"\n{N_MESSAGES} messages in {len(fragments)} fragments of 1-{max_fragment} bytes "
+              f"({sum(map(len, fragments)) / N_MESSAGES:.0f} bytes/message as text)")
+        baseline = None
+        for name, function in [("str split + dict", legacy_str),
+                               ("fragment list + dict", legacy_fragments),
+                               ("FrameReassembler+RecordParser", reassembler_parser)]:
+            count, rate = best_rate(function, fragments, columns)
+            baseline = baseline or rate
+            print(f"{name:<30} {count:6d} messages   {rate:10.0f} msg/s   x{rate / baseline:.2f}")
+
+        # Same readings as binary frames (binframe.py), through the same parser
+        fragments = make_stream(X, N_MESSAGES, max_fragment, binary=True)
+        count, rate = best_rate(reassembler_parser, fragments, columns)
+        print(f"{'binary frames':<30} {count:6d} messages   {rate:10.0f} msg/s   x{rate / baseline:.2f}   "
+              f"({sum(map(len, fragments)) / N_MESSAGES:.0f} bytes/message, {len(fragments)} fragments)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import os
+import time
+import joblib
+import numpy as np
+import pandas as pd
+from inference import ArrayPredictor
+from frameparser import RecordParser
+
+# Latency benchmark: DataFrame path from predict.py vs the array-native path
+MODEL_PATH = "best_worad_rf.pkl"
+DATA_PATH = "latest.csv"
+N_READINGS = 200  # Readings timed per path
+BATCH_SIZE = 64
+
+
+def load_model(X, y):
+    """Loads the trained pipeline, or fits a default one if it hasn't been trained yet."""
+    if os.path.exists(MODEL_PATH):
+        return joblib.load(MODEL_PATH)
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import StandardScaler
+    print(f"{MODEL_PATH} not found, fitting a default pipeline for the benchmark")
+    model = make_pipeline(StandardScaler(), RandomForestClassifier(n_estimators=300, random_state=42))
+    return model.fit(X, y)
+
+
+def to_lines(X):
+    """Rebuilds 'Data;KEY:VAL;...' serial lines from the training rows."""
+    columns = list(X.columns)
+    return ["Data;" + ";".join(f"{key}:{value}" for key, value in zip(columns, values))
+            for values in X.itertuples(index=False)]
+
+
+def legacy_predict(model, line, feature_columns):
+    data_parts = line.replace("Data;", "").split(";")
+    data_dict = {key_value.split(":")[0]: float(key_value.split(":")[1]) for key_value in data_parts if ":" in key_value}
+    df_input = pd.DataFrame([data_dict])
+    df_input = df_input.reindex(columns=feature_columns, fill_value=0)
+    return model.predict(df_input)[0]
+
+
+def report(name, timings):
+    timings = np.asarray(timings) * 1e6
+    print(f"{name:<28} p50 {np.percentile(timings, 50):10.1f} us   "
+          f"p99 {np.percentile(timings, 99):10.1f} us   mean {timings.mean():10.1f} us")
+    return np.percentile(timings, 50)
+
+
+def main():
+    df = pd.read_csv(DATA_PATH).dropna()
+    X = df.drop(columns=["Label"])
+    y = df["Label"]
+    feature_columns = X.columns
+    model = load_model(X, y)
+
+    lines = to_lines(X.sample(n=N_READINGS, random_state=0))
+    parser = RecordParser(feature_columns)
+    predictor = ArrayPredictor(model, batch_size=BATCH_SIZE)
+    row = parser.new_row()
+
+    # Both paths must agree before their timings mean anything
+    for line in lines:
+        parser.parse_into(line, row[0])
+        assert predictor.predict_one(row) == legacy_predict(model, line, feature_columns)
+
+    legacy = []
+    for line in lines:
+        start = time.perf_counter()
+        legacy_predict(model, line, feature_columns)
+        legacy.append(time.perf_counter() - start)
+
+    fast = []
+    for line in lines:
+        start = time.perf_counter()
+        parser.parse_into(line, row[0])
+        predictor.predict_one(row)
+        fast.append(time.perf_counter() - start)
+
+    # Batched: parse BATCH_SIZE lines into one buffer, time per reading
+    batch = parser.new_batch(BATCH_SIZE)
+    batched = []
+    for i in range(0, len(lines) - BATCH_SIZE + 1, BATCH_SIZE):
+        start = time.perf_counter()
+        for j, line in enumerate(lines[i:i + BATCH_SIZE]):
+            parser.parse_into(line, batch[j])
+        predictor.predict(batch)
+        batched.append((time.perf_counter() - start) / BATCH_SIZE)
+
+    print(f"{len(lines)} readings, {len(model[-1].estimators_)} trees")
+    legacy_p50 = report("DataFrame path", legacy)
+    fast_p50 = report("Array path (single)", fast)
+    report(f"Array path (batch {BATCH_SIZE})", batched)
+    print(f"Speed-up (p50, single reading): {legacy_p50 / fast_p50:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
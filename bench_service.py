@@ -0,0 +1,188 @@
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import numpy as np
+import pandas as pd
+from bench_predict import to_lines
+from inference_service import ServiceModel, parse_address
+
+# Throughput vs latency of inference_service.py. The service runs in its own
+# process, as deployed; producers are asyncio connections from this one, each
+# a sensor stream. Two loads:
+#   closed  every stream keeps DEPTH readings in flight (saturation throughput)
+#   open    every stream sends RATE readings/s (latency at a steady load)
+# Producers share the machine with the service, so on few cores the
+# closed-loop throughput is a lower bound.
+DATA_PATH = "latest.csv"
+ADDRESS = "127.0.0.1:8799"
+DURATION = 3.0  # Seconds per configuration
+STREAMS = [1, 8, 64]
+DELAYS_MS = [0, 1, 2, 5, 10]
+POOLS = [None, "process"]
+DEPTH = 8  # Readings in flight per stream, closed loop
+OPEN_STREAMS = 64
+RATE = 20  # Readings/s per stream, open loop
+N_BASELINE = 1000  # Readings timed for the one-process-per-rig baseline
+
+
+def baseline(model, lines):
+    """What a predict.py process does per reading: parse, open-set check and
+    a single-row forest prediction, no batching."""
+    parser, rolling = model.new_stream()
+    row = parser.new_row()
+    start = time.perf_counter()
+    for line in lines[:N_BASELINE]:
+        parser.parse_into(line, row[0])
+        x = row if rolling is None else rolling.update(row[0])[None, :]
+        if model.openset is None or not model.openset.is_unknown_one(x):
+            model.predictor.predict_one(x)
+    per_reading = (time.perf_counter() - start) / min(N_BASELINE, len(lines))
+    return {"readings_per_s": 1 / per_reading, "us_per_reading": per_reading * 1e6}
+
+
+def accepts(address):
+    """Whether something is listening on `address`."""
+    kind, where = parse_address(address)
+    probe = socket.socket(socket.AF_INET if kind == "tcp" else socket.AF_UNIX)
+    probe.settimeout(1)
+    try:
+        probe.connect(where)
+        return True
+    except OSError:
+        return False
+    finally:
+        probe.close()
+
+
+def start_service(address, delay_ms, pool, workers):
+    if accepts(address):
+        raise RuntimeError(f"Something is already listening on {address}; stop it or pass --address")
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "inference_service.py"),
+               "--address", address, "--max-delay", str(delay_ms)]
+    if pool:
+        command += ["--pool", pool, "--workers", str(workers)]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline and process.poll() is None:
+        if accepts(address):
+            return process
+        time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"Inference service did not start:\n{process.communicate()[0]}")
+
+
+def stop_service(process):
+    """Stops the service and returns its closing stats line."""
+    process.send_signal(signal.SIGTERM)
+    output = process.communicate(timeout=30)[0]
+    return next((line for line in output.splitlines() if line.startswith("[Service]")), "")
+
+
+async def producer(address, index, lines, stop_at, depth, rate, latencies):
+    kind, where = parse_address(address)
+    if kind == "tcp":
+        reader, writer = await asyncio.open_connection(*where)
+    else:
+        reader, writer = await asyncio.open_unix_connection(where)
+    stream = b"rig%d" % index
+    sent = {}
+    window = asyncio.Semaphore(depth)
+    n_sent = 0
+
+    async def receive():
+        # The service closes the connection once it has replied to everything
+        while reply := await reader.readline():
+            latencies.append(time.perf_counter() - sent.pop(int(reply.split(b" ", 2)[1])))
+            window.release()
+
+    receiver = asyncio.create_task(receive())
+    start = time.perf_counter()
+    # Streams start at spread-out offsets so they aren't in lockstep
+    offset = (index * 0.618 % 1) / rate if rate else 0.0
+    while time.perf_counter() < stop_at:
+        if rate:
+            await asyncio.sleep(max(0.0, start + offset + n_sent / rate - time.perf_counter()))
+        else:
+            await window.acquire()
+        n_sent += 1
+        sent[n_sent] = time.perf_counter()
+        writer.write(b"%s %s\n" % (stream, lines[n_sent % len(lines)]))
+        await writer.drain()
+    writer.write_eof()
+    await receiver
+    writer.close()
+    return n_sent
+
+
+async def load(address, lines, n_streams, duration, depth=DEPTH, rate=None):
+    latencies = []
+    stop_at = time.perf_counter() + duration
+    start = time.perf_counter()
+    sent = await asyncio.gather(*(producer(address, i, lines, stop_at, depth, rate, latencies)
+                                  for i in range(n_streams)))
+    elapsed = time.perf_counter() - start
+    latencies = np.asarray(latencies) * 1e3
+    return {"readings": int(sum(sent)), "readings_per_s": len(latencies) / elapsed,
+            "p50_ms": float(np.percentile(latencies, 50)), "p99_ms": float(np.percentile(latencies, 99))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput/latency benchmark of inference_service.py")
+    parser.add_argument("--address", default=ADDRESS)
+    parser.add_argument("--duration", type=float, default=DURATION)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    model = ServiceModel()
+    df = pd.read_csv(DATA_PATH).dropna()
+    lines = [line.encode() for line in to_lines(df[model.input_columns])]
+    pools = [pool for pool in POOLS if pool is None or args.workers > 1]
+
+    results = {"cpus": os.cpu_count(), "baseline": baseline(model, lines), "closed": [], "open": []}
+    print(f"One process per rig (parse + predict_one): {results['baseline']['readings_per_s']:,.0f} readings/s "
+          f"per core, {results['baseline']['us_per_reading']:.0f} us per reading")
+
+    print(f"\nClosed loop, {DEPTH} readings in flight per stream")
+    print(f"{'pool':<8} {'streams':>7} {'deadline':>9} {'readings/s':>11} {'p50':>9} {'p99':>9}  batches")
+    for pool in pools:
+        for delay_ms in DELAYS_MS:
+            for n_streams in STREAMS:
+                process = start_service(args.address, delay_ms, pool, args.workers)
+                try:
+                    result = asyncio.run(load(args.address, lines, n_streams, args.duration))
+                finally:
+                    service = stop_service(process)
+                result.update({"pool": pool, "streams": n_streams, "delay_ms": delay_ms, "service": service})
+                results["closed"].append(result)
+                print(f"{pool or '-':<8} {n_streams:>7} {delay_ms:>6g} ms {result['readings_per_s']:>11,.0f} "
+                      f"{result['p50_ms']:>6.2f} ms {result['p99_ms']:>6.2f} ms  {service.partition('readings in ')[2]}")
+
+    print(f"\nOpen loop, {OPEN_STREAMS} streams x {RATE} readings/s")
+    print(f"{'pool':<8} {'deadline':>9} {'readings/s':>11} {'p50':>9} {'p99':>9}  batches")
+    for pool in pools:
+        for delay_ms in DELAYS_MS:
+            process = start_service(args.address, delay_ms, pool, args.workers)
+            try:
+                result = asyncio.run(load(args.address, lines, OPEN_STREAMS, args.duration, rate=RATE))
+            finally:
+                service = stop_service(process)
+            result.update({"pool": pool, "streams": OPEN_STREAMS, "rate": RATE, "delay_ms": delay_ms, "service": service})
+            results["open"].append(result)
+            print(f"{pool or '-':<8} {delay_ms:>6g} ms {result['readings_per_s']:>11,.0f} "
+                  f"{result['p50_ms']:>6.2f} ms {result['p99_ms']:>6.2f} ms  {service.partition('readings in ')[2]}")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=1)
+        print(f"\nResults saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import joblib
+import pandas as pd
+from compiled_forest import export_pipeline
+from sensors import LABELS, SENSOR_ALIASES
+from bench_predict import DATA_PATH, load_model, to_lines
+
+# Cold-start benchmark: time from interpreter launch to the first classified reading
+N_RUNS = 5
+
+# What predict.py did before the compiled artifact: import pandas + sklearn,
+# unpickle the pipeline and read the training CSV for the feature order
+LEGACY_STARTUP = """
+import sys, joblib, pandas as pd
+model = joblib.load(sys.argv[1])
+feature_columns = pd.read_csv(sys.argv[3]).drop(columns=["Label"]).columns
+line = sys.argv[4]
+data = {kv.split(":")[0]: float(kv.split(":")[1]) for kv in line.replace("Data;", "").split(";") if ":" in kv}
+model.predict(pd.DataFrame([data]).reindex(columns=feature_columns, fill_value=0))
+"""
+
+# predict.py with the self-describing compiled artifact
+COMPILED_STARTUP = """
+import sys
+from compiled_forest import CompiledForest
+from frameparser import RecordParser
+predictor = CompiledForest.load(sys.argv[2])
+parser = RecordParser(predictor.feature_names, aliases=predictor.aliases)
+row = parser.new_row()
+parser.parse_into(sys.argv[4], row[0])
+predictor.predict_one(row)
+"""
+
+
+def time_runs(code, args):
+    times = []
+    for _ in range(N_RUNS):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code] + args, check=True,
+                       cwd=os.path.dirname(os.path.abspath(__file__)))
+        times.append(time.perf_counter() - start)
+    return min(times), sorted(times)[len(times) // 2]
+
+
+def main():
+    df = pd.read_csv(DATA_PATH).dropna()
+    X = df.drop(columns=["Label"])
+    model = load_model(X, df["Label"])
+    line = to_lines(X.head(1))[0]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pickle_path = os.path.join(tmp, "model.pkl")
+        compiled_path = os.path.join(tmp, "model")
+        joblib.dump(model, pickle_path)
+        export_pipeline(model, compiled_path, feature_names=list(X.columns),
+                        labels=LABELS, aliases=SENSOR_ALIASES)
+        args = [pickle_path, compiled_path, os.path.abspath(DATA_PATH), line]
+
+        print(f"Cold start to first prediction (best / median of {N_RUNS} runs)")
+        for name, code in (("python -c pass", "pass"),
+                           ("pickle + CSV", LEGACY_STARTUP),
+                           ("compiled artifact", COMPILED_STARTUP)):
+            best, median = time_runs(code, args)
+            print(f"{name:<20} {best * 1e3:8.1f} ms   {median * 1e3:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,495 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+import CSVprocess
+from bench_predict import to_lines
+from compiled_forest import CompiledForest, export_pipeline
+from dataset import build_dataset, load_dataset
+from frameparser import FrameReassembler, RecordParser
+from inference import ArrayPredictor
+from openset import OpenSetScorer
+from search import HalvingSearch
+from sensors import SENSOR_ALIASES
+
+# Offline benchmark suite: parsing, txt -> CSV conversion, dataset assembly,
+# loading, search and fit time, model load time and prediction latency, on
+# latest.csv and synthetic scale-ups of it. Results go to a JSON file so runs
+# can be compared across commits and machines:
+#
+#   python bench_suite.py                      # scales 1 10 100 1000
+#   python bench_suite.py --scales 1 10        # quicker
+#   python bench_suite.py --compare bench_results/old.json    # run, then compare
+#   python bench_suite.py --compare old.json new.json         # compare only
+
+DATA_PATH = "latest.csv"
+RESULTS_PATH = "bench_results"
+SCALES = [1, 10, 100, 1000]
+SEED = 0
+
+# Largest synthetic dataset (rows) some benchmarks run on; bigger scales are
+# recorded as skipped. Everything else streams one tile at a time.
+MAX_ROWS = {
+    "legacy_combine": 400_000,  # Old combined.py: every CSV in memory at once
+    "peak_memory": 100_000,  # tracemalloc slows pandas ~10x, so peaks are traced in a second run
+    "search": 4_000,  # Successive-halving search, 5 folds
+    "train": 40_000,  # Single forest fit (and the models benchmarked below)
+}
+
+TRAIN_PARAMS = {"n_estimators": 100, "random_state": 42}
+SEARCH_GRID = {
+    "randomforestclassifier__n_estimators": [50, 100],
+    "randomforestclassifier__max_depth": [None, 10],
+    "randomforestclassifier__min_samples_leaf": [1, 5],
+}
+
+FRAGMENT_SIZE = 244  # Bytes per read when timing reassembly (BLE 4.2 payload)
+N_LATENCY = 1000  # Single-reading predictions timed per path
+N_LATENCY_SKLEARN = 200  # The DataFrame path is ~100x slower
+BATCH_SIZE = 64
+REPEATS = 3  # Best-of for load times
+
+# Metrics describing the workload rather than its speed, left out of --compare
+SIZE_METRICS = {"n", "rows", "lines", "files", "trees", "nodes", "candidates", "trees_fitted"}
+
+# Relative change reported as a regression/improvement by --compare
+COMPARE_THRESHOLD = 0.10
+
+
+class ScaledData:
+    """latest.csv tiled `scale` times, produced one tile at a time so the
+    large scales never have to fit in memory. Every tile after the first gets
+    a little seeded jitter (1% of each column's spread, integers rounded), so
+    the copies aren't identical rows."""
+
+    def __init__(self, base, scale, seed=SEED):
+        self.base = base
+        self.scale = scale
+        self.seed = seed
+        self.rows = len(base) * scale
+        self.columns = list(base.columns.drop("Label"))
+        self._spread = base[self.columns].std().to_numpy() * 0.01
+        self._integer = [pd.api.types.is_integer_dtype(base[column]) for column in self.columns]
+
+    def tiles(self):
+        rng = np.random.default_rng(self.seed)
+        for i in range(self.scale):
+            tile = self.base.copy()
+            if i:
+                noise = rng.normal(0.0, 1.0, (len(tile), len(self.columns))) * self._spread
+                for j, column in enumerate(self.columns):
+                    values = tile[column].to_numpy() + noise[:, j]
+                    tile[column] = np.round(values).astype(tile[column].dtype) if self._integer[j] else values
+            yield tile
+
+    def frame(self):
+        return pd.concat(self.tiles(), ignore_index=True)
+
+
+def latency(seconds):
+    values = np.asarray(seconds) * 1e6
+    return {"p50_us": float(np.percentile(values, 50)), "p99_us": float(np.percentile(values, 99)),
+            "mean_us": float(values.mean()), "n": len(values)}
+
+
+def timed(function):
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def peak_mb(function):
+    """Peak Python/NumPy allocation (MB) during one call."""
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+
+
+def best_of(function, repeats=REPEATS):
+    return min(timed(function) for _ in range(repeats))
+
+
+def size_mb(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path) / 1e6
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, names in os.walk(path) for name in names) / 1e6
+
+
+def bench_parse(data):
+    """Complete 'Data;...' lines through RecordParser, and the same bytes cut
+    into FRAGMENT_SIZE reads through FrameReassembler + RecordParser."""
+    parser = RecordParser(data.columns)
+    row = parser.new_row()[0]
+    line_seconds = stream_seconds = 0.0
+    n_bytes = 0
+    for tile in data.tiles():
+        lines = [line.encode() for line in to_lines(tile[data.columns])]
+        start = time.perf_counter()
+        for line in lines:
+            parser.parse_into(line, row)
+        line_seconds += time.perf_counter() - start
+
+        payload = b"\n".join(lines) + b"\n"
+        n_bytes += len(payload)
+        fragments = [payload[i:i + FRAGMENT_SIZE] for i in range(0, len(payload), FRAGMENT_SIZE)]
+        reassembler = FrameReassembler()
+        start = time.perf_counter()
+        for fragment in fragments:
+            for frame in reassembler.feed(fragment):
+                parser.parse_into(frame, row)
+        stream_seconds += time.perf_counter() - start
+    return {"lines": data.rows, "lines_per_s": data.rows / line_seconds,
+            "stream_lines_per_s": data.rows / stream_seconds, "stream_mb_per_s": n_bytes / 1e6 / stream_seconds}
+
+
+def bench_convert(data, work):
+    """CSVprocess.convert_file on capture-format session files, one per tile
+    (written, converted and deleted in turn, so disk use stays flat)."""
+    inverse = {column: key for key, column in SENSOR_ALIASES.items()}
+    keys = [inverse.get(column, column) for column in data.columns]
+    folder = os.path.join(work, "sessions")
+    os.makedirs(folder, exist_ok=True)
+    seconds = 0.0
+    rows = n_bytes = 0
+    for i, tile in enumerate(data.tiles()):
+        path = os.path.join(folder, f"reading_{i:05d}.txt")
+        with open(path, "w") as file:
+            file.write("Recording Session: 2026-01-01 00:00:00\n" + "-" * 50 + "\n")
+            for j, values in enumerate(tile[data.columns].itertuples(index=False)):
+                pairs = ";".join(f"{key}:{value}" for key, value in zip(keys, values))
+                file.write(f"2026-01-01 00:00:{j % 60:02d}.000: Data;BME688:0;{pairs};GMWIN:0\n")
+        n_bytes += os.path.getsize(path)
+        start = time.perf_counter()
+        rows += CSVprocess.convert_file(path)[1]
+        seconds += time.perf_counter() - start
+        os.remove(path)
+        os.remove(os.path.splitext(path)[0] + ".csv")
+    return {"files": data.scale, "rows": rows, "rows_per_s": rows / seconds, "mb_per_s": n_bytes / 1e6 / seconds}
+
+
+def write_class_files(data, work):
+    """Per-class recordings, as combined.py reads them, and their config."""
+    paths = {}
+    for tile in data.tiles():
+        for label, rows in tile.groupby("Label"):
+            path = paths.setdefault(int(label), os.path.join(work, f"class_{int(label)}.csv"))
+            rows.drop(columns="Label").to_csv(path, mode="a", index=False, header=not os.path.exists(path))
+    return {"classes": [{"label": label, "name": str(label), "files": [path]} for label, path in paths.items()]}
+
+
+def bench_assemble(data, work):
+    """combined.py: streamed into the columnar dataset plus latest.csv, and
+    (up to MAX_ROWS["legacy_combine"]) the old read-everything-and-concat."""
+    config = write_class_files(data, work)
+    csv_path = os.path.join(work, "combined.csv")
+    dataset_path = os.path.join(work, "dataset")
+    build = lambda: build_dataset(config, dataset_path, csv_path=csv_path)
+    seconds = timed(build)
+    metrics = {"rows": data.rows, "seconds": seconds, "rows_per_s": data.rows / seconds,
+               "dataset_mb": size_mb(dataset_path), "csv_mb": size_mb(csv_path)}
+    traced = data.rows <= MAX_ROWS["peak_memory"]
+    if traced:
+        metrics["peak_mb"] = peak_mb(build)
+    if data.rows <= MAX_ROWS["legacy_combine"]:
+        def legacy():
+            frames = []
+            for entry in config["classes"]:
+                frame = pd.read_csv(entry["files"][0])
+                frame["Label"] = entry["label"]
+                frames.append(frame)
+            pd.concat(frames, ignore_index=True).to_csv(os.path.join(work, "legacy.csv"), index=False)
+        metrics["legacy_seconds"] = timed(legacy)
+        if traced:
+            metrics["legacy_peak_mb"] = peak_mb(legacy)
+    return metrics
+
+
+def bench_load(data, work):
+    """Training data load: the combined CSV vs the memory-mapped dataset."""
+    csv_path = os.path.join(work, "combined.csv")
+    dataset_path = os.path.join(work, "dataset")
+    loaders = {
+        "csv": lambda: pd.read_csv(csv_path).dropna(),
+        "mmap": lambda: load_dataset(dataset_path),
+        "float32": lambda: load_dataset(dataset_path)[0].to_numpy(dtype=np.float32),  # Touches every page
+    }
+    metrics = {"rows": data.rows}
+    for name, load in loaders.items():
+        metrics[f"{name}_seconds"] = best_of(load)
+        if data.rows <= MAX_ROWS["peak_memory"]:
+            metrics[f"{name}_peak_mb"] = peak_mb(load)
+    return metrics
+
+
+def training_split(data, work):
+    X, y, _ = load_dataset(os.path.join(work, "dataset"))
+    order = np.random.default_rng(SEED).permutation(len(y))
+    return X.iloc[order].reset_index(drop=True), y.iloc[order].reset_index(drop=True)
+
+
+def bench_search(X, y):
+    search = HalvingSearch(SEARCH_GRID, cv=5, factor=3, random_state=42, n_jobs=1, verbose=0)
+    seconds = timed(lambda: search.fit(X, y))
+    return {"rows": len(y), "seconds": seconds, "trees_fitted": search.n_trees_fitted_,
+            "candidates": int(np.prod([len(values) for values in SEARCH_GRID.values()]))}
+
+
+def bench_train(X, y, work):
+    model = make_pipeline(StandardScaler(), RandomForestClassifier(**TRAIN_PARAMS))
+    seconds = timed(lambda: model.fit(X, y))
+    joblib.dump(model, os.path.join(work, "model.pkl"))
+    model.openset_ = OpenSetScorer.fit(X, y)
+    export_pipeline(model, os.path.join(work, "model"), feature_names=list(X.columns), openset=model.openset_)
+    nodes = sum(estimator.tree_.node_count for estimator in model[-1].estimators_)
+    return model, {"rows": len(y), "seconds": seconds, "rows_per_s": len(y) / seconds, "trees": TRAIN_PARAMS["n_estimators"],
+                   "nodes": nodes}
+
+
+def bench_model_load(work):
+    pickle_path = os.path.join(work, "model.pkl")
+    compiled_path = os.path.join(work, "model")
+    return {"pickle_ms": best_of(lambda: joblib.load(pickle_path)) * 1e3,
+            "compiled_ms": best_of(lambda: CompiledForest.load(compiled_path)) * 1e3,
+            "pickle_mb": size_mb(pickle_path), "compiled_mb": size_mb(compiled_path)}
+
+
+def bench_predict(model, X, work):
+    """Single-reading latency per path, and per-reading latency in batches."""
+    forest = CompiledForest.load(os.path.join(work, "model"))
+    predictor = ArrayPredictor(model, batch_size=BATCH_SIZE)
+    parser = RecordParser(list(X.columns))
+    row = parser.new_row()
+    rng = np.random.default_rng(SEED)
+    rows = X.to_numpy(dtype=np.float32)[rng.choice(len(X), N_LATENCY)]
+    lines = [line.encode() for line in to_lines(pd.DataFrame(rows, columns=X.columns))]
+
+    def line_to_label(i):
+        parser.parse_into(lines[i], row[0])
+        if not forest.openset.is_unknown_one(row):
+            forest.predict_one(row)
+
+    frames = [pd.DataFrame(value[None, :], columns=X.columns) for value in rows[:N_LATENCY_SKLEARN]]
+    paths = {
+        "compiled": lambda i: forest.predict_one(rows[i:i + 1]),
+        "array_predictor": lambda i: predictor.predict_one(rows[i:i + 1]),
+        "sklearn_pipeline": lambda i: model.predict(frames[i]),
+        "openset": lambda i: forest.openset.score_one(rows[i:i + 1]),
+        "line_to_label": line_to_label,
+    }
+    for function in paths.values():  # Warm-up
+        function(0)
+    # Paths take turns on each reading, so drift in machine load hits them all alike
+    timings = {name: [] for name in paths}
+    for i in range(N_LATENCY):
+        for name, function in paths.items():
+            if name == "sklearn_pipeline" and i >= N_LATENCY_SKLEARN:
+                continue
+            start = time.perf_counter()
+            function(i)
+            timings[name].append(time.perf_counter() - start)
+    metrics = {name: latency(values) for name, values in timings.items()}
+    batches = [rows[i:i + BATCH_SIZE] for i in range(0, len(rows) - BATCH_SIZE + 1, BATCH_SIZE)]
+    for name, function in (("compiled_batch", forest.predict), ("array_predictor_batch", predictor.predict)):
+        timings = []
+        for batch in batches:
+            start = time.perf_counter()
+            function(batch)
+            timings.append((time.perf_counter() - start) / BATCH_SIZE)
+        metrics[name] = latency(timings)
+    return metrics
+
+
+def run_scale(base, scale, results):
+    data = ScaledData(base, scale)
+    work = tempfile.mkdtemp(prefix=f"bench_suite_{scale}x_")
+
+    def record(name, function):
+        print(f"  {name:<12}", end="", flush=True)
+        start = time.perf_counter()
+        metrics = function()
+        results.append({"benchmark": name, "scale": scale, "rows": data.rows, "metrics": metrics})
+        print(f" {time.perf_counter() - start:7.1f} s   {headline(name, metrics)}")
+        return metrics
+
+    def skip(name, limit):
+        results.append({"benchmark": name, "scale": scale, "rows": data.rows,
+                        "skipped": f"{data.rows} rows > MAX_ROWS[{limit!r}] = {MAX_ROWS[limit]}"})
+        print(f"  {name:<12} skipped ({data.rows} rows > {MAX_ROWS[limit]})")
+
+    print(f"\n{scale}x ({data.rows} rows)")
+    try:
+        record("parse", lambda: bench_parse(data))
+        record("convert", lambda: bench_convert(data, work))
+        record("assemble", lambda: bench_assemble(data, work))
+        record("load", lambda: bench_load(data, work))
+        if data.rows > MAX_ROWS["train"]:
+            for name in ("search", "train", "model_load", "predict"):
+                skip(name, "search" if name == "search" else "train")
+            return
+        X, y = training_split(data, work)
+        if data.rows <= MAX_ROWS["search"]:
+            record("search", lambda: bench_search(X, y))
+        else:
+            skip("search", "search")
+        model = None
+
+        def train():
+            nonlocal model
+            model, metrics = bench_train(X, y, work)
+            return metrics
+        record("train", train)
+        record("model_load", lambda: bench_model_load(work))
+        record("predict", lambda: bench_predict(model, X, work))
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def headline(name, metrics):
+    """One-line summary printed while the suite runs."""
+    if name == "parse":
+        return f"{metrics['lines_per_s']:,.0f} lines/s, {metrics['stream_lines_per_s']:,.0f} lines/s from {FRAGMENT_SIZE}-byte reads"
+    if name == "convert":
+        return f"{metrics['rows_per_s']:,.0f} rows/s, {metrics['mb_per_s']:.1f} MB/s"
+    if name == "assemble":
+        peak = f", peak {metrics['peak_mb']:.0f} MB" if "peak_mb" in metrics else ""
+        legacy = f", legacy combine {metrics['legacy_seconds']:.2f} s" if "legacy_seconds" in metrics else ""
+        return f"{metrics['seconds']:.2f} s{peak}{legacy}"
+    if name == "load":
+        return (f"CSV {metrics['csv_seconds']:.3f} s, mmap {metrics['mmap_seconds']:.4f} s, "
+                f"float32 {metrics['float32_seconds']:.3f} s")
+    if name == "search":
+        return f"{metrics['seconds']:.1f} s, {metrics['trees_fitted']} trees fitted"
+    if name == "train":
+        return f"{metrics['seconds']:.2f} s, {metrics['nodes']} nodes"
+    if name == "model_load":
+        return f"pickle {metrics['pickle_ms']:.1f} ms, compiled {metrics['compiled_ms']:.1f} ms"
+    if name == "predict":
+        return (f"compiled p50 {metrics['compiled']['p50_us']:.0f} us / p99 {metrics['compiled']['p99_us']:.0f} us, "
+                f"batch {metrics['compiled_batch']['p50_us']:.1f} us/reading, "
+                f"line->label p50 {metrics['line_to_label']['p50_us']:.0f} us")
+    return ""
+
+
+def git(*args):
+    try:
+        return subprocess.run(["git", *args], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment(scales):
+    status = git("status", "--porcelain", "--untracked-files=no")
+    return {
+        "started": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "commit": git("rev-parse", "HEAD"),
+        "dirty": bool(status) if status is not None else None,
+        "host": socket.gethostname(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "sklearn": sklearn.__version__,
+        "data": DATA_PATH,
+        "scales": scales,
+        "max_rows": MAX_ROWS,
+    }
+
+
+def flatten(metrics, prefix=""):
+    flat = {}
+    for key, value in metrics.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def higher_is_better(metric):
+    return metric.endswith("_per_s")
+
+
+def compare(old, new):
+    """Prints every metric present in both runs with its relative change,
+    flagging moves beyond COMPARE_THRESHOLD."""
+    print(f"\nComparing {(old['environment']['commit'] or '?')[:8]}@{old['environment']['host']} ({old['environment']['started']})"
+          f" -> {(new['environment']['commit'] or '?')[:8]}@{new['environment']['host']} ({new['environment']['started']})")
+    before = {(result["benchmark"], result["scale"]): flatten(result["metrics"])
+              for result in old["results"] if "metrics" in result}
+    regressions = 0
+    for result in new["results"]:
+        previous = before.get((result["benchmark"], result["scale"]))
+        if previous is None or "metrics" not in result:
+            continue
+        for metric, value in flatten(result["metrics"]).items():
+            if metric.rsplit(".", 1)[-1] in SIZE_METRICS or not previous.get(metric):
+                continue
+            change = value / previous[metric] - 1
+            better = change > 0 if higher_is_better(metric) else change < 0
+            flag = ""
+            if abs(change) > COMPARE_THRESHOLD:
+                flag = "  better" if better else "  WORSE"
+                regressions += not better
+            print(f"  {result['benchmark']:<11} {result['scale']:>5}x  {metric:<32} "
+                  f"{previous[metric]:>14.4g} -> {value:<14.4g} {change:+7.1%}{flag}")
+    print(f"{regressions} metrics worse by more than {COMPARE_THRESHOLD:.0%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark suite (results as JSON)")
+    parser.add_argument("--scales", type=int, nargs="+", default=SCALES, help="dataset scale-ups (default %(default)s)")
+    parser.add_argument("--output", help=f"results file (default {RESULTS_PATH}/<date>_<commit>_<host>.json)")
+    parser.add_argument("--compare", nargs="+", metavar="RESULTS",
+                        help="compare with a previous results file; with two files, compare them without running")
+    args = parser.parse_args()
+
+    if args.compare and len(args.compare) == 2:
+        with open(args.compare[0]) as old, open(args.compare[1]) as new:
+            compare(json.load(old), json.load(new))
+        return
+
+    base = pd.read_csv(DATA_PATH).dropna().reset_index(drop=True)
+    env = environment(args.scales)
+    print(f"{len(base)} readings in {DATA_PATH}; commit {(env['commit'] or '?')[:8]}"
+          f"{' (dirty)' if env['dirty'] else ''} on {env['host']}, {env['cpus']} CPUs")
+    results = []
+    for scale in args.scales:
+        run_scale(base, scale, results)
+
+    run = {"environment": env, "results": results}
+    output = args.output or os.path.join(
+        RESULTS_PATH, f"{time.strftime('%Y%m%d_%H%M%S')}_{(env['commit'] or 'nogit')[:8]}_{env['host']}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(run, file, indent=1)
+    print(f"\nResults saved to {output}")
+
+    if args.compare:
+        with open(args.compare[0]) as file:
+            compare(json.load(file), run)
+
+
+if __name__ == "__main__":
+    main()
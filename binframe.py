@@ -0,0 +1,95 @@
+import struct
+import zlib
+from sensors import FEATURE_COLUMNS
+
+# Compact binary alternative to the 'Data;KEY:VAL;...' text frames.
+#
+# Layout (little-endian):
+#   magic   u8    0xA5, never the first byte of a text frame (not ASCII)
+#   version u8    FORMAT_VERSION
+#   seq     u16   frame counter, wraps at 65536 (gaps = lost frames)
+#   schema  u8    key of SCHEMAS: which channels follow and how they're packed
+#   values        packed per the schema
+#   crc     u32   zlib.crc32 of everything before it
+#
+# A 15-channel reading is 43 bytes instead of ~170 as text, so it fits one
+# BLE notification once the MTU is raised, and decoding is a single unpack.
+
+MAGIC = 0xA5
+MAGIC_BYTE = bytes([MAGIC])
+FORMAT_VERSION = 1
+
+HEADER = struct.Struct("<BBHB")
+CRC = struct.Struct("<I")
+
+# Channel layouts by schema ID: (key, struct code). Raw ADC ticks are
+# unsigned, the STC readings are floats, everything else fits int16.
+SCHEMAS = {
+    # Training columns (serial firmware, latest.csv)
+    1: list(zip(FEATURE_COLUMNS, ["H", "H", "h", "h", "f", "f", "h", "h", "h", "h", "h", "h", "h", "h", "h"])),
+    # BLE firmware keys (CSVprocess.py)
+    2: [("BME688", "f"), ("SGPVRaw", "H"), ("SGPNRaw", "H"), ("SGPVin", "h"), ("SGPNin", "h"),
+        ("STCCO2", "f"), ("ENSVoc", "h"), ("MiCO", "h"), ("MiNO2", "h"), ("MiNH3", "h"),
+        ("GMVOC", "h"), ("GNH2S", "h"), ("GMSMO", "h"), ("GMETH", "h"), ("GMWIN", "h")],
+}
+
+# Payload structs and full frame sizes, built once per schema
+PAYLOADS = {schema_id: struct.Struct("<" + "".join(code for _, code in channels))
+            for schema_id, channels in SCHEMAS.items()}
+FRAME_SIZES = {schema_id: HEADER.size + payload.size + CRC.size for schema_id, payload in PAYLOADS.items()}
+
+
+class FrameError(ValueError):
+    """Raised for binary frames that are truncated, corrupt or of an unknown schema."""
+
+
+def is_binary(frame):
+    return len(frame) > 0 and frame[0] == MAGIC
+
+
+def frame_size(buffer, start=0):
+    """Size of the binary frame starting at buffer[start], None if the header
+    hasn't fully arrived yet, or -1 if it isn't a valid header."""
+    if len(buffer) - start < HEADER.size:
+        return None
+    magic, version, _, schema_id = HEADER.unpack_from(buffer, start)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        return -1
+    return FRAME_SIZES.get(schema_id, -1)
+
+
+def crc_ok(frame):
+    """True if the CRC at the end of `frame` matches the bytes before it."""
+    return zlib.crc32(memoryview(frame)[:-CRC.size]) == CRC.unpack_from(frame, len(frame) - CRC.size)[0]
+
+
+def encode(values, seq=0, schema_id=1):
+    """Reference encoder (what the firmware sends). `values` is a dict keyed
+    by channel name (missing channels are sent as 0) or a sequence in schema
+    order."""
+    channels = SCHEMAS[schema_id]
+    if isinstance(values, dict):
+        values = [values.get(name, 0) for name, _ in channels]
+    values = [float(value) if code == "f" else int(round(float(value)))
+              for value, (_, code) in zip(values, channels)]
+    body = HEADER.pack(MAGIC, FORMAT_VERSION, seq & 0xFFFF, schema_id) + PAYLOADS[schema_id].pack(*values)
+    return body + CRC.pack(zlib.crc32(body))
+
+
+def decode(frame):
+    """Returns (seq, schema_id, values) for a binary frame, values in schema order."""
+    if len(frame) < HEADER.size:
+        raise FrameError(f"Truncated binary frame ({len(frame)} bytes)")
+    magic, version, seq, schema_id = HEADER.unpack_from(frame)
+    if magic != MAGIC or version != FORMAT_VERSION or schema_id not in PAYLOADS:
+        raise FrameError(f"Unknown binary frame version {version} / schema {schema_id}")
+    if len(frame) != FRAME_SIZES[schema_id] or not crc_ok(frame):
+        raise FrameError(f"Corrupt binary frame ({len(frame)} bytes, schema {schema_id})")
+    return seq, schema_id, PAYLOADS[schema_id].unpack_from(frame, HEADER.size)
+
+
+def to_text(frame):
+    """Renders a binary frame as the equivalent 'Data;KEY:VAL;...' text line,
+    so capture files stay readable by CSVprocess.py."""
+    _, schema_id, values = decode(frame)
+    return "Data;" + ";".join(f"{name}:{value:g}" for (name, _), value in zip(SCHEMAS[schema_id], values))
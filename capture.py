@@ -0,0 +1,217 @@
+import asyncio
+import os
+import time
+from datetime import datetime
+import binframe
+import metrics
+from frameparser import FrameReassembler
+
+
+def format_timestamp(timestamp):
+    """Formats a time.time() value the way the capture files always have."""
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+
+
+def frame_text(frame):
+    """Text of one received frame; binary frames are written out as the
+    equivalent Data; line so session files keep a single format."""
+    if binframe.is_binary(frame):
+        try:
+            return binframe.to_text(frame)
+        except binframe.FrameError:
+            return ""
+    return frame.decode("utf-8", errors="replace").strip()
+
+
+class FragmentFramer:
+    """Joins BLE notification fragments into full messages. A message ends at a
+    newline or at the ";GMWIN:" key the firmware sends last; binary frames
+    are cut by their size."""
+
+    def __init__(self, end_marker=b";GMWIN:"):
+        self.reassembler = FrameReassembler(end_marker=end_marker)
+
+    def feed(self, timestamp, data, source=None):
+        messages = []
+        for frame in self.reassembler.feed(data):
+            message = frame_text(frame)
+            if message:
+                messages.append((timestamp, message))
+        return messages
+
+
+class NotificationFramer:
+    """Treats every notification as one complete message."""
+
+    def feed(self, timestamp, data, source=None):
+        return [(timestamp, frame_text(bytes(data)))]
+
+
+class DeviceFramer:
+    """Keeps one reassembly buffer per device and tags every message with the
+    device it came from, so several devices can share one pipeline."""
+
+    def __init__(self, framer_factory=FragmentFramer):
+        self.framer_factory = framer_factory
+        self.framers = {}
+
+    def feed(self, timestamp, data, source=None):
+        framer = self.framers.get(source)
+        if framer is None:
+            framer = self.framers[source] = self.framer_factory()
+        return [(timestamp, f"[{source}] {message}") for timestamp, message in framer.feed(timestamp, data)]
+
+
+class SessionWriter:
+    """Appends timestamped messages to a text file. Runs on the writer thread,
+    never on the event loop."""
+
+    def __init__(self, file_path, header=None, timestamps=True, verbose=False):
+        self.file_path = file_path
+        self.header = header
+        self.timestamps = timestamps
+        self.verbose = verbose
+        self.records_written = 0
+        self._file = None
+
+    def write_batch(self, records):
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.file_path) or ".", exist_ok=True)
+            self._file = open(self.file_path, "a", encoding="utf-8")
+            if self.header:
+                self._file.write(self.header)
+        if self.timestamps:
+            lines = [f"{format_timestamp(timestamp)}: {message}\n" for timestamp, message in records]
+        else:
+            lines = [f"{message}\n" for _, message in records]
+        self._file.write("".join(lines))
+        self._file.flush()
+        if self.verbose:
+            for i, (_, message) in enumerate(records, self.records_written + 1):
+                print(f"\n📥 Message {i} received: {message}\n> ")
+        self.records_written += len(records)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class CapturePipeline:
+    """Shared capture path for the BLE scripts.
+
+    The notification callback only calls submit(), which timestamps the raw
+    frame and puts it on a bounded asyncio queue without ever blocking. A writer
+    task drains the queue in batches, frames them into messages and hands each
+    batch to the writer on a worker thread, so a slow disk never delays
+    notification handling. When the queue is full the frame is dropped and
+    counted; queue depth above `high_water` is reported as backpressure.
+    With `max_records`, the pipeline stops accepting frames once that many
+    messages have been written.
+
+    With metrics enabled, each frame's wait in the queue is recorded as the
+    "receive" stage, framing as "reassemble" and each batch write as "write".
+    """
+
+    def __init__(self, writer, framer=None, maxsize=4096, batch_size=64, max_records=None, high_water=0.8):
+        self.writer = writer
+        self.framer = framer or NotificationFramer()
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.batch_size = batch_size
+        self.max_records = max_records
+        self.high_water = int(maxsize * high_water)
+        self.metrics = metrics.get()
+
+        # Counters
+        self.frames_received = 0
+        self.frames_dropped = 0
+        self.records_written = 0
+        self.batches_written = 0
+        self.backpressure_events = 0
+        self.max_queue_depth = 0
+        self.max_write_seconds = 0.0
+
+        self.done = asyncio.Event()
+        self._task = None
+        self._under_pressure = False
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    def submit(self, data, source=None):
+        """Queues one raw notification. Safe to call from the BLE callback.
+        `source` identifies the sending device when several share the pipeline."""
+        if self.done.is_set():
+            return False
+        self.frames_received += 1
+        self.metrics.count("frames")
+        try:
+            self.queue.put_nowait((time.time(), self.metrics.now(), source, bytes(data)))
+        except asyncio.QueueFull:
+            self.frames_dropped += 1
+            self.metrics.count("drops")
+            return False
+        depth = self.queue.qsize()
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+        if depth >= self.high_water and not self._under_pressure:
+            self._under_pressure = True
+            self.backpressure_events += 1
+            self.metrics.count("backpressure_events")
+        return True
+
+    async def _run(self):
+        stages = self.metrics
+        try:
+            while True:
+                frames = [await self.queue.get()]
+                while len(frames) < self.batch_size and not self.queue.empty():
+                    frames.append(self.queue.get_nowait())
+                if self._under_pressure and self.queue.qsize() < self.high_water // 2:
+                    self._under_pressure = False
+
+                records = []
+                for timestamp, stamp, source, data in frames:
+                    start = stages.lap("receive", stamp)
+                    records.extend(self.framer.feed(timestamp, data, source))
+                    stages.lap("reassemble", start)
+                if self.max_records is not None:
+                    records = records[:self.max_records - self.records_written]
+                if records:
+                    start = time.monotonic()
+                    stamp = stages.now()
+                    await asyncio.to_thread(self.writer.write_batch, records)
+                    stages.lap("write", stamp)
+                    self.max_write_seconds = max(self.max_write_seconds, time.monotonic() - start)
+                    self.records_written += len(records)
+                    self.batches_written += 1
+                    stages.count("records", len(records))
+                for _ in frames:
+                    self.queue.task_done()
+                if self.max_records is not None and self.records_written >= self.max_records:
+                    break
+        finally:
+            self.done.set()
+            await asyncio.to_thread(self.writer.close)
+
+    async def stop(self):
+        """Writes everything still queued, then closes the writer."""
+        if self._task is None:
+            return
+        if not self._task.done():
+            # The task may also finish on its own (max_records) with frames left queued
+            drained = asyncio.create_task(self.queue.join())
+            await asyncio.wait([drained, self._task], return_when=asyncio.FIRST_COMPLETED)
+            drained.cancel()
+            self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    def stats(self):
+        return (f"{self.frames_received} frames received, {self.frames_dropped} dropped, "
+                f"{self.records_written} records written in {self.batches_written} batches, "
+                f"max queue depth {self.max_queue_depth}, {self.backpressure_events} backpressure events, "
+                f"slowest write {self.max_write_seconds * 1e3:.1f} ms")
@@ -0,0 +1,222 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import numpy as np
+from compiled_forest import CompiledForest, export_pipeline
+
+# Confidence-gated cascade: a single shallow tree answers the readings it is
+# confident about, and only the rest go through the full forest.
+#
+# The first stage is compiled in the same format as the full model and kept
+# in its first_stage/ subdirectory, with the calibrated threshold and a hash
+# of the full forest in cascade.json. Models without one (or whose full
+# forest has since changed) run as before.
+
+FIRST_STAGE_DIRNAME = "first_stage"
+META_FILENAME = "cascade.json"
+
+# One tree on all features (a plain decision tree): a single tree is walked
+# with Python scalars (FirstStage), about 1 us per reading, where the NumPy
+# evaluator costs a few us per level whatever the number of trees
+FIRST_STAGE_PARAMS = {"n_estimators": 1, "max_depth": 8, "max_features": None, "bootstrap": False}
+
+# Arrays of the full forest whose content the first stage is tied to
+HASHED_ARRAYS = ("threshold", "value")
+
+# Accuracy the first stage must reach on the readings it answers, measured out
+# of fold on the training data
+MIN_EARLY_ACCURACY = 0.999
+CV = 5
+
+# The first stage never answers with less than half its probability on one class
+MIN_THRESHOLD = 0.5
+
+# Thresholds on the trade-off curve printed by the training script
+CURVE_THRESHOLDS = (0.5, 0.6, 0.7, 0.8, 0.9, 0.95, 0.99, 1.0)
+
+
+def fit_first_stage(X, y, params=FIRST_STAGE_PARAMS, cv=CV, random_state=42):
+    """Fits the first-stage pipeline on X, y and returns it with its
+    out-of-fold class probabilities (for calibration)."""
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.model_selection import cross_val_predict
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import StandardScaler
+    pipeline = make_pipeline(StandardScaler(), RandomForestClassifier(random_state=random_state, **params))
+    proba = cross_val_predict(pipeline, X, y, cv=cv, method="predict_proba")
+    return pipeline.fit(X, y), proba
+
+
+def calibrate(proba, y, classes, min_accuracy=MIN_EARLY_ACCURACY, min_threshold=MIN_THRESHOLD):
+    """Lowest confidence threshold (at least `min_threshold`) at which the
+    first stage's answers are at least `min_accuracy` accurate, or None if no
+    threshold gets there.
+
+    Readings are ranked by confidence (top class probability); the threshold
+    is the confidence of the last one in the longest prefix that is accurate
+    enough, never splitting readings of equal confidence.
+    """
+    confidence = proba.max(axis=1)
+    correct = np.asarray(classes)[proba.argmax(axis=1)] == np.asarray(y)
+    order = np.argsort(-confidence, kind="stable")
+    confidence, correct = confidence[order], correct[order]
+    accuracy = np.cumsum(correct) / np.arange(1, len(correct) + 1)
+    # Only cut where the confidence changes, so ties are taken or left together
+    cut = np.append(confidence[1:] != confidence[:-1], True)
+    ok = np.flatnonzero(cut & (accuracy >= min_accuracy) & (confidence >= min_threshold))
+    if not len(ok):
+        return None
+    return float(confidence[ok[-1]])
+
+
+def forest_digest(path):
+    """sha1 of the full forest's thresholds and leaf values as saved in `path`."""
+    digest = hashlib.sha1()
+    for name in HASHED_ARRAYS:
+        with open(os.path.join(path, name + ".npy"), "rb") as file:
+            for chunk in iter(lambda: file.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def time_per_reading(model, rows):
+    """Mean seconds of predict_one() over `rows`."""
+    model.predict_one(rows[0])
+    start = time.perf_counter()
+    for row in rows:
+        model.predict_one(row)
+    return (time.perf_counter() - start) / len(rows)
+
+
+def tradeoff(first_proba, classes, full_prediction, y, thresholds, first_seconds, full_seconds):
+    """Accuracy, share resolved early and expected per-reading cost of the
+    cascade at every threshold. The cost is the first stage for every reading
+    plus the full forest for those it passes on."""
+    confidence = first_proba.max(axis=1)
+    first_prediction = np.asarray(classes)[first_proba.argmax(axis=1)]
+    y = np.asarray(y)
+    curve = []
+    for threshold in thresholds:
+        early = confidence >= threshold
+        prediction = np.where(early, first_prediction, full_prediction)
+        seconds = first_seconds + (1 - early.mean()) * full_seconds
+        curve.append({"threshold": float(threshold), "early": float(early.mean()),
+                      "accuracy": float((prediction == y).mean()), "us_per_reading": seconds * 1e6,
+                      "readings_per_s": 1 / seconds})
+    return curve
+
+
+def export_first_stage(pipeline, path, threshold, full_meta, feature_names=None, labels=None, aliases=None,
+                       features=None, info=None):
+    """Compiles the first stage into `path`/first_stage/ with its threshold
+    and the full model it was calibrated against (already exported to `path`)."""
+    stage_path = os.path.join(path, FIRST_STAGE_DIRNAME)
+    shutil.rmtree(stage_path, ignore_errors=True)
+    meta = export_pipeline(pipeline, stage_path, feature_names=feature_names, labels=labels, aliases=aliases,
+                           features=features)
+    cascade_meta = {"threshold": threshold,
+                    "full_model": {"sha1": forest_digest(path), "n_trees": full_meta["n_trees"],
+                                   "n_nodes": full_meta["n_nodes"]}}
+    cascade_meta.update(info or {})
+    with open(os.path.join(stage_path, META_FILENAME), "w") as file:
+        json.dump(cascade_meta, file, indent=2)
+    return meta
+
+
+def remove_first_stage(path):
+    shutil.rmtree(os.path.join(path, FIRST_STAGE_DIRNAME), ignore_errors=True)
+
+
+class FirstStage:
+    """Single-reading evaluator for a compiled first stage.
+
+    A one-tree stage is walked node by node on Python lists; larger ones go
+    through CompiledForest.predict_proba_one. Both give the same answer.
+    """
+
+    def __init__(self, forest):
+        self.forest = forest
+        self.classes = forest.classes
+        self._tree = None
+        if forest.n_trees == 1:
+            children = forest.children.reshape(-1, 2)
+            self._tree = (forest.feature.tolist(), forest.threshold.tolist(), children[:, 0].tolist(),
+                          children[:, 1].tolist(), forest.value.argmax(axis=1).tolist(),
+                          forest.value.max(axis=1).tolist(), int(forest.roots[0]))
+
+    def top_one(self, row):
+        """(class index, probability) of the most likely class for one reading."""
+        if self._tree is None:
+            proba = self.forest.predict_proba_one(row)
+            k = proba.argmax()
+            return k, proba[k]
+        feature, threshold, left, right, top, confidence, node = self._tree
+        x = np.ravel(row).tolist()
+        while left[node] != node:  # Leaves point to themselves
+            node = right[node] if x[feature[node]] > threshold[node] else left[node]
+        return top[node], confidence[node]
+
+    def predict_one(self, row):
+        return self.classes[self.top_one(row)[0]]
+
+
+class Cascade:
+    """First stage + full compiled forest behind the CompiledForest predict
+    interface. Readings whose first-stage confidence reaches `threshold` get
+    its answer; the rest are predicted by the full forest."""
+
+    def __init__(self, first, full, threshold):
+        if first.classes.tolist() != full.classes.tolist():
+            raise ValueError("First stage and full model were trained on different classes")
+        self.first = first
+        self.stage = FirstStage(first)
+        self.full = full
+        self.threshold = threshold
+        self.classes = full.classes
+
+        # Counters
+        self.early = 0
+        self.passed_on = 0
+
+    @classmethod
+    def load(cls, path, full, mmap=True):
+        """The cascade for the compiled model in `path` (already loaded as
+        `full`), or None if it has no first stage for this forest."""
+        stage_path = os.path.join(path, FIRST_STAGE_DIRNAME)
+        meta_path = os.path.join(stage_path, META_FILENAME)
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as file:
+            meta = json.load(file)
+        if meta["full_model"].get("sha1") != forest_digest(path):
+            print(f"Ignoring {stage_path}: it was calibrated for a different forest")
+            return None
+        return cls(CompiledForest.load(stage_path, mmap=mmap), full, meta["threshold"])
+
+    def predict_one(self, row):
+        """Predicted label for a single reading."""
+        k, confidence = self.stage.top_one(row)
+        if confidence >= self.threshold:
+            self.early += 1
+            return self.classes[k]
+        self.passed_on += 1
+        return self.full.predict_one(row)
+
+    def predict(self, X):
+        """Predicted labels for a (n, n_features) array of raw sensor values."""
+        proba = self.first.predict_proba(X)
+        labels = self.classes[proba.argmax(axis=1)]
+        unsure = np.flatnonzero(proba.max(axis=1) < self.threshold)
+        if len(unsure):
+            labels[unsure] = self.full.predict(X[unsure])
+        self.early += len(X) - len(unsure)
+        self.passed_on += len(unsure)
+        return labels
+
+    def stats(self):
+        total = self.early + self.passed_on
+        share = self.early / total if total else 0.0
+        return (f"[Cascade] {self.early} of {total} readings ({share:.1%}) answered by the first stage "
+                f"at threshold {self.threshold:.3f}, {self.passed_on} by the full forest")
@@ -1,51 +1,78 @@
 import serial
-import pandas as pd
 import time
+import metrics
+from recordsink import CSVRecordSink
+from frameparser import RecordParser
+from serialreader import SerialReader
 
 # Adjust the port and baud rate according to your Arduino settings
 SERIAL_PORT = "COM3"  
 BAUD_RATE = 115200  
 
+# Output file; rows are appended as they arrive instead of rewriting the whole CSV
+csv_name = "latest_acetone.csv"
+FLUSH_EVERY = 10  # Rows buffered before each append
+ROTATE_BYTES = None  # e.g. 50 * 1024 * 1024 to start a new file every 50 MB
+ROTATE_SECONDS = None  # e.g. 3600 to start a new file every hour
+QUEUE_SIZE = 10000  # Readings buffered between the serial thread and the CSV writer
+
+# Per-stage timings and counters, exported to metrics_collect.prom; see metrics.py
+METRICS = False
+stages = metrics.setup("collect", enabled=METRICS)
+
 # Open serial connection
 ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=1)
 
-# Storage for data
-data_list = []
+# Frames are read on their own thread so CSV appends never stall the port;
+# the queue absorbs a slow disk. If it still fills up, new readings are the
+# ones dropped (a recording keeps its earlier rows contiguous) and counted
+reader = SerialReader(ser, maxsize=QUEUE_SIZE, drop="newest")
+
+# Streaming sink and parser, both created from the first reading's keys
+sink = None
+parser = None
 
 try:
     print("Reading data from Arduino...\n")
-    
-    while True:
-        line = ser.readline().decode('utf-8', errors='ignore').strip()
-        
-        if line.startswith("Data;"):
-            # Remove "Data;" prefix and split by ";"
-            data_parts = line.replace("Data;", "").split(";")
-            data_dict = {}
-
-            for part in data_parts:
-                key_value = part.split(":")
-                if len(key_value) == 2:
-                    key, value = key_value
-                    try:
-                        data_dict[key.strip()] = float(value.strip())
-                    except ValueError:
-                        data_dict[key.strip()] = value.strip()  # Keep non-numeric values (e.g., labels)
+    reader.start()
 
-            # Print data in a formatted way
-            print(f"{time.strftime('%H:%M:%S')} → {data_dict}")
+    for line in reader:
+        t = stages.now()
+        line = line.strip()  # Leading whitespace, \r of CRLF line endings
+        if line.startswith(b"Data;"):
+            if parser is None:
+                # The first reading fixes the schema (column order) for the whole capture
+                parser = RecordParser.from_frame(line[len(b"Data;"):])
+                row = [""] * len(parser)
+                sink = CSVRecordSink(csv_name, fieldnames=parser.columns, flush_every=FLUSH_EVERY,
+                                     rotate_bytes=ROTATE_BYTES, rotate_seconds=ROTATE_SECONDS)
 
-            # Store data
-            data_list.append(data_dict)
+            # Values are kept as sent (numbers or labels), straight from the raw bytes
+            parser.split_into(line, row)
+            t = stages.lap("parse", t)
 
-            # Save to CSV every 10 entries
-            csv_name = "latest_acetone.csv"
+            # Print data in a formatted way
+            print(f"{time.strftime('%H:%M:%S')} → {dict(zip(parser.columns, row))}")
 
-            if len(data_list) % 10 == 0:
-                df = pd.DataFrame(data_list)
-                df.to_csv(csv_name, index=False)
-                print(f"Saved {len(data_list)} entries to {csv_name}")
+            # Store data (appended to the CSV every FLUSH_EVERY entries). The file
+            # is written as <name>.partial and renamed when closed or rotated
+            if sink.write_row(row):
+                print(f"Saved {sink.rows_written} entries to {sink.writing_path}")
+            t = stages.lap("write", t)  # Console and CSV
+            stages.observe("end_to_end", t - reader.received_at)
+        else:
+            stages.count("parse_errors")
 
 except KeyboardInterrupt:
     print("\nData collection stopped by user.")
+finally:
+    reader.stop()
+    if sink is not None:
+        sink.close()
     ser.close()
+    print(reader.stats())
+    if reader.dropped:
+        print(f"Warning: {reader.dropped} readings were dropped (queue full) and are missing from the CSV")
+    stages.close()
+    if stages.enabled:
+        print(stages.summary())
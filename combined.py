@@ -1,28 +1,19 @@
-import pandas as pd
+from dataset import build_dataset, load_config
 
-# Load clean air data and assign label 0
-df_clean = pd.read_csv("latest_clean.csv")
-df_clean["Label"] = 0  # 0 represents Clean Air
+# Recordings per class, and the label/name each one is assigned
+CONFIG_PATH = "dataset.json"
 
-# Load ethanol data and assign label 1
-df_ethanol = pd.read_csv("latest_ethanol.csv")
-df_ethanol["Label"] = 1  # 1 represents ethanol
+# Columnar dataset read by gridsearchrf.py
+OUTPUT_DIR = "latest_dataset"
 
-# Load isopropanol data and assign label 2
-df_iso = pd.read_csv("latest_isopropanol.csv")
-df_iso["Label"] = 2  # 1 represents isopropanol
-
-# Load acetone data and assign label 3
-df_acetone = pd.read_csv("latest_acetone.csv")
-df_acetone["Label"] = 3  # 1 represents isopropanol
-
-# Combine all datasets
-df = pd.concat([df_clean, df_ethanol, df_iso, df_acetone], ignore_index=True)
-
-# Save combined dataset
+# Combined CSV for the tools that still read it (None to skip)
 output_filename = "latest.csv"
 
-# Save combined dataset for reference
-df.to_csv(output_filename, index=False)
+# Stream every recording into the dataset, a chunk of rows at a time
+schema = build_dataset(load_config(CONFIG_PATH), OUTPUT_DIR, csv_path=output_filename)
 
-print(f"Datasets merged and saved as {output_filename}")
+for source in schema["sources"]:
+    print(f"{source['path']}: {source['rows']} rows as {schema['labels'][str(source['label'])]}")
+dtypes = ", ".join(f"{column['name']}={column['dtype']}" for column in schema["columns"])
+print(f"Column types: {dtypes}")
+print(f"Datasets merged and saved as {OUTPUT_DIR}" + (f" and {output_filename}" if output_filename else ""))
@@ -0,0 +1,243 @@
+import json
+import os
+import sys
+import numpy as np
+from openset import OpenSetScorer
+
+# Bumped whenever the on-disk layout changes
+FORMAT_VERSION = 2
+
+ARRAY_NAMES = ("feature", "threshold", "children", "value", "roots", "classes")
+META_FILENAME = "meta.json"
+
+# Upper bound on the float32 steps raw_thresholds() takes from the folded
+# threshold to the exact cutoff (one or two in practice)
+MAX_CUTOFF_STEPS = 64
+
+
+def raw_thresholds(threshold, mean, scale):
+    """Raw-value cutoffs equivalent to the scaled split tests.
+
+    The pipeline scales a reading in float64 and the trees compare it as
+    float32: float32((x - mean) / scale) <= threshold. Folding the scaler into
+    the threshold (threshold * scale + mean) can land an ulp off that test
+    at the split boundary, so each cutoff is moved to the largest float32 x
+    that still passes it. For float32 readings, x <= cutoff is then the
+    pipeline's test exactly.
+    """
+    def passes(x):
+        return ((x.astype(np.float64) - mean) / scale).astype(np.float32) <= threshold
+
+    with np.errstate(over="ignore", invalid="ignore"):
+        cutoff = (threshold * scale + mean).astype(np.float32)
+        for _ in range(MAX_CUTOFF_STEPS):
+            failing = ~passes(cutoff)
+            if not failing.any():
+                break
+            cutoff[failing] = np.nextafter(cutoff[failing], np.float32(-np.inf))
+        for _ in range(MAX_CUTOFF_STEPS):
+            above = np.nextafter(cutoff, np.float32(np.inf))
+            passing = passes(above) & (above > cutoff)
+            if not passing.any():
+                break
+            cutoff[passing] = above[passing]
+    return cutoff.astype(np.float64)
+
+
+def compile_pipeline(pipeline, feature_names=None, labels=None, aliases=None, features=None):
+    """Flattens a fitted StandardScaler -> RandomForestClassifier pipeline into
+    contiguous arrays shared by all trees.
+
+    The returned meta also carries the schema needed at runtime (feature order,
+    class names, sensor-key aliases and, for models trained on rolling-window
+    features, the features.RollingFeatures config) so the detector never has
+    to read the training CSV.
+
+    The scaler is folded into the thresholds: (x - mean) / scale <= t is the same
+    test as x <= t * scale + mean, so raw readings can be compared directly
+    (snapped to the exact float32 cutoff by raw_thresholds()).
+    Leaves point both children at themselves, which lets the evaluator step every
+    tree a fixed number of levels without checking for leaves.
+    """
+    scaler = pipeline[0]
+    forest = pipeline[-1]
+    n_features = forest.n_features_in_
+    mean = getattr(scaler, "mean_", None)
+    scale = getattr(scaler, "scale_", None)
+    mean = np.zeros(n_features) if mean is None else mean
+    scale = np.ones(n_features) if scale is None else scale
+
+    node_features, thresholds, children, values, roots = [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for estimator in forest.estimators_:
+        tree = estimator.tree_
+        n_nodes = tree.node_count
+        is_leaf = tree.children_left == -1
+        node_ids = np.arange(n_nodes)
+
+        feature = np.where(is_leaf, 0, tree.feature)
+        threshold = np.where(is_leaf, np.inf, raw_thresholds(tree.threshold, mean[feature], scale[feature]))
+        left = np.where(is_leaf, node_ids, tree.children_left) + offset
+        right = np.where(is_leaf, node_ids, tree.children_right) + offset
+
+        value = tree.value[:, 0, :]
+        value = value / value.sum(axis=1, keepdims=True)
+
+        node_features.append(feature)
+        thresholds.append(threshold)
+        children.append(np.column_stack([left, right]))
+        values.append(value)
+        roots.append(offset)
+        offset += n_nodes
+        max_depth = max(max_depth, tree.max_depth)
+
+    # Index arrays are stored as int64 so they can be memory-mapped and used by
+    # np.take without a copy on 64-bit hosts
+    arrays = {
+        "feature": np.concatenate(node_features).astype(np.int64),
+        "threshold": np.concatenate(thresholds).astype(np.float64),
+        "children": np.concatenate(children).astype(np.int64),
+        "value": np.concatenate(values).astype(np.float32),
+        "roots": np.asarray(roots, dtype=np.int64),
+        "classes": np.asarray(forest.classes_),
+    }
+
+    if feature_names is None:
+        feature_names = getattr(pipeline, "feature_names_in_", None)
+    if feature_names is None:
+        feature_names = [f"x{i}" for i in range(n_features)]
+    classes = arrays["classes"].tolist()
+    labels = labels or {}
+    meta = {
+        "format_version": FORMAT_VERSION,
+        "n_trees": len(roots),
+        "n_nodes": int(offset),
+        "n_features": int(n_features),
+        "max_depth": int(max_depth),
+        "feature_names": [str(name) for name in feature_names],
+        "class_names": [labels.get(label, str(label)) for label in classes],
+        "aliases": dict(aliases or {}),
+        "features": features,
+    }
+    return arrays, meta
+
+
+def save_compiled(arrays, meta, path):
+    """Writes the compiled arrays as one .npy per array plus meta.json in `path`."""
+    os.makedirs(path, exist_ok=True)
+    for name in ARRAY_NAMES:
+        np.save(os.path.join(path, name + ".npy"), np.ascontiguousarray(arrays[name]))
+    with open(os.path.join(path, META_FILENAME), "w") as file:
+        json.dump(meta, file, indent=2)
+
+
+def export_pipeline(pipeline, path, feature_names=None, labels=None, aliases=None, features=None, openset=None):
+    """Compiles a fitted pipeline and saves it to `path`, with its open-set
+    scorer (openset.OpenSetScorer) alongside if given. A scorer left in `path`
+    by an earlier export is deleted otherwise."""
+    arrays, meta = compile_pipeline(pipeline, feature_names, labels, aliases, features)
+    meta["openset"] = openset is not None
+    save_compiled(arrays, meta, path)
+    if openset is not None:
+        openset.save(path)
+    else:
+        OpenSetScorer.remove(path)
+    return meta
+
+
+class CompiledForest:
+    """Pure-NumPy evaluator for a forest produced by compile_pipeline()."""
+
+    def __init__(self, arrays, meta):
+        self.meta = meta
+        # np.take wants intp indices; this only copies on 32-bit hosts
+        self.feature = arrays["feature"].astype(np.intp, copy=False)
+        self.threshold = arrays["threshold"]
+        self.children = arrays["children"].astype(np.intp, copy=False).reshape(-1)
+        self.value = arrays["value"]
+        self.roots = arrays["roots"].astype(np.intp, copy=False)
+        self.classes = arrays["classes"]
+        self.max_depth = meta["max_depth"]
+        self.n_trees = len(self.roots)
+
+        # Runtime schema
+        self.feature_names = meta["feature_names"]
+        self.aliases = meta["aliases"]
+        self.features = meta.get("features")  # Rolling-window feature config, if any
+        self.openset = None  # Open-set scorer saved next to the forest, if any
+        self.labels = dict(zip(self.classes.tolist(), meta["class_names"]))
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Loads a compiled model directory. With mmap=True the arrays are mapped
+        read-only, so startup cost does not grow with the size of the forest."""
+        with open(os.path.join(path, META_FILENAME)) as file:
+            meta = json.load(file)
+        if meta.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported compiled model format in {path}: {meta.get('format_version')}")
+        mmap_mode = "r" if mmap else None
+        # asarray drops the np.memmap subclass (no copy) so np.take stays on the fast path
+        arrays = {name: np.asarray(np.load(os.path.join(path, name + ".npy"), mmap_mode=mmap_mode))
+                  for name in ARRAY_NAMES}
+        forest = cls(arrays, meta)
+        # Models exported before meta.json recorded it load whatever scorer is there
+        if meta.get("openset", True):
+            forest.openset = OpenSetScorer.load(path, mmap=mmap)
+        return forest
+
+    def nbytes(self):
+        """Total size of the model arrays in bytes."""
+        return sum(array.nbytes for array in (self.feature, self.threshold, self.children,
+                                              self.value, self.roots, self.classes))
+
+    def apply_one(self, x):
+        """Leaf node of every tree for a single 1-D reading."""
+        node = self.roots
+        feature, threshold, children = self.feature, self.threshold, self.children
+        for _ in range(self.max_depth):
+            # children holds (left, right) pairs, so 2 * node + go_right picks the branch
+            node = children.take(2 * node + (x.take(feature.take(node)) > threshold.take(node)))
+        return node
+
+    def apply(self, X):
+        """Leaf node of every tree for each row of X, shape (n_trees, n_samples)."""
+        X = np.ascontiguousarray(X)
+        n_samples, n_features = X.shape
+        flat = X.ravel()
+        node = np.repeat(self.roots[:, None], n_samples, axis=1)
+        row_offsets = np.arange(n_samples) * n_features
+        feature, threshold, children = self.feature, self.threshold, self.children
+        for _ in range(self.max_depth):
+            go_right = flat.take(row_offsets + feature.take(node)) > threshold.take(node)
+            node = children.take(2 * node + go_right)
+        return node
+
+    def predict_proba(self, X):
+        """Class probabilities for a (n, n_features) array of raw sensor values."""
+        return self.value.take(self.apply(X), axis=0).mean(axis=0)
+
+    def predict(self, X):
+        """Predicted labels for a (n, n_features) array of raw sensor values."""
+        return self.classes[np.argmax(self.predict_proba(X), axis=1)]
+
+    def predict_proba_one(self, row):
+        """Class probabilities for a single reading, given as (n_features,) or (1, n_features)."""
+        return self.value.take(self.apply_one(np.ravel(row)), axis=0).mean(axis=0)
+
+    def predict_one(self, row):
+        """Predicted label for a single reading."""
+        return self.classes[np.argmax(self.predict_proba_one(row))]
+
+
+if __name__ == "__main__":
+    # Usage: python compiled_forest.py [best_worad_rf.pkl] [best_worad_rf]
+    import joblib
+    from sensors import LABELS, SENSOR_ALIASES
+    model_path = sys.argv[1] if len(sys.argv) > 1 else "best_worad_rf.pkl"
+    output_path = sys.argv[2] if len(sys.argv) > 2 else os.path.splitext(model_path)[0]
+    model = joblib.load(model_path)
+    meta = export_pipeline(model, output_path, labels=LABELS, aliases=SENSOR_ALIASES,
+                           features=getattr(model, "rolling_features_", None),
+                           openset=getattr(model, "openset_", None))
+    print(f"Compiled {meta['n_trees']} trees ({meta['n_nodes']} nodes, depth {meta['max_depth']}) to {output_path}")
@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+import time
+import numpy as np
+
+# Default location and size limit of the cross-validation result cache
+CACHE_DIR = ".cv_cache"
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+
+
+def hash_arrays(*arrays):
+    """Content hash of a set of arrays (shape, dtype and bytes)."""
+    digest = hashlib.sha256()
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(str((array.shape, array.dtype.str)).encode())
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+class CVCache:
+    """Content-addressed on-disk cache of per-fold cross-validation scores.
+
+    Each entry is keyed by the hash of the fold's data, the parameter set and
+    the random seed, so an interrupted search resumes where it stopped and
+    unchanged combinations are never refitted. Entries are small JSON files;
+    the least recently used ones are evicted as soon as a put() takes the
+    cache past `max_bytes`.
+    """
+
+    def __init__(self, root=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self.spent_seconds = 0.0
+        self._bytes = None  # Size on disk, scanned on the first put()
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def key(data_hash, params, seed):
+        payload = json.dumps({"data": data_hash, "params": params, "seed": seed},
+                             sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key + ".json")
+
+    def get(self, key):
+        """Returns the cached record for `key`, or None."""
+        path = self._path(key)
+        try:
+            with open(path) as file:
+                record = json.load(file)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        os.utime(path)  # Mark as recently used for eviction
+        self.hits += 1
+        self.saved_seconds += record.get("fit_time", 0.0)
+        return record
+
+    def put(self, key, record):
+        """Stores `record` atomically so a crash never leaves a half-written entry."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(record, file, default=str)
+            size = file.tell()
+        os.replace(tmp_path, path)
+        self.spent_seconds += record.get("fit_time", 0.0)
+
+        # Overwritten entries are counted twice; the next eviction rescans anyway
+        if self._bytes is None:
+            self._bytes = self._scan()[1]
+        else:
+            self._bytes += size
+        if self._bytes > self.max_bytes:
+            self.evict()
+
+    def _scan(self):
+        """Returns ([(mtime, size, path)], total bytes) for every entry."""
+        entries = []
+        total = 0
+        for directory, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue  # Removed by another process meanwhile
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        return entries, total
+
+    def evict(self):
+        """Deletes least recently used entries until the cache fits in max_bytes."""
+        entries, total = self._scan()
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+            removed += 1
+        self._bytes = total
+        return removed
+
+    def summary(self):
+        lookups = self.hits + self.misses
+        reused = self.hits / lookups * 100 if lookups else 0.0
+        return (f"CV cache: {self.hits} fold fits reused, {self.misses} computed "
+                f"({reused:.0f}% reused, ~{self.saved_seconds:.1f}s of fitting saved, "
+                f"{self.spent_seconds:.1f}s spent)")
+
+
+def timed(function, *args, **kwargs):
+    """Runs function(*args, **kwargs) and returns (result, seconds)."""
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
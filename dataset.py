@@ -0,0 +1,204 @@
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+
+# Columnar training dataset: one .npy per column (memory-mappable, compact
+# dtypes) plus schema.json, built by combined.py from the per-class CSVs
+
+FORMAT_VERSION = 1
+SCHEMA_FILENAME = "schema.json"
+LABEL_COLUMN = "Label"
+CHUNK_ROWS = 100_000  # CSV rows held in memory at a time while building
+
+# Where combined.py writes the dataset, and the combined CSV it replaces
+DATASET_PATH = "latest_dataset"
+CSV_PATH = "latest.csv"
+
+
+def load_config(path):
+    """Reads the dataset config: {"classes": [{"label": 0, "name": "Clean Air",
+    "files": ["latest_clean.csv"]}, ...]}."""
+    with open(path) as file:
+        config = json.load(file)
+    for entry in config["classes"]:
+        entry["label"] = int(entry["label"])
+    return config
+
+
+def _sources(config):
+    return [(path, entry["label"]) for entry in config["classes"] for path in entry["files"]]
+
+
+def _chunks(path, chunk_rows):
+    """Yields the rows of a CSV in chunks, without rows that have a missing value."""
+    for chunk in pd.read_csv(path, chunksize=chunk_rows):
+        yield chunk.dropna()
+
+
+def compact_dtype(is_integer, low, high):
+    """Smallest dtype that holds a column: int8..int64 for whole numbers,
+    float32 otherwise (the forest compares in float32 anyway)."""
+    if is_integer:
+        for dtype in (np.int8, np.int16, np.int32, np.int64):
+            info = np.iinfo(dtype)
+            if info.min <= low and high <= info.max:
+                return np.dtype(dtype)
+    return np.dtype(np.float32)
+
+
+def scan(config, chunk_rows=CHUNK_ROWS):
+    """First pass over the sources: column order, rows and value range per column."""
+    columns = []
+    stats = {}
+    rows = []
+    for path, _ in _sources(config):
+        n = 0
+        for chunk in _chunks(path, chunk_rows):
+            n += len(chunk)
+            for name in chunk.columns:
+                if name == LABEL_COLUMN:
+                    continue
+                values = chunk[name].to_numpy(dtype=np.float64)
+                if name not in stats:
+                    columns.append(name)
+                    stats[name] = [True, np.inf, -np.inf]
+                if len(values):
+                    column = stats[name]
+                    column[0] = column[0] and bool((values == np.round(values)).all())
+                    column[1] = min(column[1], values.min())
+                    column[2] = max(column[2], values.max())
+        rows.append(n)
+    dtypes = {name: compact_dtype(*stats[name]) for name in columns}
+    return columns, dtypes, rows
+
+
+def build_dataset(config, output_dir, chunk_rows=CHUNK_ROWS, csv_path=None):
+    """Streams every source CSV into the columnar dataset at `output_dir` and
+    returns its schema. Only `chunk_rows` rows are in memory at a time: a
+    first pass picks the column dtypes and row count, a second fills
+    preallocated .npy files. Rows with missing values are skipped. With
+    `csv_path`, the same rows are also appended to a combined CSV."""
+    columns, dtypes, rows = scan(config, chunk_rows)
+    n_rows = sum(rows)
+    labels = [entry["label"] for entry in config["classes"]]
+    label_dtype = compact_dtype(True, min(labels), max(labels))
+
+    tmp_dir = output_dir.rstrip("/\\") + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    arrays = {name: np.lib.format.open_memmap(os.path.join(tmp_dir, name + ".npy"), mode="w+",
+                                              dtype=dtypes[name], shape=(n_rows,))
+              for name in columns}
+    arrays[LABEL_COLUMN] = np.lib.format.open_memmap(os.path.join(tmp_dir, LABEL_COLUMN + ".npy"), mode="w+",
+                                                     dtype=label_dtype, shape=(n_rows,))
+    if csv_path is not None and os.path.exists(csv_path):
+        os.remove(csv_path)
+
+    offset = 0
+    sources = []
+    for path, label in _sources(config):
+        start = offset
+        for chunk in _chunks(path, chunk_rows):
+            chunk = chunk.reindex(columns=columns).dropna().astype(dtypes)
+            end = offset + len(chunk)
+            for name in columns:
+                arrays[name][offset:end] = chunk[name].to_numpy()
+            arrays[LABEL_COLUMN][offset:end] = label
+            if csv_path is not None:
+                chunk.assign(**{LABEL_COLUMN: label}).to_csv(csv_path, mode="a", index=False,
+                                                             header=not os.path.exists(csv_path))
+            offset = end
+        sources.append({"path": path, "label": label, "rows": offset - start})
+    for array in arrays.values():
+        array.flush()
+    del arrays
+
+    schema = {
+        "format_version": FORMAT_VERSION,
+        "n_rows": offset,
+        "columns": [{"name": name, "dtype": dtypes[name].str} for name in columns],
+        "label_column": LABEL_COLUMN,
+        "label_dtype": label_dtype.str,
+        "labels": {str(entry["label"]): entry["name"] for entry in config["classes"]},
+        "sources": sources,
+    }
+    if offset != n_rows:
+        # A column missing from some files only shows up in the second pass
+        for name in columns + [LABEL_COLUMN]:
+            file_path = os.path.join(tmp_dir, name + ".npy")
+            np.save(file_path, np.load(file_path)[:offset])
+    _publish(tmp_dir, output_dir, schema)
+    return schema
+
+
+def save_dataset(X, y, labels, output_dir, sources=None):
+    """Writes the columns of the DataFrame `X` and the integer labels `y` as
+    a dataset load_dataset() reads, with the dtypes build_dataset() would
+    pick. `labels` is {label: class name}. Rows with missing values should
+    already be dropped."""
+    tmp_dir = output_dir.rstrip("/\\") + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    columns = []
+    for name in X.columns:
+        values = X[name].to_numpy(dtype=np.float64)
+        low, high = (values.min(), values.max()) if len(values) else (0, 0)
+        dtype = compact_dtype(bool((values == np.round(values)).all()), low, high)
+        np.save(os.path.join(tmp_dir, name + ".npy"), values.astype(dtype))
+        columns.append({"name": name, "dtype": dtype.str})
+    label_dtype = compact_dtype(True, min(labels), max(labels))
+    np.save(os.path.join(tmp_dir, LABEL_COLUMN + ".npy"), np.asarray(y).astype(label_dtype))
+
+    schema = {
+        "format_version": FORMAT_VERSION,
+        "n_rows": len(X),
+        "columns": columns,
+        "label_column": LABEL_COLUMN,
+        "label_dtype": label_dtype.str,
+        "labels": {str(label): name for label, name in labels.items()},
+        "sources": sources or [],
+    }
+    _publish(tmp_dir, output_dir, schema)
+    return schema
+
+
+def _publish(tmp_dir, output_dir, schema):
+    """Writes schema.json and swaps the finished dataset into place."""
+    with open(os.path.join(tmp_dir, SCHEMA_FILENAME), "w") as file:
+        json.dump(schema, file, indent=2)
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.replace(tmp_dir, output_dir)
+
+
+def load_dataset(path, mmap=True):
+    """Returns (X, y, schema) for a dataset built by build_dataset(). With
+    mmap=True the columns are memory-mapped and wrapped in the DataFrame
+    without copying."""
+    with open(os.path.join(path, SCHEMA_FILENAME)) as file:
+        schema = json.load(file)
+    if schema.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported dataset format in {path}: {schema.get('format_version')}")
+    mmap_mode = "r" if mmap else None
+    columns = {column["name"]: np.load(os.path.join(path, column["name"] + ".npy"), mmap_mode=mmap_mode)
+               for column in schema["columns"]}
+    X = pd.DataFrame(columns, copy=False)
+    y = pd.Series(np.load(os.path.join(path, schema["label_column"] + ".npy"), mmap_mode=mmap_mode),
+                  name=schema["label_column"], copy=False)
+    return X, y, schema
+
+
+def labels(schema):
+    """{label: class name} from a dataset schema."""
+    return {int(label): name for label, name in schema["labels"].items()}
+
+
+def load_training_frame(path=DATASET_PATH, csv_path=CSV_PATH):
+    """Training readings as one DataFrame with a Label column, plus the class
+    names: from the dataset at `path` when combined.py has built it,
+    otherwise from the combined CSV (class names None)."""
+    if os.path.isdir(path):
+        X, y, schema = load_dataset(path)
+        return X.assign(**{LABEL_COLUMN: y}), labels(schema)
+    return pd.read_csv(csv_path).dropna(), None
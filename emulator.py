@@ -0,0 +1,487 @@
+import argparse
+import asyncio
+import builtins
+import csv
+import os
+import random
+import runpy
+import sys
+import threading
+import time
+import _thread
+from datetime import datetime
+from types import SimpleNamespace
+import binframe
+
+# Stand-in for the sensor array: replays latest.csv or a captured .txt session
+# through fake BleakClient / serial.Serial transports (or a real pty), so the
+# capture scripts and predict.py can be driven without hardware, e.g.
+#   python emulator.py latest.csv --speed 100 --duration 30 --run predict.py
+#   python emulator.py session.txt --speed 10 --input start,w20,stop,exit --run BLEcomms.py
+
+DEVICE_ADDRESS = "C9:6D:69:38:E7:03"
+DEVICE_NAME = "WORAD emulator"
+
+# Nordic UART service of the sensor arrays
+SERVICE_UUID = "6e400001-b5a3-f393-e0a9-e50e24dcca9e"
+WRITE_CHAR_UUID = "6e400002-b5a3-f393-e0a9-e50e24dcca9e"
+READ_CHAR_UUID = "6e400003-b5a3-f393-e0a9-e50e24dcca9e"
+
+SAMPLE_RATE = 1.0  # Readings per second sent by the real array (when the source has no timestamps)
+FRAGMENT_BYTES = 20  # Notification payload with the default BLE MTU
+MAX_LAG = 1.0  # Seconds the host may fall behind before the device drops readings
+SERIAL_BUFFER_BYTES = 4096  # Receive buffer of the USB serial driver
+ACK_LATENCY = 0.005  # Seconds per GATT write
+
+
+def load_readings(path):
+    """Returns (frames, sample_rate) from latest.csv-style CSV or a capture
+    .txt session. Frames are 'Data;KEY:VAL;...' bytes without the newline;
+    sample_rate comes from the session timestamps, if there are any."""
+    if path.lower().endswith(".csv"):
+        with open(path, newline="") as file:
+            reader = csv.DictReader(file)
+            columns = [name for name in reader.fieldnames if name != "Label"]
+            frames = ["Data;" + ";".join(f"{name}:{row[name]}" for name in columns if row[name] != "")
+                      for row in reader]
+        return [frame.encode() for frame in frames], SAMPLE_RATE
+
+    frames = []
+    timestamps = []
+    with open(path, encoding="utf-8", errors="replace") as file:
+        for line in file:
+            pos = line.find("Data;")
+            if pos < 0:
+                continue
+            frames.append(line[pos:].strip().encode())
+            try:
+                timestamps.append(datetime.strptime(line[:23], "%Y-%m-%d %H:%M:%S.%f").timestamp())
+            except ValueError:
+                pass
+    rate = SAMPLE_RATE
+    if len(timestamps) > 1 and timestamps[-1] > timestamps[0]:
+        rate = (len(timestamps) - 1) / (timestamps[-1] - timestamps[0])
+    return frames, rate
+
+
+def to_binary(frame, seq):
+    """Re-encodes a text frame as a binframe.py frame, with the schema whose
+    channels match its keys best."""
+    values = {}
+    for part in frame[len(b"Data;"):].split(b";"):
+        key, _, value = part.partition(b":")
+        try:
+            values[key.decode()] = float(value)
+        except ValueError:
+            pass
+    schema_id = max(binframe.SCHEMAS, key=lambda s: sum(name in values for name, _ in binframe.SCHEMAS[s]))
+    return binframe.encode(values, seq=seq, schema_id=schema_id)
+
+
+class SensorEmulator:
+    """Replays frames as a byte stream paced at `rate` readings per second.
+
+    Every reading is cut into chunks of `fragment` bytes (random 1..fragment
+    with `random_fragments`, whole frames with 0), the way notifications or
+    serial reads deliver it. Readings are sent on a fixed schedule; when the
+    consumer blocks the sender for more than `max_lag` seconds, the readings
+    it fell behind by are dropped, as the device's send queue would.
+    """
+
+    def __init__(self, frames, rate=SAMPLE_RATE, fragment=FRAGMENT_BYTES, random_fragments=False,
+                 binary=False, loop=True, limit=None, max_lag=MAX_LAG, seed=0):
+        if binary:
+            self.frames = [to_binary(frame, seq) for seq, frame in enumerate(frames)]
+        else:
+            self.frames = [frame + b"\n" for frame in frames]
+        if not self.frames:
+            raise ValueError("No readings to replay")
+        self.rate = rate
+        self.fragment = fragment
+        self.random_fragments = random_fragments
+        self.loop = loop
+        self.limit = limit
+        self.max_lag = max_lag
+        self.rng = random.Random(seed)
+
+        # Counters
+        self.sent = 0
+        self.bytes_sent = 0
+        self.chunks_sent = 0
+        self.dropped_late = 0
+        self.max_behind = 0.0
+        self.started = None
+        self.finished = None
+        self._position = 0
+        self._scheduled = 0
+
+    def _chunks(self, frame):
+        if not self.fragment:
+            return [frame]
+        chunks = []
+        pos = 0
+        while pos < len(frame):
+            size = self.rng.randint(1, self.fragment) if self.random_fragments else self.fragment
+            chunks.append(frame[pos:pos + size])
+            pos += size
+        return chunks
+
+    def _next_frame(self):
+        if self.limit is not None and self._scheduled >= self.limit:
+            return None
+        if self._position >= len(self.frames):
+            if not self.loop:
+                return None
+            self._position = 0
+        frame = self.frames[self._position]
+        self._position += 1
+        return frame
+
+    def step(self):
+        """Returns (chunks due now, seconds until the next reading), or
+        (chunks, None) once the replay is over."""
+        now = time.perf_counter()
+        if self.started is None:
+            self.started = now
+        due = int((now - self.started) * self.rate) + 1 - self._scheduled
+        behind = (due - 1) / self.rate
+        self.max_behind = max(self.max_behind, behind)
+        if behind > self.max_lag:
+            skipped = due - 1 - int(self.max_lag * self.rate)
+            self.dropped_late += skipped
+            self._scheduled += skipped
+            self._position += skipped
+            if self.loop:
+                self._position %= len(self.frames)
+            due -= skipped
+
+        chunks = []
+        for _ in range(max(due, 0)):
+            frame = self._next_frame()
+            if frame is None:
+                self.finished = time.perf_counter()
+                return chunks, None
+            chunks.extend(self._chunks(frame))
+            self._scheduled += 1
+            self.sent += 1
+            self.bytes_sent += len(frame)
+        self.chunks_sent += len(chunks)
+        return chunks, max(0.0, self.started + self._scheduled / self.rate - time.perf_counter())
+
+    async def run_async(self, send, stopped):
+        """Calls send(chunk) from the event loop until the replay ends or `stopped` is set."""
+        while not stopped.is_set():
+            chunks, wait = self.step()
+            for chunk in chunks:
+                send(chunk)
+            if wait is None:
+                break
+            await asyncio.sleep(wait)
+        self.finished = self.finished or time.perf_counter()
+
+    def run_thread(self, send, stopped):
+        """Calls send(chunk) from the current thread until the replay ends or `stopped` is set."""
+        while not stopped.is_set():
+            chunks, wait = self.step()
+            for chunk in chunks:
+                send(chunk)
+            if wait is None:
+                break
+            stopped.wait(wait)
+        self.finished = self.finished or time.perf_counter()
+
+    def report(self):
+        if self.started is None:
+            return "Emulator: nothing sent"
+        elapsed = max((self.finished or time.perf_counter()) - self.started, 1e-9)
+        return (f"Emulator: {self.sent} readings ({self.bytes_sent} bytes in {self.chunks_sent} chunks) "
+                f"in {elapsed:.1f}s = {self.sent / elapsed:.1f} readings/s sustained "
+                f"(target {self.rate:g}/s); {self.dropped_late} dropped at the device because the host "
+                f"fell behind (max {self.max_behind * 1e3:.0f} ms late)")
+
+
+class FakeBleakClient:
+    """Drop-in for bleak.BleakClient backed by a SensorEmulator. Notifications
+    are delivered from the event loop like the real backend; GATT writes
+    (ACKs, commands) are counted and take `ACK_LATENCY` seconds."""
+
+    emulator_factory = None  # Set by install()
+    clients = []
+
+    def __init__(self, address_or_device, timeout=10.0, disconnected_callback=None, **kwargs):
+        self.address = getattr(address_or_device, "address", address_or_device)
+        self.disconnected_callback = disconnected_callback
+        self.is_connected = False
+        self.writes = 0
+        self.emulator = None
+        self.services = [SimpleNamespace(uuid=SERVICE_UUID, characteristics=[
+            SimpleNamespace(uuid=WRITE_CHAR_UUID, properties=["write", "write-without-response"]),
+            SimpleNamespace(uuid=READ_CHAR_UUID, properties=["notify"]),
+        ])]
+        self._stopped = None
+        self._task = None
+        FakeBleakClient.clients.append(self)
+
+    async def connect(self, **kwargs):
+        self.is_connected = True
+        return True
+
+    async def disconnect(self):
+        await self.stop_notify(READ_CHAR_UUID)
+        if self.is_connected:
+            self.is_connected = False
+            if self.disconnected_callback is not None:
+                self.disconnected_callback(self)
+        return True
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.disconnect()
+
+    async def start_notify(self, char_specifier, callback, **kwargs):
+        if self.emulator is None:
+            self.emulator = FakeBleakClient.emulator_factory()
+        self._stopped = asyncio.Event()
+        self._task = asyncio.create_task(
+            self.emulator.run_async(lambda chunk: callback(char_specifier, bytearray(chunk)), self._stopped))
+
+    async def stop_notify(self, char_specifier):
+        if self._task is not None:
+            self._stopped.set()
+            await self._task
+            self._task = None
+
+    async def write_gatt_char(self, char_specifier, data, response=None):
+        self.writes += 1
+        await asyncio.sleep(ACK_LATENCY)
+
+    def report(self):
+        emulator = self.emulator.report() if self.emulator else "Emulator: not subscribed"
+        return f"[{self.address}] {emulator}; {self.writes} GATT writes received"
+
+
+class FakeBleakScanner:
+    addresses = [DEVICE_ADDRESS]
+
+    @classmethod
+    async def discover(cls, timeout=5.0, **kwargs):
+        await asyncio.sleep(min(timeout, 0.1))
+        return [SimpleNamespace(address=address, name=DEVICE_NAME) for address in cls.addresses]
+
+
+class FakeSerial:
+    """Drop-in for serial.Serial backed by a SensorEmulator on a feeder
+    thread. Bytes land in a receive buffer of SERIAL_BUFFER_BYTES like the
+    driver's; readings that don't fit because the reader is too slow are
+    dropped and counted."""
+
+    emulator_factory = None  # Set by install()
+    ports = []
+
+    def __init__(self, port=None, baudrate=9600, timeout=None, buffer_bytes=SERIAL_BUFFER_BYTES, **kwargs):
+        self.port = port
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.buffer_bytes = buffer_bytes
+        self.is_open = True
+        self.buffer = bytearray()
+        self.bytes_read = 0
+        self.dropped_bytes = 0
+        self.written = 0
+        self._ready = threading.Condition()
+        self._stopped = threading.Event()
+        self.emulator = FakeSerial.emulator_factory()
+        self._thread = threading.Thread(target=self.emulator.run_thread, args=(self._receive, self._stopped),
+                                        daemon=True)
+        self._thread.start()
+        FakeSerial.ports.append(self)
+
+    def _receive(self, chunk):
+        with self._ready:
+            if len(self.buffer) + len(chunk) > self.buffer_bytes:
+                self.dropped_bytes += len(chunk)
+                return
+            self.buffer += chunk
+            self._ready.notify()
+
+    def _wait(self, condition):
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        while not condition():
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if (remaining is not None and remaining <= 0) or not self.is_open:
+                return
+            self._ready.wait(remaining if remaining is not None else 0.1)
+
+    def _take(self, size):
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        self.bytes_read += len(data)
+        return data
+
+    def readline(self):
+        with self._ready:
+            self._wait(lambda: b"\n" in self.buffer)
+            end = self.buffer.find(b"\n")
+            return self._take(end + 1 if end >= 0 else len(self.buffer))
+
+    def read(self, size=1):
+        with self._ready:
+            self._wait(lambda: len(self.buffer) >= size)
+            return self._take(size)
+
+    @property
+    def in_waiting(self):
+        with self._ready:
+            return len(self.buffer)
+
+    def reset_input_buffer(self):
+        with self._ready:
+            self.buffer.clear()
+
+    def write(self, data):
+        self.written += len(data)
+        return len(data)
+
+    def close(self):
+        self._stopped.set()
+        self.is_open = False
+
+    def report(self):
+        return (f"[{self.port}] {self.emulator.report()}; {self.bytes_read} bytes read, "
+                f"{self.dropped_bytes} bytes dropped by the full receive buffer, "
+                f"{len(self.buffer)} bytes left unread")
+
+
+def open_pty(emulator_factory):
+    """Feeds an emulator into a pseudo-terminal (POSIX only) and returns
+    (port path, stop event, emulator). Any serial.Serial can open the path."""
+    import tty
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    emulator = emulator_factory()
+    stopped = threading.Event()
+    threading.Thread(target=emulator.run_thread, args=(lambda chunk: os.write(master, chunk), stopped),
+                     daemon=True).start()
+    return os.ttyname(slave), stopped, emulator
+
+
+def install(emulator_factory, transport="fake"):
+    """Replaces bleak.BleakClient/BleakScanner and serial.Serial with the
+    emulated transports. Call before the script under test imports them."""
+    FakeBleakClient.emulator_factory = emulator_factory
+    FakeSerial.emulator_factory = emulator_factory
+    try:
+        import bleak
+        bleak.BleakClient = FakeBleakClient
+        bleak.BleakScanner = FakeBleakScanner
+    except ImportError:
+        pass
+    import serial
+    if transport == "pty":
+        real_serial = serial.Serial
+        ptys = []
+
+        def pty_serial(port=None, *args, **kwargs):
+            path, stopped, emulator = open_pty(emulator_factory)
+            ptys.append(emulator)
+            return real_serial(path, *args, **kwargs)
+
+        serial.Serial = pty_serial
+        return ptys
+    serial.Serial = FakeSerial
+    return FakeSerial.ports
+
+
+def scripted_input(commands):
+    """input() replacement answering prompts from a comma-separated list;
+    'w<seconds>' waits, then answers with an empty line."""
+    commands = iter(commands.split(","))
+
+    def fake_input(prompt=""):
+        try:
+            command = next(commands)
+        except StopIteration:
+            raise EOFError
+        if command.startswith("w"):
+            time.sleep(float(command[1:]))
+            return ""
+        print(f"{prompt}{command}")
+        return command
+
+    return fake_input
+
+
+def interrupt_when_done(ports, grace=2.0):
+    """Interrupts the script once every emulator has sent its --limit
+    readings, leaving `grace` seconds to drain what is in flight."""
+    while True:
+        time.sleep(0.2)
+        emulators = [getattr(port, "emulator", port) for port in list(ports)]
+        emulators += [client.emulator for client in FakeBleakClient.clients if client.emulator is not None]
+        if emulators and all(emulator.finished for emulator in emulators):
+            break
+    time.sleep(grace)
+    _thread.interrupt_main()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay sensor readings through emulated BLE/serial transports")
+    parser.add_argument("source", help="latest.csv-style CSV or a captured .txt session")
+    parser.add_argument("--rate", type=float, help="Readings per second (default: the source's rate)")
+    parser.add_argument("--speed", type=float, default=1.0, help="Multiplier on the source's rate")
+    parser.add_argument("--fragment", type=int, default=FRAGMENT_BYTES, help="Bytes per chunk, 0 for whole frames")
+    parser.add_argument("--random-fragments", action="store_true", help="Random chunk sizes up to --fragment")
+    parser.add_argument("--binary", action="store_true", help="Send binframe.py frames instead of text")
+    parser.add_argument("--limit", type=int, help="Stop after this many readings")
+    parser.add_argument("--duration", type=float, help="Interrupt the script after this many seconds")
+    parser.add_argument("--transport", choices=["fake", "pty"], default="fake", help="Serial transport")
+    parser.add_argument("--input", help="Scripted answers to input() prompts, e.g. start,w10,stop,exit")
+    parser.add_argument("--run", metavar="SCRIPT", help="Script to run against the emulator")
+    args = parser.parse_args()
+
+    frames, source_rate = load_readings(args.source)
+    rate = (args.rate or source_rate) * args.speed
+
+    def emulator_factory():
+        return SensorEmulator(frames, rate=rate, fragment=args.fragment, random_fragments=args.random_fragments,
+                              binary=args.binary, limit=args.limit)
+
+    if args.run is None:
+        # Serve on a pty until interrupted, for scripts running in another process
+        path, stopped, emulator = open_pty(emulator_factory)
+        print(f"Replaying {len(frames)} readings at {rate:g}/s on {path} (Ctrl+C to stop)")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            stopped.set()
+        print(emulator.report())
+        return
+
+    ports = install(emulator_factory, args.transport)
+    if args.input:
+        builtins.input = scripted_input(args.input)
+    if args.duration:
+        timer = threading.Timer(args.duration, _thread.interrupt_main)
+        timer.daemon = True
+        timer.start()
+    elif args.limit:
+        threading.Thread(target=interrupt_when_done, args=(ports,), daemon=True).start()
+    print(f"Replaying {len(frames)} readings at {rate:g}/s into {args.run}")
+    start = time.perf_counter()
+    try:
+        sys.argv = [args.run]
+        runpy.run_path(args.run, run_name="__main__")
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        print(f"\n[Emulator] {args.run} ran for {time.perf_counter() - start:.1f}s")
+        for transport in list(FakeBleakClient.clients) + list(ports):
+            print(transport.report() if hasattr(transport, "report") else transport)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+import numpy as np
+
+# Rolling statistics computed per channel and per window
+STATS = ("mean", "slope", "min", "max", "ewma")
+
+
+class _Window:
+    """State of one window length for all channels at once.
+
+    Every update is O(1) per channel (amortized):
+      mean   running sum S_y
+      slope  least-squares slope from S_y and S_ty = sum(i * y_i), re-indexed
+             in place when the oldest sample drops out
+      min/max  van Herk / Gil-Werman: the stream is cut into blocks of the
+             window length; the window max is max(suffix max of the previous
+             block, prefix max of the current one), and the suffix maxima are
+             computed once per block
+      ewma   exponential average with span = window
+    At every block boundary the sums are recomputed exactly from the ring
+    buffer, so float error never accumulates.
+    """
+
+    def __init__(self, length, n_channels):
+        self.length = length
+        self.alpha = 2.0 / (length + 1)
+        self.ring = np.zeros((length, n_channels))
+        self.weights = np.arange(length, dtype=np.float64)[:, None]
+        self.sum = np.zeros(n_channels)
+        self.sum_ty = np.zeros(n_channels)
+        self.prefix_min = np.zeros(n_channels)
+        self.prefix_max = np.zeros(n_channels)
+        self.suffix_min = np.zeros((length, n_channels))
+        self.suffix_max = np.zeros((length, n_channels))
+        self.ewma = np.zeros(n_channels)
+        self.count = 0
+
+    def update(self, x, out):
+        """Adds sample x and writes {stat: values} into the `out` dict of views."""
+        length = self.length
+        ring = self.ring
+        pos = self.count % length
+        full = self.count >= length
+
+        if full:
+            if pos == 0:
+                # Block boundary: the ring holds the last block oldest-first
+                self.sum = ring.sum(axis=0)
+                self.sum_ty = (self.weights * ring).sum(axis=0)
+                np.maximum.accumulate(ring[::-1], axis=0, out=self.suffix_max[::-1])
+                np.minimum.accumulate(ring[::-1], axis=0, out=self.suffix_min[::-1])
+            old = ring[pos]
+            # Drop the oldest sample (every index shifts down by one), add x last
+            self.sum_ty -= self.sum - old
+            self.sum_ty += (length - 1) * x
+            self.sum += x - old
+        else:
+            self.sum_ty += self.count * x
+            self.sum += x
+        ring[pos] = x
+        self.count += 1
+        n = min(self.count, length)
+
+        if "mean" in out:
+            np.divide(self.sum, n, out=out["mean"], casting="unsafe")
+        if "slope" in out:
+            if n < 2:
+                out["slope"][:] = 0.0
+            else:
+                s_t = n * (n - 1) / 2.0
+                denominator = n * n * (n * n - 1) / 12.0
+                out["slope"][:] = (n * self.sum_ty - s_t * self.sum) / denominator
+        if "min" in out or "max" in out:
+            if pos == 0:
+                self.prefix_min[:] = x
+                self.prefix_max[:] = x
+            else:
+                np.minimum(self.prefix_min, x, out=self.prefix_min)
+                np.maximum(self.prefix_max, x, out=self.prefix_max)
+            if full and pos + 1 < length:
+                if "min" in out:
+                    np.minimum(self.suffix_min[pos + 1], self.prefix_min, out=out["min"], casting="unsafe")
+                if "max" in out:
+                    np.maximum(self.suffix_max[pos + 1], self.prefix_max, out=out["max"], casting="unsafe")
+            else:
+                if "min" in out:
+                    out["min"][:] = self.prefix_min
+                if "max" in out:
+                    out["max"][:] = self.prefix_max
+        if "ewma" in out:
+            if self.count == 1:
+                self.ewma[:] = x
+            else:
+                self.ewma += self.alpha * (x - self.ewma)
+            out["ewma"][:] = self.ewma
+
+
+class RollingFeatures:
+    """Streaming rolling-window features over a sequence of readings.
+
+    update() takes one reading (a row of `columns`) and returns the feature
+    vector: the raw reading (with `include_raw`) followed by every stat in
+    `stats` for every window in `windows`, per channel. transform() runs the
+    very same engine over a batch, so training features match what the
+    detector computes live. Windows that haven't filled yet use the samples
+    seen so far.
+
+    config()/from_config() round-trip the definition through the compiled
+    model's meta.json.
+    """
+
+    def __init__(self, columns, windows=(10,), stats=STATS, include_raw=True, dtype=np.float32):
+        unknown = set(stats) - set(STATS)
+        if unknown:
+            raise ValueError(f"Unknown rolling stats {sorted(unknown)}, expected some of {STATS}")
+        self.columns = list(columns)
+        self.windows = [int(window) for window in windows]
+        self.stats = [stat for stat in STATS if stat in stats]
+        self.include_raw = include_raw
+        self.dtype = dtype
+
+        n = len(self.columns)
+        self.feature_names = list(self.columns) if include_raw else []
+        for window in self.windows:
+            for stat in self.stats:
+                self.feature_names += [f"{column}_{stat}{window}" for column in self.columns]
+        self.out = np.zeros(len(self.feature_names), dtype=dtype)
+
+        # Views into `out` for each window/stat block
+        self._views = []
+        offset = n if include_raw else 0
+        for window in self.windows:
+            views = {}
+            for stat in self.stats:
+                views[stat] = self.out[offset:offset + n]
+                offset += n
+            self._views.append(views)
+        self.reset()
+
+    def reset(self):
+        """Forgets the history (new session, reconnect)."""
+        self._state = [_Window(window, len(self.columns)) for window in self.windows]
+
+    def __len__(self):
+        return len(self.feature_names)
+
+    def update(self, x):
+        """Adds one reading and returns the feature vector (reused buffer)."""
+        x = np.asarray(x, dtype=np.float64).reshape(-1)
+        if self.include_raw:
+            self.out[:len(x)] = x
+        for state, views in zip(self._state, self._views):
+            state.update(x, views)
+        return self.out
+
+    def transform(self, X, segments=None):
+        """Features for every row of X, in order. The history is reset
+        wherever `segments` changes value (e.g. one recording per label in
+        latest.csv), as it is for every new live session."""
+        X = np.asarray(X, dtype=np.float64)
+        features = np.empty((len(X), len(self)), dtype=self.dtype)
+        segments = None if segments is None else np.asarray(segments)
+        self.reset()
+        for i, x in enumerate(X):
+            if segments is not None and i > 0 and segments[i] != segments[i - 1]:
+                self.reset()
+            features[i] = self.update(x)
+        self.reset()
+        return features
+
+    def config(self):
+        return {"columns": self.columns, "windows": self.windows, "stats": self.stats,
+                "include_raw": self.include_raw}
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config["columns"], windows=config["windows"], stats=config["stats"],
+                   include_raw=config.get("include_raw", True))
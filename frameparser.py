@@ -0,0 +1,344 @@
+import numpy as np
+import binframe
+
+# Every reading sent over serial/BLE starts with this prefix
+DATA_PREFIX = b"Data;"
+
+# Longest frame accepted before the buffer is considered garbage
+MAX_FRAME_BYTES = 4096
+
+# Every byte but the field separators, deleted to see a frame's layout
+_NOT_SEPARATORS = bytes(byte for byte in range(256) if byte not in b":;")
+
+
+class FrameReassembler:
+    """Joins a byte stream (BLE notifications, serial reads) into frames.
+
+    A text frame in progress is kept as a list of its fragments: one that
+    holds no delimiter (the common case for 20-byte BLE notifications) is
+    only appended, and the list is joined once, when the fragment holding
+    the delimiter arrives. Frame starts and binary frames go through a
+    bytearray buffer scanned from where the previous scan stopped.
+
+    With `end_marker`, a frame also ends when a fragment ends with that marker
+    (the ";GMWIN:" convention simple_ble.py and Save_data.py relied on).
+
+    Binary frames (binframe.py) are detected by their first byte wherever a
+    frame starts and cut by their fixed size instead of the delimiter. One
+    that fails its CRC is treated as noise: a byte is skipped and the stream
+    resynchronises on the next frame.
+    """
+
+    def __init__(self, delimiter=b"\n", end_marker=None, max_frame_bytes=MAX_FRAME_BYTES):
+        self.delimiter = delimiter
+        self.end_marker = end_marker
+        self.max_frame_bytes = max_frame_bytes
+        self.buffer = bytearray()
+        self.scanned = 0  # Bytes before this offset hold no delimiter
+        self.frames = 0
+        self.overflows = 0
+        self.crc_errors = 0
+        # Fragments of the text frame in progress (the buffer is empty then)
+        self._parts = []
+        self._pending = 0  # Bytes of the incomplete frame
+        # The delimiter byte (an int: `in` on an int is a memchr, several times
+        # faster than a bytes search) while a text frame is in _parts, None
+        # otherwise. Only for single-byte delimiters: a longer one could
+        # straddle two fragments
+        self._open = None
+        self._fast = len(delimiter) == 1
+        # A fragment shorter than the end marker can only complete it if it is
+        # one of its suffixes; a longer one if it ends with the whole marker
+        self._tail = tuple(end_marker[i:] for i in range(len(end_marker))) if end_marker else ()
+
+    def feed(self, data):
+        """Adds bytes and returns the complete frames (bytes, delimiter removed)."""
+        delimiter = self._open
+        if delimiter is None:
+            return self._scan(data)
+        if delimiter not in data and not (self._tail and data.endswith(self._tail)):
+            # Fast path: a fragment in the middle of a text frame
+            self._parts.append(data)
+            self._pending += len(data)
+            if self._pending > self.max_frame_bytes:
+                self._overflow()
+            return []
+        return self._finish_text(data)
+
+    def _start_text(self, data):
+        """Whether `data` (no delimiter in it) can start a text frame in
+        _parts; otherwise it has to go through the buffer."""
+        if not self._fast or data[0] == binframe.MAGIC or (self.end_marker and data.endswith(self.end_marker)):
+            return False
+        self._parts.append(data)
+        self._pending = len(data)
+        self._open = self.delimiter[0]
+        if self._pending > self.max_frame_bytes:
+            self._overflow()
+        return True
+
+    def _finish_text(self, data):
+        parts = self._parts
+        end = data.find(self.delimiter)
+        if end < 0:
+            # Possibly the end marker's last bytes
+            parts.append(data)
+            frame = b"".join(parts)
+            parts.clear()
+            if frame.endswith(self.end_marker):
+                self._open = None
+                self._pending = 0
+                self.frames += 1
+                return [frame]
+            parts.append(frame)
+            self._pending = len(frame)
+            if self._pending > self.max_frame_bytes:
+                self._overflow()
+            return []
+        parts.append(data[:end])
+        frames = [b"".join(parts)]
+        parts.clear()
+        self._open = None
+        self._pending = 0
+        self.frames += 1
+        rest = data[end + 1:]
+        if rest and not (self.delimiter[0] not in rest and self._start_text(rest)):
+            frames += self._scan(rest)
+        return frames
+
+    def _scan(self, data):
+        buffer = self.buffer
+        buffer += data
+
+        delimiter = self.delimiter
+        frames = []
+        start = 0
+        scanned = self.scanned
+        while start < len(buffer):
+            if buffer[start] == binframe.MAGIC:
+                size = binframe.frame_size(buffer, start)
+                if size is None or len(buffer) - start < size:
+                    scanned = start
+                    break  # Wait for the rest of the binary frame
+                frame = bytes(buffer[start:start + size]) if size > 0 else b""
+                if size < 0 or not binframe.crc_ok(frame):
+                    self.crc_errors += 1
+                    start += 1
+                    scanned = start
+                    continue
+                frames.append(frame)
+                start = scanned = start + size
+                continue
+            end = buffer.find(delimiter, max(start, scanned))
+            if end < 0:
+                if self.end_marker is not None and buffer.endswith(self.end_marker):
+                    frames.append(bytes(buffer[start:]))
+                    start = len(buffer)
+                scanned = max(start, len(buffer) - len(delimiter) + 1)
+                break
+            frames.append(bytes(buffer[start:end]))
+            start = scanned = end + len(delimiter)
+        if start:
+            del buffer[:start]  # Only the incomplete frame stays buffered
+        self.scanned = scanned - start
+        self.frames += len(frames)
+
+        # A text frame in progress moves to the fragment list
+        if buffer and self._start_text(bytes(buffer)):
+            buffer.clear()
+            self.scanned = 0
+            return frames
+        self._pending = len(buffer)
+        if self._pending > self.max_frame_bytes:
+            self._overflow()
+        return frames
+
+    def _overflow(self):
+        # No delimiter in sight: drop the garbage instead of growing forever
+        self.overflows += 1
+        self.buffer.clear()
+        self._parts.clear()
+        self._pending = 0
+        self._open = None
+        self.scanned = 0
+
+    def pending(self):
+        """Bytes of the incomplete frame currently buffered."""
+        return self._pending
+
+
+class RecordParser:
+    """Parses 'Data;KEY:VAL;...' frames straight into a typed numeric row.
+
+    Key-to-column positions are resolved once; each frame is split on bytes,
+    so there is no decode to str and no dict per message. Unknown keys are
+    ignored and missing ones keep `fill_value`. `aliases` maps alternative
+    sensor keys (e.g. "SGPVRaw") to column names.
+
+    Binary frames (binframe.py) are accepted wherever a text frame is and
+    land in the same row; gaps in their sequence numbers are counted in
+    lost_frames.
+    """
+
+    def __init__(self, columns, aliases=None, fill_value=0.0, dtype=np.float32):
+        self.columns = list(columns)
+        self.fill_value = fill_value
+        self.dtype = dtype
+        self.positions = {name.encode(): i for i, name in enumerate(self.columns)}
+        for alias, name in (aliases or {}).items():
+            if name in self.columns:
+                self.positions.setdefault(alias.encode(), self.columns.index(name))
+        self.parse_errors = 0
+        self.lost_frames = 0
+        self._last_seq = None
+        self._schema_layouts = {}
+
+    @classmethod
+    def from_frame(cls, frame, **kwargs):
+        """Builds a parser whose columns are the keys of `frame`, in order."""
+        if isinstance(frame, str):
+            frame = frame.encode()
+        if binframe.is_binary(frame):
+            _, schema_id, _ = binframe.decode(frame)
+            return cls([name for name, _ in binframe.SCHEMAS[schema_id]], **kwargs)
+        columns = []
+        for part in frame.strip().split(b";"):
+            key, sep, _ = part.partition(b":")
+            key = key.strip().decode("utf-8", errors="replace")
+            if sep and key not in columns:
+                columns.append(key)
+        return cls(columns, **kwargs)
+
+    def __len__(self):
+        return len(self.columns)
+
+    def new_row(self):
+        """Returns a (1, n_columns) buffer to be reused for every reading."""
+        return np.full((1, len(self.columns)), self.fill_value, dtype=self.dtype)
+
+    def new_batch(self, batch_size):
+        """Returns a (batch_size, n_columns) buffer to be reused for every batch."""
+        return np.full((batch_size, len(self.columns)), self.fill_value, dtype=self.dtype)
+
+    @staticmethod
+    def _pairs(frame):
+        """Returns the (key, value) pairs of a 'KEY:VAL;KEY:VAL' frame.
+
+        Well-formed frames are split in one pass by turning every ';' into
+        ':'; anything else (empty fields, bare keys, ':' in a value) falls
+        back to splitting field by field.
+        """
+        body = frame.rstrip(b";")
+        separators = body.translate(None, _NOT_SEPARATORS)
+        if separators == b":;" * (len(separators) // 2) + b":":
+            # Exactly one ':' in every field
+            it = iter(body.replace(b";", b":").split(b":"))
+            return zip(it, it)
+        pairs = []
+        for part in frame.split(b";"):
+            key, sep, value = part.partition(b":")
+            if sep:
+                pairs.append((key, value))
+        return pairs
+
+    def _fields(self, frame):
+        """Yields (column position, raw value bytes) for every known key in the frame."""
+        positions = self.positions
+        for key, value in self._pairs(frame):
+            pos = positions.get(key)
+            if pos is None:
+                pos = positions.get(key.strip())
+                if pos is None:
+                    continue
+            yield pos, value
+
+    def parse_into(self, frame, out):
+        """Parses one data frame into the 1-D array `out`.
+
+        Returns the number of fields written, or -1 if `frame` is not a data
+        frame. Values that aren't numbers are skipped and counted in
+        parse_errors.
+        """
+        if isinstance(frame, str):
+            frame = frame.encode()
+        if binframe.is_binary(frame):
+            return self._parse_binary(frame, out)
+        frame = frame.strip()
+        if not frame.startswith(DATA_PREFIX):
+            return -1
+        # Fill a Python list and copy it into `out` once: per-element numpy
+        # stores cost more than the float parsing itself
+        values = [self.fill_value] * len(self.columns)
+        positions = self.positions
+        written = 0
+        for key, value in self._pairs(frame[len(DATA_PREFIX):]):
+            pos = positions.get(key)
+            if pos is None:
+                pos = positions.get(key.strip())
+                if pos is None:
+                    continue
+            try:
+                values[pos] = float(value)
+            except ValueError:
+                self.parse_errors += 1
+                continue
+            written += 1
+        out[:] = values
+        return written
+
+    def _decode_binary(self, frame):
+        """Returns (values, layout) for a binary frame, or None if it is
+        corrupt. `layout` maps each column to an index into values + (fill,)."""
+        try:
+            seq, schema_id, values = binframe.decode(frame)
+        except binframe.FrameError:
+            self.parse_errors += 1
+            return None
+        if self._last_seq is not None:
+            self.lost_frames += (seq - self._last_seq - 1) & 0xFFFF
+        self._last_seq = seq
+        layout = self._schema_layouts.get(schema_id)
+        if layout is None:
+            index = {}
+            for i, (name, _) in enumerate(binframe.SCHEMAS[schema_id]):
+                index.setdefault(self.positions.get(name.encode()), i)
+            missing = len(values)
+            layout = self._schema_layouts[schema_id] = [index.get(pos, missing) for pos in range(len(self.columns))]
+        return values, layout
+
+    def _parse_binary(self, frame, out):
+        decoded = self._decode_binary(frame)
+        if decoded is None:
+            return -1
+        values, layout = decoded
+        values += (self.fill_value,)
+        out[:] = [values[i] for i in layout]
+        return len(layout) - layout.count(len(values) - 1)
+
+    def split_into(self, frame, out):
+        """Fills the list `out` with the text of each known field ("" if
+        missing), for converters that keep the values as written. Accepts any
+        line containing KEY:VAL pairs, or a binary frame. Returns the number
+        of fields found."""
+        if isinstance(frame, str):
+            frame = frame.encode()
+        for i in range(len(out)):
+            out[i] = ""
+        written = 0
+        if binframe.is_binary(frame):
+            decoded = self._decode_binary(frame)
+            if decoded is not None:
+                values, layout = decoded
+                for pos, i in enumerate(layout):
+                    if i < len(values):
+                        out[pos] = f"{values[i]:g}"
+                        written += 1
+            return written
+        frame = frame.strip()
+        if frame.startswith(DATA_PREFIX):
+            # The one-pass split in _pairs() needs the frame without "Data;"
+            frame = frame[len(DATA_PREFIX):]
+        for pos, value in self._fields(frame):
+            out[pos] = value.strip().decode("utf-8", errors="replace")
+            written += 1
+        return written
@@ -1,12 +1,47 @@
+import numpy as np
 import pandas as pd
 import joblib
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.pipeline import make_pipeline
 from sklearn.model_selection import train_test_split, GridSearchCV
 from sklearn.preprocessing import StandardScaler
+import cascade
+from compiled_forest import CompiledForest, compile_pipeline, export_pipeline
+from cvcache import CVCache
+from dataset import load_training_frame
+from features import RollingFeatures
+from openset import OpenSetScorer
+from search import CachedGridSearch, HalvingSearch
+from sensors import LABELS, SENSOR_ALIASES
 
-# Load dataset
-df = pd.read_csv("latest.csv").dropna()
+# Rolling-window features over consecutive readings (None to classify single readings),
+# e.g. {"windows": [5, 20], "stats": ["mean", "slope", "min", "max", "ewma"]}
+ROLLING_FEATURES = None
+
+# Open-set check: share of each class's training readings accepted as known
+# (readings outside every class are reported as "Unknown"; None to disable)
+OPEN_SET_QUANTILE = 0.995
+
+# Cascade: a single shallow tree answers the readings it is confident
+# about and predict.py only runs the full forest on the rest (None to disable);
+# its threshold is calibrated so those answers are CASCADE_MIN_ACCURACY accurate
+FIRST_STAGE = cascade.FIRST_STAGE_PARAMS
+CASCADE_MIN_ACCURACY = cascade.MIN_EARLY_ACCURACY
+
+# Load dataset: the columnar dataset written by combined.py (memory-mapped,
+# compact dtypes), or latest.csv when it hasn't been built
+df, dataset_labels = load_training_frame()
+LABELS = dataset_labels or LABELS
+print(f"Loaded {len(df)} readings")
+
+feature_config = None
+if ROLLING_FEATURES:
+    # Computed in recording order, before shuffling, with the same engine predict.py
+    # runs live; each label's block of rows is one recording, so history resets there
+    engine = RollingFeatures(df.columns.drop("Label"), **ROLLING_FEATURES)
+    features = engine.transform(df[engine.columns].to_numpy(), segments=df["Label"].to_numpy())
+    df = pd.DataFrame(features, columns=engine.feature_names, index=df.index).assign(Label=df["Label"])
+    feature_config = engine.config()
 
 # Shuffle dataset
 df = df.sample(frac=1, random_state=42).reset_index(drop=True)
@@ -18,6 +53,16 @@ y = df["Label"]
 # Train/test split
 X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
+# "grid": exhaustive search over every combination
+# "halving": successive halving on n_estimators with warm-started forests
+SEARCH_MODE = "halving"
+TIME_BUDGET = 30 * 60  # Seconds, halving mode only (None for no limit)
+
+# Per-fold scores are cached on disk so interrupted or repeated searches resume;
+# old entries are evicted as the cache fills (set to None to disable; "grid"
+# then falls back to GridSearchCV)
+cv_cache = CVCache(".cv_cache", max_bytes=64 * 1024 * 1024)
+
 # Create a pipeline: StandardScaler -> RandomForest
 pipeline = make_pipeline(
     StandardScaler(),
@@ -32,18 +77,86 @@ param_grid = {
     "randomforestclassifier__min_samples_leaf": [1, 2, 5]  # Min samples per leaf
 }
 
-# Perform Grid Search with 5-fold cross-validation
-grid_search = GridSearchCV(pipeline, param_grid, cv=5, n_jobs=-1, verbose=2)
-grid_search.fit(X_train, y_train)
+if SEARCH_MODE == "halving":
+    # Successive halving with 5-fold cross-validation, then refit the winner
+    search = HalvingSearch(param_grid, cv=5, factor=3, time_budget=TIME_BUDGET, cache=cv_cache)
+    search.fit(X_train, y_train)
+    print(f"Search finished in {search.elapsed_:.1f}s, {search.n_trees_fitted_} trees fitted")
+    best_model = pipeline.set_params(**search.best_params_).fit(X_train, y_train)
+elif cv_cache is not None:
+    # Exhaustive grid with 5-fold cross-validation, skipping cached fold/parameter results
+    search = CachedGridSearch(param_grid, cv_cache, cv=5)
+    search.fit(X_train, y_train)
+    print(f"Search finished in {search.elapsed_:.1f}s")
+    best_model = pipeline.set_params(**search.best_params_).fit(X_train, y_train)
+else:
+    # Perform Grid Search with 5-fold cross-validation
+    search = GridSearchCV(pipeline, param_grid, cv=5, n_jobs=-1, verbose=2)
+    search.fit(X_train, y_train)
+    best_model = search.best_estimator_
+
+if cv_cache is not None:
+    print(cv_cache.summary())
 
 # Print best parameters
-print("Best parameters found:", grid_search.best_params_)
+print("Best parameters found:", search.best_params_)
 
 # Evaluate on test set
-best_model = grid_search.best_estimator_
 test_score = best_model.score(X_test, y_test)
 print(f"Test Accuracy: {test_score:.2f}")
 
-# Save the best model
+# Fit the open-set scorer next to the forest: per-class means and inverse covariances
+openset = None
+if OPEN_SET_QUANTILE:
+    openset = OpenSetScorer.fit(X_train, y_train, quantile=OPEN_SET_QUANTILE)
+    # Synthetic out-of-distribution readings: every column drawn independently from the test set
+    rng = np.random.default_rng(42)
+    X_ood = np.column_stack([rng.choice(X_test.iloc[:, j].to_numpy(), len(X_test)) for j in range(X_test.shape[1])])
+    print(f"Open-set check: {openset.is_unknown(X_test).mean():.1%} of test readings rejected, "
+          f"{openset.is_unknown(X_ood).mean():.1%} of shuffled-column readings rejected")
+
+# Save the best model (with the rolling feature definition and open-set scorer it was trained with)
+best_model.rolling_features_ = feature_config
+best_model.openset_ = openset
 joblib.dump(best_model, "best_worad_rf.pkl")    
 print("Best Random Forest model saved successfully!")
+
+# Export the flattened, array-backed forest used by predict.py (no sklearn at runtime)
+# together with its schema (feature order, class names, sensor-key aliases, rolling features)
+meta = export_pipeline(best_model, "best_worad_rf", feature_names=list(X.columns),
+                       labels=LABELS, aliases=SENSOR_ALIASES, features=feature_config, openset=openset)
+print(f"Compiled model ({meta['n_trees']} trees, {meta['n_nodes']} nodes) saved to best_worad_rf/")
+
+if FIRST_STAGE:
+    # Fit the first stage, calibrate its threshold on out-of-fold probabilities,
+    # then report the accuracy/throughput trade-off on the test set
+    first_stage, oof_proba = cascade.fit_first_stage(X_train, y_train, FIRST_STAGE)
+    threshold = cascade.calibrate(oof_proba, y_train, first_stage.classes_, CASCADE_MIN_ACCURACY)
+    # Per-reading cost of each stage, compiled as predict.py runs them
+    rows = X_test.to_numpy(dtype=np.float32)[:1000]
+    first_seconds = cascade.time_per_reading(cascade.FirstStage(CompiledForest(*compile_pipeline(first_stage))), rows)
+    full_seconds = cascade.time_per_reading(CompiledForest.load("best_worad_rf"), rows)
+    thresholds = sorted(set(cascade.CURVE_THRESHOLDS) | ({threshold} if threshold is not None else set()))
+    curve = cascade.tradeoff(first_stage.predict_proba(X_test), first_stage.classes_, best_model.predict(X_test),
+                             y_test, thresholds, first_seconds, full_seconds)
+    print(f"Cascade trade-off on the test set (full forest alone: {test_score:.4f} accuracy, "
+          f"{full_seconds * 1e6:.0f} us/reading; first stage {first_seconds * 1e6:.0f} us/reading):")
+    print(f"  {'threshold':>9}  {'early':>6}  {'accuracy':>8}  {'us/reading':>10}  {'readings/s':>10}")
+    for point in curve:
+        chosen = "  <- calibrated" if point["threshold"] == threshold else ""
+        print(f"  {point['threshold']:>9.3f}  {point['early']:>6.1%}  {point['accuracy']:>8.4f}  "
+              f"{point['us_per_reading']:>10.1f}  {point['readings_per_s']:>10,.0f}{chosen}")
+    if threshold is None:
+        cascade.remove_first_stage("best_worad_rf")
+        print(f"No first-stage threshold reaches {CASCADE_MIN_ACCURACY} accuracy out of fold, cascade not exported")
+    else:
+        point = next(point for point in curve if point["threshold"] == threshold)
+        first_meta = cascade.export_first_stage(first_stage, "best_worad_rf", threshold, meta,
+                                                feature_names=list(X.columns), labels=LABELS, aliases=SENSOR_ALIASES,
+                                                features=feature_config,
+                                                info={"min_accuracy": CASCADE_MIN_ACCURACY, "test": point})
+        print(f"First stage ({first_meta['n_trees']} trees, {first_meta['n_nodes']} nodes) saved to "
+              f"best_worad_rf/{cascade.FIRST_STAGE_DIRNAME}/, threshold {threshold:.3f}: "
+              f"{point['early']:.1%} of test readings resolved early")
+else:
+    cascade.remove_first_stage("best_worad_rf")
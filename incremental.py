@@ -0,0 +1,374 @@
+import argparse
+import copy
+import hashlib
+import json
+import os
+import shutil
+import time
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+from archive import class_names, find_files, parse_frames, read_text_sessions
+from compiled_forest import export_pipeline
+from dataset import DATASET_PATH, LABEL_COLUMN, SCHEMA_FILENAME, load_training_frame, labels as schema_labels
+from features import RollingFeatures
+from openset import OpenSetScorer
+from sensors import SENSOR_ALIASES
+
+# Adds a newly labelled collection session to the deployed model without a
+# new grid search: extra trees are grown (warm start) on the new readings plus
+# a reservoir sample of the old training data, the scaler's statistics are
+# updated, and the result is only promoted if held-out accuracy holds.
+#
+#   python incremental.py Isopropanol path/to/Isoprop15 [more files or folders]
+#
+# Session .txt files are read directly (like archive.py), since CSVprocess.py
+# keeps only the BLE sensors and leaves out channels the model may use
+# (STC_Temp, GMODO); a .csv is read only when its .txt isn't there. Files
+# without every model input are skipped, as combined.py drops such rows.
+
+# Model used by predict.py, replaced when an update is accepted
+MODEL_PATH = "best_worad_rf.pkl"
+COMPILED_MODEL_PATH = "best_worad_rf"
+
+# Every accepted model is kept as model_versions/vNNNN/ (model.pkl, compiled/,
+# reservoir.npz, version.json); history.jsonl logs accepted and rejected updates
+VERSIONS_PATH = "model_versions"
+CURRENT_FILENAME = "CURRENT"
+HISTORY_FILENAME = "history.jsonl"
+
+NEW_TREES = 50  # Trees grown per update
+MAX_TREES = 500  # The oldest trees are dropped beyond this (None to keep all)
+
+# Old readings kept for training the new trees, and for validating updates
+RESERVOIR_SIZE = 20000
+HOLDOUT_SIZE = 5000
+
+# Share of each new session held out for validation
+HOLDOUT_FRACTION = 0.2
+
+# Largest drop in accuracy on the old held-out readings that is still accepted
+MAX_REGRESSION = 0.005
+
+# Accuracy the updated model must reach on the new session's held-out readings;
+# catches mislabelled sessions the extra trees can't absorb (None to skip)
+MIN_NEW_ACCURACY = 0.8
+
+
+class Reservoir:
+    """Uniform sample of at most `capacity` rows of everything added so far
+    (Algorithm R), so old sessions stay represented in fixed memory."""
+
+    def __init__(self, capacity, X, y, seen=0):
+        self.capacity = capacity
+        self.X = X
+        self.y = y
+        self.seen = seen
+
+    @classmethod
+    def empty(cls, capacity, n_features):
+        return cls(capacity, np.empty((0, n_features)), np.empty(0, dtype=np.int64))
+
+    def add(self, X, y, rng):
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y, dtype=np.int64)
+        free = min(self.capacity - len(self.y), len(y))
+        if free > 0:
+            self.X = np.concatenate([self.X, X[:free]])
+            self.y = np.concatenate([self.y, y[:free]])
+        # Row i of the rest replaces a random slot with probability capacity / (rows seen)
+        seen = self.seen + free + np.arange(len(y) - free)
+        slots = rng.integers(0, seen + 1) if len(seen) else seen
+        for i in np.flatnonzero(slots < self.capacity):
+            self.X[slots[i]] = X[free + i]
+            self.y[slots[i]] = y[free + i]
+        self.seen += len(y)
+
+
+def file_hash(path):
+    with open(path, "rb") as file:
+        return hashlib.sha1(file.read()).hexdigest()
+
+
+def save_reservoirs(path, train, holdout):
+    np.savez(path, train_X=train.X, train_y=train.y, train_seen=train.seen,
+             holdout_X=holdout.X, holdout_y=holdout.y, holdout_seen=holdout.seen)
+
+
+def load_reservoirs(path):
+    with np.load(path) as data:
+        return (Reservoir(RESERVOIR_SIZE, data["train_X"], data["train_y"], int(data["train_seen"])),
+                Reservoir(HOLDOUT_SIZE, data["holdout_X"], data["holdout_y"], int(data["holdout_seen"])))
+
+
+def feature_frame(frame, model, segments=None):
+    """The model's input columns for raw readings, with its rolling features
+    (reset wherever `segments` changes, as in gridsearchrf.py) if it has any."""
+    config = getattr(model, "rolling_features_", None)
+    if not config:
+        return frame[list(model.feature_names_in_)]
+    engine = RollingFeatures.from_config(config)
+    features = engine.transform(frame[engine.columns].to_numpy(), segments=segments)
+    return pd.DataFrame(features, columns=engine.feature_names)
+
+
+def bootstrap(model, model_hash):
+    """Version 0: the model gridsearchrf.py trained, with reservoirs drawn from
+    its training split and its test split as the held-out set."""
+    df, _ = load_training_frame()
+    X = feature_frame(df, model, segments=df[LABEL_COLUMN].to_numpy())
+    y = df[LABEL_COLUMN].to_numpy()
+    # The same shuffle and split as gridsearchrf.py, so the held-out rows are unseen
+    order = pd.Series(np.arange(len(y))).sample(frac=1, random_state=42).to_numpy()
+    X_train, X_test, y_train, y_test = train_test_split(X.iloc[order], y[order], test_size=0.2, random_state=42)
+    rng = np.random.default_rng(0)
+    train = Reservoir.empty(RESERVOIR_SIZE, X.shape[1])
+    train.add(X_train.to_numpy(), y_train, rng)
+    holdout = Reservoir.empty(HOLDOUT_SIZE, X.shape[1])
+    holdout.add(X_test.to_numpy(), y_test, rng)
+    info = {"version": 0, "parent": None, "model_sha1": model_hash, "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "sources": ["gridsearchrf.py"], "n_trees": len(model[-1].estimators_)}
+    write_version(model, train, holdout, info, compile_model=False)
+    return train, holdout, info
+
+
+def version_path(version):
+    return os.path.join(VERSIONS_PATH, f"v{version:04d}")
+
+
+def write_version(model, train, holdout, info, compile_model=True):
+    path = version_path(info["version"])
+    tmp_path = path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    joblib.dump(model, os.path.join(tmp_path, "model.pkl"))
+    if compile_model:
+        export(model, os.path.join(tmp_path, "compiled"), info["labels"])
+    save_reservoirs(os.path.join(tmp_path, "reservoir.npz"), train, holdout)
+    with open(os.path.join(tmp_path, "version.json"), "w") as file:
+        json.dump(info, file, indent=2)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    with open(os.path.join(VERSIONS_PATH, CURRENT_FILENAME), "w") as file:
+        file.write(os.path.basename(path))
+
+
+def export(model, path, labels):
+    export_pipeline(model, path, feature_names=list(model.feature_names_in_), labels=labels,
+                    aliases=SENSOR_ALIASES, features=getattr(model, "rolling_features_", None),
+                    openset=getattr(model, "openset_", None))
+
+
+def current_version(model_hash):
+    """(train reservoir, holdout reservoir, version info) of the deployed model,
+    or None if it wasn't produced by this script (e.g. gridsearchrf.py ran since)."""
+    try:
+        with open(os.path.join(VERSIONS_PATH, CURRENT_FILENAME)) as file:
+            path = os.path.join(VERSIONS_PATH, file.read().strip())
+        with open(os.path.join(path, "version.json")) as file:
+            info = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if info["model_sha1"] != model_hash:
+        return None
+    return load_reservoirs(os.path.join(path, "reservoir.npz")) + (info,)
+
+
+def rescale_thresholds(forest, old_mean, old_scale, new_mean, new_scale):
+    """Rewrites the split thresholds of already grown trees for a new scaler,
+    so they make the same decisions on raw readings as before."""
+    for tree in forest.estimators_:
+        nodes = tree.tree_.feature >= 0
+        feature = tree.tree_.feature[nodes]
+        threshold = tree.tree_.threshold  # A view: writes go into the tree
+        raw = threshold[nodes] * old_scale[feature] + old_mean[feature]
+        threshold[nodes] = (raw - new_mean[feature]) / new_scale[feature]
+
+
+def grow(model, X_new, y_new, reservoir, new_trees):
+    """Copy of the pipeline with the scaler updated by X_new and `new_trees`
+    trees grown on X_new plus the reservoir."""
+    model = copy.deepcopy(model)
+    scaler, forest = model[0], model[-1]
+    old_mean, old_scale = scaler.mean_.copy(), scaler.scale_.copy()
+    scaler.partial_fit(X_new)
+    rescale_thresholds(forest, old_mean, old_scale, scaler.mean_, scaler.scale_)
+
+    X_fit = np.concatenate([reservoir.X, X_new.to_numpy(dtype=np.float64)])
+    y_fit = np.concatenate([reservoir.y, y_new])
+    missing = np.setdiff1d(forest.classes_, y_fit)
+    if len(missing):
+        raise ValueError(f"No training readings left for classes {missing.tolist()}; retrain with gridsearchrf.py")
+    if MAX_TREES is not None and len(forest.estimators_) + new_trees > MAX_TREES:
+        forest.estimators_ = forest.estimators_[len(forest.estimators_) + new_trees - MAX_TREES:]
+    forest.set_params(warm_start=True, n_estimators=len(forest.estimators_) + new_trees)
+    forest.fit(scaler.transform(pd.DataFrame(X_fit, columns=X_new.columns)), y_fit)
+    forest.set_params(warm_start=False)
+    return model
+
+
+def accuracy(model, X, y):
+    if len(y) == 0:
+        return float("nan")
+    return float((model.predict(X) == y).mean())
+
+
+def read_recordings(path):
+    """Raw readings of one capture file as DataFrames with the training
+    column names, one per recording (session of a .txt, or the whole CSV)."""
+    if path.lower().endswith(".csv"):
+        return [pd.read_csv(path).rename(columns=lambda key: SENSOR_ALIASES.get(key.strip(), key.strip()))]
+    recordings = []
+    for _, _, frames, _ in read_text_sessions(path):
+        columns, values = parse_frames(frames)
+        recordings.append(pd.DataFrame(values, columns=columns))
+    return recordings
+
+
+def read_session(paths, model):
+    """Model inputs for the readings of every capture file under `paths`
+    (see find_files), with rolling features reset per recording. Files
+    that lack one of the model's input channels are skipped."""
+    config = getattr(model, "rolling_features_", None)
+    columns = config["columns"] if config else list(model.feature_names_in_)
+    files = find_files(paths)
+    frames = []
+    lacking = set()
+    for path in files:
+        for frame in read_recordings(path):
+            missing = [column for column in columns if column not in frame.columns]
+            if missing:
+                print(f"Skipping {path}: no {', '.join(missing)} readings")
+                lacking.update(missing)
+                continue
+            frame = frame[columns].dropna()
+            if len(frame):
+                frames.append(feature_frame(frame, model))
+    if not frames:
+        message = f"No readings found in {', '.join(paths)}"
+        if lacking:
+            message += (f": the model needs {', '.join(sorted(lacking))}, which these files don't have "
+                        "(CSVprocess.py output leaves some channels out; pass the session .txt files)")
+        raise ValueError(message)
+    return pd.concat(frames, ignore_index=True), files
+
+
+def dataset_labels():
+    """{label: class name} the training dataset was built with: from its
+    schema when combined.py has built it, otherwise from dataset.json (or the
+    default labels)."""
+    schema_path = os.path.join(DATASET_PATH, SCHEMA_FILENAME)
+    if os.path.exists(schema_path):
+        with open(schema_path) as file:
+            return schema_labels(json.load(file))
+    return class_names()[0]
+
+
+def resolve_label(label, labels):
+    names = {name.lower(): value for value, name in labels.items()}
+    if label.lower() in names:
+        return names[label.lower()]
+    try:
+        return int(label)
+    except ValueError:
+        raise ValueError(f"Unknown class {label!r}, expected one of {', '.join(labels.values())}") from None
+
+
+def update(label, paths, new_trees=NEW_TREES, dry_run=False):
+    start = time.perf_counter()
+    model = joblib.load(MODEL_PATH)
+    model_hash = file_hash(MODEL_PATH)
+    labels = dataset_labels()
+    y_label = resolve_label(label, labels)
+    if y_label not in model.classes_:
+        raise ValueError(f"{labels.get(y_label, y_label)} isn't one of the model's classes; "
+                         "new classes need a full retrain with gridsearchrf.py")
+
+    os.makedirs(VERSIONS_PATH, exist_ok=True)
+    state = current_version(model_hash)
+    if state is None:
+        print(f"Starting version history from {MODEL_PATH}")
+        state = bootstrap(model, model_hash)
+    train, holdout, parent = state
+
+    X, files = read_session(paths, model)
+    y = np.full(len(X), y_label)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=HOLDOUT_FRACTION, random_state=42)
+    print(f"{len(X)} new {labels.get(y_label, y_label)} readings from {len(files)} files "
+          f"({len(X_train)} train, {len(X_test)} held out); reservoir {len(train.y)} of {train.seen} old readings")
+
+    candidate = grow(model, X_train, y_train, train, new_trees)
+    if getattr(model, "openset_", None) is not None:
+        X_known = np.concatenate([train.X, X_train.to_numpy(dtype=np.float64)])
+        y_known = np.concatenate([train.y, y_train])
+        candidate.openset_ = OpenSetScorer.fit(X_known, y_known, quantile=model.openset_.meta["quantile"])
+
+    # Validation gate: no regression on the old held-out readings, no worse on the
+    # new ones, and the new session actually learnt
+    X_old = pd.DataFrame(holdout.X, columns=X.columns)
+    scores = {
+        "old_current": accuracy(model, X_old, holdout.y),
+        "old_candidate": accuracy(candidate, X_old, holdout.y),
+        "new_current": accuracy(model, X_test, y_test),
+        "new_candidate": accuracy(candidate, X_test, y_test),
+    }
+    accepted = (scores["old_candidate"] >= scores["old_current"] - MAX_REGRESSION
+                and scores["new_candidate"] >= scores["new_current"]
+                and (MIN_NEW_ACCURACY is None or scores["new_candidate"] >= MIN_NEW_ACCURACY))
+    print(f"Held-out accuracy, old readings: {scores['old_current']:.4f} -> {scores['old_candidate']:.4f}; "
+          f"new readings: {scores['new_current']:.4f} -> {scores['new_candidate']:.4f}")
+
+    info = {"version": parent["version"] + 1, "parent": parent["version"], "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "label": int(y_label), "sources": files, "new_readings": len(X),
+            "n_trees": len(candidate[-1].estimators_), "accuracy": scores, "accepted": accepted,
+            "labels": {int(value): name for value, name in labels.items()}}
+    if accepted and not dry_run:
+        # Keep the new readings for future updates and validations
+        rng = np.random.default_rng(info["version"])
+        train.add(X_train.to_numpy(), y_train, rng)
+        holdout.add(X_test.to_numpy(), y_test, rng)
+        tmp_model = MODEL_PATH + ".tmp"
+        joblib.dump(candidate, tmp_model)
+        info["model_sha1"] = file_hash(tmp_model)
+        write_version(candidate, train, holdout, info)
+
+        # Promote: what predict.py loads
+        os.replace(tmp_model, MODEL_PATH)
+        tmp_compiled = COMPILED_MODEL_PATH + ".tmp"
+        shutil.rmtree(tmp_compiled, ignore_errors=True)
+        shutil.copytree(os.path.join(version_path(info["version"]), "compiled"), tmp_compiled)
+        shutil.rmtree(COMPILED_MODEL_PATH, ignore_errors=True)
+        os.replace(tmp_compiled, COMPILED_MODEL_PATH)
+
+    info["seconds"] = round(time.perf_counter() - start, 1)
+    if not dry_run:
+        with open(os.path.join(VERSIONS_PATH, HISTORY_FILENAME), "a") as file:
+            file.write(json.dumps(info) + "\n")
+    if not accepted:
+        print(f"Update rejected: held-out accuracy regressed or the new readings weren't learnt; "
+              f"{MODEL_PATH} is unchanged")
+    elif dry_run:
+        print("Dry run: update passed validation but nothing was saved")
+    else:
+        print(f"Version {info['version']} ({info['n_trees']} trees) saved to {version_path(info['version'])}/ "
+              f"and promoted to {MODEL_PATH} and {COMPILED_MODEL_PATH}/ in {info['seconds']}s")
+    return accepted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Add a labelled session to the model without a full retrain")
+    parser.add_argument("label", help="class of the new readings (name or number)")
+    parser.add_argument("paths", nargs="+", help="session files or folders (searched recursively)")
+    parser.add_argument("--trees", type=int, default=NEW_TREES, help="trees to grow (default %(default)s)")
+    parser.add_argument("--dry-run", action="store_true", help="validate without saving or promoting")
+    args = parser.parse_args()
+    try:
+        accepted = update(args.label, args.paths, new_trees=args.trees, dry_run=args.dry_run)
+    except ValueError as error:
+        raise SystemExit(f"Update failed: {error}")
+    raise SystemExit(0 if accepted else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import numpy as np
+
+
+class ArrayPredictor:
+    """Runs a fitted StandardScaler -> RandomForestClassifier pipeline on raw NumPy
+    arrays, skipping the per-call DataFrame conversion and input validation."""
+
+    def __init__(self, pipeline, batch_size=1):
+        scaler = pipeline[0]
+        self.classifier = pipeline[-1]
+        self.trees = [estimator.tree_ for estimator in self.classifier.estimators_]
+        self.classes = self.classifier.classes_
+
+        # Fold the scaler into two vectors so scaling is a subtract and a divide
+        n_features = self.classifier.n_features_in_
+        self.mean = np.zeros(n_features)
+        self.scale = np.ones(n_features)
+        if getattr(scaler, "mean_", None) is not None:
+            self.mean = scaler.mean_
+        if getattr(scaler, "scale_", None) is not None:
+            self.scale = scaler.scale_
+
+        # Reusable work buffers (the trees expect float32 input)
+        self.batch_size = batch_size
+        self._scaled = np.empty((batch_size, n_features))
+        self._scaled32 = np.empty((batch_size, n_features), dtype=np.float32)
+        self._proba = np.empty((batch_size, len(self.classes)))
+
+    def predict_proba(self, X):
+        """Class probabilities for a (n, n_features) array of raw sensor values."""
+        n = X.shape[0]
+        if n > self.batch_size:
+            # The result below is a view of a reused buffer, so copy each chunk
+            return np.vstack([self.predict_proba(X[i:i + self.batch_size]).copy()
+                              for i in range(0, n, self.batch_size)])
+
+        scaled = self._scaled[:n]
+        scaled32 = self._scaled32[:n]
+        np.subtract(X, self.mean, out=scaled)
+        np.divide(scaled, self.scale, out=scaled)
+        scaled32[...] = scaled
+
+        proba = self._proba[:n]
+        proba.fill(0.0)
+        for tree in self.trees:
+            value = tree.predict(scaled32)
+            proba += value / value.sum(axis=1, keepdims=True)
+        proba /= len(self.trees)
+        return proba
+
+    def predict(self, X):
+        """Predicted labels for a (n, n_features) array of raw sensor values."""
+        return self.classes[np.argmax(self.predict_proba(X), axis=1)]
+
+    def predict_one(self, row):
+        """Predicted label for a single (1, n_features) row."""
+        return self.classes[np.argmax(self.predict_proba(row)[0])]
@@ -0,0 +1,514 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
+import binframe
+import metrics
+from cascade import Cascade
+from compiled_forest import CompiledForest
+from features import RollingFeatures
+from frameparser import RecordParser
+from openset import UNKNOWN_LABEL
+
+# Long-lived local inference service: loads the model once and classifies
+# readings for any number of producers (predict.py instances, capture scripts,
+# other rigs). Readings from all streams are micro-batched under a deadline
+# into one vectorized predict call.
+#
+# Protocol: newline-delimited text over localhost TCP (or a Unix socket).
+#   request  "<stream> Data;KEY:VAL;...\n"
+#   reply    "<stream> <seq> <label>\n"
+# <stream> names a sensor rig (no spaces); <seq> counts that stream's readings
+# on the connection from 1. Replies on a connection come back in request
+# order. Each stream keeps its own rolling-feature history; it starts over
+# when the connection closes.
+#
+#   python inference_service.py                        # 127.0.0.1:8765
+#   python inference_service.py --max-delay 5 --pool process
+
+# Compiled forest exported by gridsearchrf.py; the pickled pipeline is used
+# if it hasn't been exported
+COMPILED_MODEL_PATH = "best_worad_rf"
+MODEL_PATH = "best_worad_rf.pkl"
+# Training data, only read for the column order of pickled models that
+# predate feature_names_in_
+TRAINING_DATA_PATH = "latest.csv"
+
+# Run the compiled model's first stage (if it has one) ahead of the full
+# forest, which then only predicts the readings the first stage is unsure of
+CASCADE = True
+
+# "host:port" for TCP, or a filesystem path for a Unix socket (not on Windows)
+ADDRESS = "127.0.0.1:8765"
+
+# A batch is predicted once it holds MAX_BATCH readings or its oldest reading
+# has waited MAX_DELAY seconds, whichever comes first
+MAX_BATCH = 256
+MAX_DELAY = 0.002  # Seconds
+
+# None predicts on the event loop; "thread" or "process" runs batches on a
+# pool of WORKERS so several can be predicted at once. Process workers are
+# spawned, not forked (a fork would inherit the listening socket and the
+# event loop), and each loads the model; the compiled arrays are
+# memory-mapped, so their pages are shared rather than copied. Threads only
+# help where NumPy releases the GIL.
+POOL = None
+WORKERS = os.cpu_count() or 1
+
+# Readings a connection may have awaiting replies before the service stops
+# reading from it
+MAX_OUTSTANDING = 1024
+
+# Reply label for lines that aren't data frames (or exceed the reader's
+# 64 KiB line limit), and for readings whose batch failed to predict
+INVALID_LABEL = "Invalid"
+ERROR_LABEL = "Error"
+
+# Per-stage timings (parse, feature, predict, end_to_end) and counters,
+# exported to metrics_inference_service.prom; see metrics.py
+METRICS = False
+
+
+def parse_address(address):
+    """("tcp", (host, port)) for "host:port", ("unix", path) otherwise."""
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit() and os.sep not in host:
+        return "tcp", (host or "127.0.0.1", int(port))
+    return "unix", address
+
+
+class ServiceModel:
+    """The trained model as the service runs it: the forest, its open-set
+    scorer and the input schema, loaded as predict.py loads them."""
+
+    def __init__(self, compiled_path=COMPILED_MODEL_PATH, model_path=MODEL_PATH, max_batch=MAX_BATCH,
+                 cascade=CASCADE):
+        self.compiled_path = compiled_path
+        self.model_path = model_path
+        self.max_batch = max_batch
+        self.cascade = None
+        if os.path.isdir(compiled_path):
+            self.predictor = CompiledForest.load(compiled_path)
+            self.feature_columns = self.predictor.feature_names
+            labels = self.predictor.labels
+            self.aliases = self.predictor.aliases
+            feature_config = self.predictor.features
+            self.openset = self.predictor.openset
+            if cascade:
+                self.cascade = Cascade.load(compiled_path, self.predictor)
+                if self.cascade is not None:
+                    self.predictor = self.cascade
+        else:
+            import joblib
+            from inference import ArrayPredictor
+            from sensors import LABELS, SENSOR_ALIASES
+            model = joblib.load(model_path)
+            feature_columns = getattr(model, "feature_names_in_", None)
+            if feature_columns is None:
+                import pandas as pd
+                feature_columns = pd.read_csv(TRAINING_DATA_PATH, nrows=0).drop(columns=["Label"]).columns
+            self.feature_columns = list(feature_columns)
+            labels = LABELS
+            self.aliases = SENSOR_ALIASES
+            feature_config = getattr(model, "rolling_features_", None)
+            self.openset = getattr(model, "openset_", None)
+            self.predictor = ArrayPredictor(model, batch_size=max_batch)
+        self.feature_config = feature_config
+        self.input_columns = RollingFeatures.from_config(feature_config).columns if feature_config else self.feature_columns
+        self.labels = {label: name.encode() for label, name in labels.items()}
+
+    def new_stream(self):
+        """(parser, rolling features or None) for one stream's readings."""
+        parser = RecordParser(self.input_columns, aliases=self.aliases)
+        rolling = RollingFeatures.from_config(self.feature_config) if self.feature_config else None
+        return parser, rolling
+
+    def predict_labels(self, X):
+        """Label (bytes) of every row of X; readings that fit no class are Unknown."""
+        names = [UNKNOWN_LABEL.encode()] * len(X)
+        known = np.arange(len(X))
+        if self.openset is not None:
+            known = np.flatnonzero(~self.openset.is_unknown(X))
+        if len(known):
+            unknown = UNKNOWN_LABEL.encode()
+            for i, label in zip(known.tolist(), self.predictor.predict(X[known]).tolist()):
+                names[i] = self.labels.get(label, unknown)
+        return names
+
+
+# Model of each pool worker (one per thread in "thread" mode)
+_worker = threading.local()
+
+
+def init_worker(compiled_path, model_path, max_batch, cascade):
+    _worker.model = ServiceModel(compiled_path, model_path, max_batch, cascade)
+
+
+def predict_batch(X):
+    return _worker.model.predict_labels(X)
+
+
+class MicroBatcher:
+    """Collects readings from every stream into one batch buffer and predicts
+    it once it is full or its oldest reading has waited `max_delay` seconds.
+
+    Runs on the event loop. submit() copies the feature row in and returns a
+    future for its label. With an executor, batches are predicted on the pool
+    while the next one fills; when every worker is busy at the deadline the
+    batch keeps filling until one frees up, so batches grow under load
+    instead of queueing.
+    """
+
+    def __init__(self, n_features, predict, max_batch=MAX_BATCH, max_delay=MAX_DELAY, executor=None, workers=1):
+        self.predict = predict
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.executor = executor
+        self.workers = workers if executor is not None else 1
+        self.loop = asyncio.get_running_loop()
+        self.metrics = metrics.get()
+        self._rows = np.empty((max_batch, n_features), dtype=np.float32)
+        self._futures = []
+        self._timer = None
+        self._deferred = False
+        self.in_flight = 0
+
+        # Counters
+        self.readings = 0
+        self.batches = 0
+        self.max_batch_seen = 0
+
+    def submit(self, x):
+        n = len(self._futures)
+        self._rows[n] = x
+        future = self.loop.create_future()
+        self._futures.append(future)
+        if n + 1 >= self.max_batch:
+            self.flush()
+        elif n == 0:
+            self._timer = self.loop.call_later(self.max_delay, self._deadline)
+        return future
+
+    def _deadline(self):
+        self._timer = None
+        if self.in_flight >= self.workers:
+            self._deferred = True  # Flushed as soon as a worker is free
+        else:
+            self.flush()
+
+    def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._deferred = False
+        futures = self._futures
+        if not futures:
+            return
+        self._futures = []
+        n = len(futures)
+        self.readings += n
+        self.batches += 1
+        self.max_batch_seen = max(self.max_batch_seen, n)
+        self.metrics.count("batches")
+        if self.executor is None:
+            start = self.metrics.now()
+            try:
+                self._resolve(futures, self.predict(self._rows[:n]))
+            except Exception as e:
+                self._fail(futures, e)
+            self.metrics.lap("predict", start)
+            return
+        self.in_flight += 1
+        start = self.metrics.now()
+        done = self.loop.run_in_executor(self.executor, self.predict, self._rows[:n].copy())
+        done.add_done_callback(lambda done: self._completed(futures, done, start))
+
+    def _completed(self, futures, done, start):
+        self.in_flight -= 1
+        self.metrics.lap("predict", start)  # Including the wait for a worker
+        if done.exception() is not None:
+            self._fail(futures, done.exception())
+        else:
+            self._resolve(futures, done.result())
+        if self._deferred:
+            self.flush()
+
+    @staticmethod
+    def _resolve(futures, labels):
+        for future, label in zip(futures, labels):
+            if not future.cancelled():
+                future.set_result(label)
+
+    @staticmethod
+    def _fail(futures, error):
+        for future in futures:
+            if not future.cancelled():
+                future.set_exception(error)
+
+    def stats(self):
+        mean = self.readings / self.batches if self.batches else 0.0
+        return (f"{self.readings} readings in {self.batches} batches "
+                f"(mean {mean:.1f}, largest {self.max_batch_seen})")
+
+
+class InferenceService:
+    """Serves readings from any number of connections through one MicroBatcher."""
+
+    def __init__(self, model, max_batch=MAX_BATCH, max_delay=MAX_DELAY, pool=POOL, workers=WORKERS,
+                 max_outstanding=MAX_OUTSTANDING):
+        if pool not in (None, "thread", "process"):
+            raise ValueError(f"Unknown pool {pool!r}, expected None, 'thread' or 'process'")
+        self.model = model
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.pool = pool
+        self.workers = workers
+        self.max_outstanding = max_outstanding
+        self.metrics = metrics.get()
+        self.executor = None
+        self.batcher = None
+
+        # Counters
+        self.connections = 0
+        self.invalid = 0
+        self.errors = 0
+
+    def start_pool(self):
+        """Starts the worker pool (each worker loads the model) and the batcher."""
+        if self.pool is not None:
+            model = self.model
+            initargs = (model.compiled_path, model.model_path, model.max_batch, model.cascade is not None)
+            if self.pool == "thread":
+                self.executor = ThreadPoolExecutor(self.workers, initializer=init_worker, initargs=initargs)
+            else:
+                self.executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                                    initializer=init_worker, initargs=initargs)
+        predict = predict_batch if self.executor is not None else self.model.predict_labels
+        self.batcher = MicroBatcher(len(self.model.feature_columns), predict, self.max_batch, self.max_delay,
+                                    self.executor, self.workers)
+        return self
+
+    async def warm_up(self):
+        """Has every pool worker load the model before the first connection,
+        rather than on its first batch."""
+        if self.executor is not None:
+            loop = asyncio.get_running_loop()
+            row = np.zeros((1, len(self.model.feature_columns)), dtype=np.float32)
+            await asyncio.gather(*(loop.run_in_executor(self.executor, predict_batch, row)
+                                   for _ in range(self.workers)))
+
+    async def handle(self, reader, writer):
+        """One producer connection: parses its readings into the shared batch
+        and writes the replies back in order."""
+        self.connections += 1
+        self.metrics.count("connections")
+        stages = self.metrics
+        loop = asyncio.get_running_loop()
+        invalid = INVALID_LABEL.encode()
+        streams = {}  # stream -> [parser, rolling, row, seq]
+        replies = asyncio.Queue(self.max_outstanding)
+        sender = asyncio.create_task(self._send_replies(replies, writer))
+        try:
+            while True:
+                line, too_long = await self._read_line(reader)
+                if not line:
+                    break
+                t = start = stages.now()
+                stream, _, frame = line.strip().partition(b" ")
+                state = streams.get(stream)
+                if state is None:
+                    parser, rolling = self.model.new_stream()
+                    state = streams[stream] = [parser, rolling, parser.new_row(), 0]
+                parser, rolling, row, seq = state
+                state[3] = seq = seq + 1
+
+                if too_long or parser.parse_into(frame, row[0]) < 0:
+                    self.invalid += 1
+                    stages.count("parse_errors")
+                    future = loop.create_future()
+                    future.set_result(invalid)
+                else:
+                    t = stages.lap("parse", t)
+                    x = row[0]
+                    if rolling is not None:
+                        x = rolling.update(x)
+                        stages.lap("feature", t)
+                    future = self.batcher.submit(x)
+                stages.count("readings")
+                await replies.put((stream, seq, future, start))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            await replies.put(None)
+            await sender
+            writer.close()
+
+    @staticmethod
+    async def _read_line(reader):
+        """Returns (line, too_long). A line longer than the reader's limit
+        comes back as its first bytes with too_long set, and the rest of it is
+        skipped so the next read starts on the following line."""
+        try:
+            return await reader.readuntil(b"\n"), False
+        except asyncio.IncompleteReadError as e:
+            return e.partial, False  # Last line without a newline, or b"" at EOF
+        except asyncio.LimitOverrunError as e:
+            # The bytes are left in the buffer: keep the head for the stream name
+            head = await reader.readexactly(e.consumed)
+        while True:
+            try:
+                await reader.readuntil(b"\n")
+                break
+            except asyncio.IncompleteReadError:
+                break
+            except asyncio.LimitOverrunError as e:
+                await reader.readexactly(e.consumed)
+        return head, True
+
+    async def _send_replies(self, replies, writer):
+        stages = self.metrics
+        error = ERROR_LABEL.encode()
+        closed = False
+        while True:
+            item = await replies.get()
+            if item is None:
+                break
+            stream, seq, future, start = item
+            try:
+                label = await future
+            except Exception as e:
+                # A failed batch fails every reading in it; reply instead of
+                # leaving the connection waiting for labels that never come
+                if not self.errors:
+                    print(f"Prediction failed: {e!r}")
+                self.errors += 1
+                stages.count("predict_errors")
+                label = error
+            if closed:
+                continue
+            writer.write(b"%s %d %s\n" % (stream, seq, label))
+            stages.lap("end_to_end", start)
+            if replies.empty():
+                try:
+                    await writer.drain()
+                except ConnectionError:
+                    closed = True  # Keep consuming so the reading side never blocks
+
+    async def serve(self, address=ADDRESS, ready=None):
+        """Serves until cancelled. `ready` (a threading.Event) is set once
+        the socket accepts connections."""
+        self.start_pool()
+        await self.warm_up()
+        kind, where = parse_address(address)
+        if kind == "tcp":
+            server = await asyncio.start_server(self.handle, *where)
+        else:
+            if os.path.exists(where):
+                os.remove(where)
+            server = await asyncio.start_unix_server(self.handle, where)
+        print(f"Inference service on {address}: batches of up to {self.max_batch} readings, "
+              f"{self.max_delay * 1e3:g} ms deadline, "
+              f"{'no pool' if self.executor is None else f'{self.workers} {self.pool} workers'}")
+        if ready is not None:
+            ready.set()
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        batched = self.batcher.stats() if self.batcher is not None else "no readings"
+        stats = f"[Service] {self.connections} connections, {batched}, {self.invalid} invalid, {self.errors} errors"
+        # Pool workers count their own cascade readings
+        if self.model.cascade is not None and self.executor is None:
+            stats += "\n" + self.model.cascade.stats()
+        return stats
+
+
+class InferenceClient:
+    """Blocking client for one producer. send() and receive() can be
+    pipelined (several sends, then their replies in order); predict() is one
+    round trip."""
+
+    def __init__(self, address=ADDRESS, timeout=10.0):
+        kind, where = parse_address(address)
+        if kind == "tcp":
+            self.sock = socket.create_connection(where, timeout=timeout)
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        else:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.settimeout(timeout)
+            self.sock.connect(where)
+        self.file = self.sock.makefile("rb")
+
+    def send(self, stream, frame):
+        """Queues one reading of `stream`. Binary frames are sent as the
+        equivalent Data; line, since the protocol is line-based."""
+        if isinstance(frame, str):
+            frame = frame.encode()
+        if binframe.is_binary(frame):
+            frame = binframe.to_text(frame).encode()
+        if isinstance(stream, str):
+            stream = stream.encode()
+        self.sock.sendall(b"%s %s\n" % (stream, frame.strip()))
+
+    def receive(self):
+        """(stream, seq, label) of the next reply."""
+        line = self.file.readline()
+        if not line:
+            raise ConnectionError("Inference service closed the connection")
+        stream, seq, label = line.decode().rstrip("\n").split(" ", 2)
+        return stream, int(seq), label
+
+    def predict(self, stream, frame):
+        self.send(stream, frame)
+        return self.receive()[2]
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local multi-stream inference service")
+    parser.add_argument("--address", default=ADDRESS, help="host:port or Unix socket path (default %(default)s)")
+    parser.add_argument("--model", default=COMPILED_MODEL_PATH, help="compiled model directory (default %(default)s)")
+    parser.add_argument("--pickle", default=MODEL_PATH, help="pipeline used if the compiled model is missing")
+    parser.add_argument("--no-cascade", dest="cascade", action="store_false", default=CASCADE,
+                        help="always run the full forest, even if the model has a first stage")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    parser.add_argument("--max-delay", type=float, default=MAX_DELAY * 1e3, help="batch deadline in ms (default %(default)s)")
+    parser.add_argument("--pool", choices=("thread", "process"), default=POOL)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--metrics", action="store_true", default=METRICS, help="export per-stage metrics")
+    args = parser.parse_args()
+
+    # Stop on Ctrl+C or SIGTERM, also when started in the background (which
+    # leaves SIGINT ignored)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+    stages = metrics.setup("inference_service", enabled=args.metrics)
+    service = InferenceService(ServiceModel(args.model, args.pickle, args.max_batch, args.cascade), args.max_batch,
+                               args.max_delay / 1e3, args.pool, args.workers)
+    try:
+        asyncio.run(service.serve(args.address))
+    except KeyboardInterrupt:
+        print("Stopping the inference service.")
+    finally:
+        print(service.stats())
+        stages.close()
+        if stages.enabled:
+            print(stages.summary())
+
+
+if __name__ == "__main__":
+    main()
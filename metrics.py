@@ -0,0 +1,288 @@
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Per-stage timings and counters for the capture and detection scripts.
+#
+# Each script calls setup() once with its METRICS switch; components then take
+# the process-wide registry from get(). Disabled, get() returns a NullMetrics
+# whose methods do nothing, so the instrumented hot paths cost a no-op call.
+#
+#   stages = metrics.setup("predict", enabled=True)
+#   t = stages.now()
+#   ...parse...
+#   t = stages.lap("parse", t)     # records the time since t, returns now
+#   stages.count("frames")
+
+# Pipeline stages, in hot-path order (the scripts record the ones they have)
+STAGES = ("receive", "reassemble", "parse", "feature", "openset", "scale", "predict", "write", "end_to_end")
+
+# Snapshot file in Prometheus text format, rewritten every EXPORT_INTERVAL seconds
+EXPORT_PATH = "metrics_{name}.prom"
+EXPORT_INTERVAL = 10.0  # Seconds
+
+# Also serve the snapshot on http://127.0.0.1:<port>/metrics (None for file only)
+EXPORT_PORT = None
+
+# Histogram buckets split every power of two of nanoseconds in four (about 19%
+# wide), up to 2**40 ns (about 18 minutes)
+SUB_BUCKETS = 4
+N_BUCKETS = 39 * SUB_BUCKETS
+
+now = time.perf_counter_ns
+
+
+def bucket_index(ns):
+    """Bucket of a duration: its power of two and the next two bits."""
+    bits = ns.bit_length()
+    if bits <= 2:
+        return ns
+    return min((bits - 2) * SUB_BUCKETS + (ns >> (bits - 3)) - 4, N_BUCKETS - 1)
+
+
+def bucket_bound(index):
+    """Exclusive upper bound (ns) of a bucket."""
+    if index < SUB_BUCKETS:
+        return index + 1
+    bits, step = divmod(index, SUB_BUCKETS)
+    return (step + 5) << (bits - 1)
+
+
+class Histogram:
+    """Log-linear duration histogram (HDR style). observe() is a bit_length, a
+    shift and a few integer adds. Updates aren't locked: stages are normally
+    recorded by one thread each, and a rare lost increment doesn't matter for
+    monitoring."""
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * N_BUCKETS
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def observe(self, ns):
+        # bucket_index(), inlined: this runs several times per reading
+        if ns < 4:
+            index = ns if ns > 0 else 0
+        else:
+            bits = ns.bit_length()
+            index = (bits << 2) + (ns >> (bits - 3)) - 12 if bits <= 40 else N_BUCKETS - 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total += ns
+        if ns > self.max:
+            self.max = ns
+
+    def quantile(self, q):
+        """Upper bound (ns) of the bucket holding the q-quantile."""
+        if not self.count:
+            return 0
+        target = q * self.count
+        seen = 0
+        for k, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                return min(bucket_bound(k), self.max)
+        return self.max
+
+
+def format_ns(ns):
+    if ns < 1e3:
+        return f"{ns:.0f} ns"
+    if ns < 1e6:
+        return f"{ns / 1e3:.1f} us"
+    if ns < 1e9:
+        return f"{ns / 1e6:.1f} ms"
+    return f"{ns / 1e9:.2f} s"
+
+
+class Metrics:
+    """Registry of stage histograms, counters and gauges for one process."""
+
+    enabled = True
+    now = staticmethod(now)
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.time()
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self._exporter = None
+
+    def stage(self, name):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        return histogram
+
+    def observe(self, name, ns):
+        self.stage(name).observe(ns)
+
+    def lap(self, name, start):
+        """Records now - start under `name` and returns now, to chain stages."""
+        end = now()
+        self.stage(name).observe(end - start)
+        return end
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name, value):
+        self.gauges[name] = value
+
+    def render(self):
+        """Snapshot in the Prometheus text exposition format."""
+        prefix = f"worad_{self.name}"
+        lines = [f"# {self.name} metrics, process started {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started))}"]
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"{prefix}_{name}_total {value}")
+        for name, value in sorted(self.gauges.items()):
+            lines.append(f"{prefix}_{name} {value}")
+        order = {stage: i for i, stage in enumerate(STAGES)}
+        if self.histograms:
+            lines.append(f"# TYPE {prefix}_stage_seconds histogram")
+        for name in sorted(self.histograms, key=lambda stage: (order.get(stage, len(order)), stage)):
+            histogram = self.histograms[name]
+            cumulative = 0
+            for k, n in enumerate(histogram.counts):
+                cumulative += n
+                if n:
+                    lines.append(f'{prefix}_stage_seconds_bucket{{stage="{name}",le="{bucket_bound(k) / 1e9:.9g}"}} {cumulative}')
+            lines.append(f'{prefix}_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {histogram.count}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {histogram.total / 1e9:.9g}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """Human-readable p50/p99/max per stage plus the counters."""
+        lines = []
+        for name in STAGES + tuple(sorted(set(self.histograms) - set(STAGES))):
+            histogram = self.histograms.get(name)
+            if histogram is not None and histogram.count:
+                lines.append(f"  {name:<11} n={histogram.count:<8} p50 {format_ns(histogram.quantile(0.5)):>9}  "
+                             f"p99 {format_ns(histogram.quantile(0.99)):>9}  max {format_ns(histogram.max):>9}")
+        if self.counters:
+            lines.append("  " + ", ".join(f"{name} {value}" for name, value in sorted(self.counters.items())))
+        return f"[Metrics] {self.name}\n" + "\n".join(lines)
+
+    def start_export(self, path=None, port=None, interval=EXPORT_INTERVAL):
+        self._exporter = Exporter(self, path, port, interval).start()
+        return self
+
+    def close(self):
+        """Writes a last snapshot and stops exporting."""
+        if self._exporter is not None:
+            self._exporter.stop()
+            self._exporter = None
+
+
+class NullMetrics:
+    """Stand-in when metrics are disabled: every call is a no-op."""
+
+    enabled = False
+    name = None
+
+    @staticmethod
+    def now():
+        return 0
+
+    def lap(self, name, start):
+        return 0
+
+    def observe(self, name, ns):
+        pass
+
+    def count(self, name, n=1):
+        pass
+
+    def gauge(self, name, value):
+        pass
+
+    def summary(self):
+        return ""
+
+    def close(self):
+        pass
+
+
+class Exporter:
+    """Rewrites the snapshot file every `interval` seconds on a daemon thread
+    and optionally serves it on localhost."""
+
+    def __init__(self, metrics, path=None, port=None, interval=EXPORT_INTERVAL):
+        self.metrics = metrics
+        self.path = path
+        self.port = port
+        self.interval = interval
+        self.server = None
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-export", daemon=True)
+
+    def start(self):
+        if self.port is not None:
+            metrics = self.metrics
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    body = metrics.render().encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format, *args):
+                    pass
+
+            self.server = ThreadingHTTPServer(("127.0.0.1", self.port), Handler)
+            self.server.daemon_threads = True
+            threading.Thread(target=self.server.serve_forever, name="metrics-http", daemon=True).start()
+        self._thread.start()
+        return self
+
+    def write(self):
+        if self.path is None:
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as file:
+            file.write(self.metrics.render())
+        os.replace(tmp_path, self.path)
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            try:
+                self.write()
+            except OSError as e:
+                print(f"[Metrics] Export failed: {e}")
+
+    def stop(self):
+        self._stopping.set()
+        self._thread.join(timeout=2.0)
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+        self.write()
+
+
+_metrics = NullMetrics()
+
+
+def setup(name, enabled=True, path=EXPORT_PATH, port=EXPORT_PORT, interval=EXPORT_INTERVAL):
+    """Enables the process-wide registry (exported to `path`, formatted with
+    the script name, and to `port` if given) and returns it; with
+    enabled=False returns the no-op registry."""
+    global _metrics
+    if not enabled:
+        _metrics = NullMetrics()
+    else:
+        _metrics = Metrics(name).start_export(path.format(name=name) if path else None, port, interval)
+    return _metrics
+
+
+def get():
+    """The registry set up by this process's script (no-op if none)."""
+    return _metrics
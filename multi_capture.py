@@ -0,0 +1,66 @@
+import asyncio
+import os
+from datetime import datetime
+import metrics
+from acquisition import AcquisitionEngine, DeviceRegistry
+from capture import CapturePipeline, DeviceFramer, SessionWriter
+
+# BLE addresses of every sensor array on the bench
+DEVICE_ADDRESSES = [
+    "C9:6D:69:38:E7:03",
+]
+
+# ACK strategy per device (see ackpolicy.py), or None for no ACKs
+ACK_MODE = None
+ACK_EVERY_N = 10
+ACK_WINDOW = 0.1  # Seconds
+# Settings for single devices, e.g. {"C9:6D:69:38:E7:03": {"mode": "every_n", "every_n": 5}}
+ACK_DEVICES = {}
+
+# Folder path for saving files
+FOLDER_PATH = r"C:\Users\User\Documents\RobotRead"  # Update this to your folder path
+
+# How often to print per-device status
+STATUS_INTERVAL = 30  # Seconds
+
+# Per-stage timings and counters (connects, reconnects, drops, ...), exported to
+# metrics_multi_capture.prom; see metrics.py
+METRICS = False
+
+
+async def print_status(engine, pipeline):
+    while True:
+        await asyncio.sleep(STATUS_INTERVAL)
+        print(f"\n[Status]\n{engine.summary()}\n[Capture] {pipeline.stats()}")
+
+
+async def main():
+    stages = metrics.setup("multi_capture", enabled=METRICS)
+    # One merged, device-tagged session file for all devices
+    file_name = f"multi_reading_{datetime.now().strftime('%y%m%d_%H%M%S')}.txt"
+    file_path = os.path.join(FOLDER_PATH, file_name)
+    header = (f"Recording Session: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+              f"Devices: {', '.join(DEVICE_ADDRESSES)}\n" + "-" * 50 + "\n")
+    pipeline = CapturePipeline(SessionWriter(file_path, header=header), framer=DeviceFramer()).start()
+
+    engine = AcquisitionEngine(DEVICE_ADDRESSES, pipeline, registry=DeviceRegistry(), ack_mode=ACK_MODE,
+                               ack_every_n=ACK_EVERY_N, ack_window=ACK_WINDOW, ack_devices=ACK_DEVICES)
+    status_task = asyncio.create_task(print_status(engine, pipeline))
+    print(f"Capturing from {len(DEVICE_ADDRESSES)} devices into {file_path} (Ctrl+C to stop)")
+    try:
+        await engine.run()
+    finally:
+        engine.stop()
+        status_task.cancel()
+        await pipeline.stop()
+        print(f"\n{engine.summary()}\n[Capture] {pipeline.stats()}")
+        stages.close()
+        if stages.enabled:
+            print(stages.summary())
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("Capture stopped.")
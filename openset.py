@@ -0,0 +1,131 @@
+import json
+import os
+import numpy as np
+
+# Label reported for readings that fit none of the trained classes
+UNKNOWN_LABEL = "Unknown"
+
+# Share of each class's training readings accepted as known
+QUANTILE = 0.995
+
+# Covariance shrinkage toward the identity, in units of each feature's overall
+# variance; also keeps channels that were constant in training usable
+SHRINKAGE = 0.05
+
+ARRAY_NAMES = ("means", "factors", "thresholds", "classes")
+META_FILENAME = "openset.json"
+
+
+class OpenSetScorer:
+    """Flags readings that belong to none of the trained classes.
+
+    Each class is summarised by its mean and a shrunk inverse covariance,
+    stored as a Cholesky factor L with inv(cov) = L @ L.T, so the squared
+    Mahalanobis distance is just ||(x - mean) @ L||^2. The per-class
+    threshold is the QUANTILE of that distance over the class's own training
+    readings. A reading's score is its smallest distance/threshold ratio
+    over all classes: above 1 it fits no class and is reported as unknown,
+    whatever the forest says.
+
+    Everything is precomputed in raw sensor units (the global
+    standardisation is folded into the factors), and the factors of all
+    classes are stacked side by side: x @ L_k - mean_k @ L_k for every class
+    is one matrix-vector product minus a cached offset.
+    """
+
+    def __init__(self, means, factors, thresholds, classes, meta=None):
+        self.means = means
+        self.factors = factors
+        self.thresholds = thresholds
+        self.classes = classes
+        self.meta = meta or {}
+        self.inv_thresholds = 1.0 / np.asarray(thresholds, dtype=np.float64)
+        n_classes, n_features, _ = factors.shape
+        self._shape = (-1, n_classes, n_features)
+        self._weights = np.asarray(factors, dtype=np.float64).transpose(1, 0, 2).reshape(n_features, -1)
+        self._offsets = np.einsum("kd,kde->ke", np.asarray(means, dtype=np.float64),
+                                  np.asarray(factors, dtype=np.float64)).reshape(-1)
+        # Sums each class's block of squared terms and divides by its threshold
+        self._ratios = np.kron(np.diag(self.inv_thresholds), np.ones((n_features, 1)))
+
+    @classmethod
+    def fit(cls, X, y, quantile=QUANTILE, shrinkage=SHRINKAGE):
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y)
+        scale = X.std(axis=0)
+        scale[scale == 0] = 1.0
+        classes = np.unique(y)
+        n_features = X.shape[1]
+        means = np.empty((len(classes), n_features))
+        factors = np.empty((len(classes), n_features, n_features))
+        for k, label in enumerate(classes):
+            Z = X[y == label] / scale
+            cov = np.cov(Z, rowvar=False).reshape(n_features, n_features) if len(Z) > 1 \
+                else np.zeros((n_features, n_features))
+            cov = (1 - shrinkage) * cov + shrinkage * np.eye(n_features)
+            # inv(cov) = L @ L.T, with the standardisation folded into L
+            factors[k] = np.linalg.cholesky(np.linalg.inv(cov)) / scale[:, None]
+            means[k] = X[y == label].mean(axis=0)
+        scorer = cls(means, factors, np.ones(len(classes)), classes)
+
+        thresholds = np.empty(len(classes))
+        distances = scorer.distances(X)
+        for k, label in enumerate(classes):
+            thresholds[k] = np.quantile(distances[y == label, k], quantile)
+        meta = {"quantile": quantile, "shrinkage": shrinkage, "n_features": n_features}
+        return cls(means, factors, thresholds, classes, meta)
+
+    def distances(self, X):
+        """Squared Mahalanobis distance of each row of X to each class, (n, classes)."""
+        z = np.asarray(X, dtype=np.float64).reshape(-1, self._weights.shape[0]) @ self._weights
+        z -= self._offsets
+        z *= z
+        return z.reshape(self._shape).sum(axis=2)
+
+    def score(self, X):
+        """Smallest distance/threshold ratio over the classes, per row (> 1: unknown)."""
+        return (self.distances(X) * self.inv_thresholds).min(axis=1)
+
+    def is_unknown(self, X):
+        return self.score(X) > 1.0
+
+    def score_one(self, x):
+        """score() for a single reading, given as (n_features,) or (1, n_features)."""
+        z = np.dot(x, self._weights)
+        z -= self._offsets
+        z *= z
+        return float(np.dot(z, self._ratios).min())
+
+    def is_unknown_one(self, x):
+        return self.score_one(x) > 1.0
+
+    def save(self, path):
+        """Writes the arrays as openset_<name>.npy plus openset.json in `path`
+        (next to a compiled forest, or on its own)."""
+        os.makedirs(path, exist_ok=True)
+        arrays = {"means": self.means, "factors": self.factors,
+                  "thresholds": np.asarray(self.thresholds, dtype=np.float64), "classes": np.asarray(self.classes)}
+        for name in ARRAY_NAMES:
+            np.save(os.path.join(path, f"openset_{name}.npy"), np.ascontiguousarray(arrays[name]))
+        with open(os.path.join(path, META_FILENAME), "w") as file:
+            json.dump(self.meta, file, indent=2)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Loads a saved scorer, or returns None if `path` has none."""
+        meta_path = os.path.join(path, META_FILENAME)
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as file:
+            meta = json.load(file)
+        arrays = {name: np.load(os.path.join(path, f"openset_{name}.npy"), mmap_mode="r" if mmap else None)
+                  for name in ARRAY_NAMES}
+        return cls(arrays["means"], arrays["factors"], arrays["thresholds"], arrays["classes"], meta)
+
+    @staticmethod
+    def remove(path):
+        """Deletes a scorer saved in `path`, if there is one."""
+        for file_name in [META_FILENAME] + [f"openset_{name}.npy" for name in ARRAY_NAMES]:
+            file_path = os.path.join(path, file_name)
+            if os.path.exists(file_path):
+                os.remove(file_path)
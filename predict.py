@@ -1,25 +1,143 @@
+import os
 import serial
-import joblib
-import pandas as pd
+import metrics
+from frameparser import RecordParser
+from serialreader import SerialReader
+from cascade import Cascade
+from compiled_forest import CompiledForest
+from features import RollingFeatures
+from openset import UNKNOWN_LABEL
 
-# Load trained pipeline model
-model = joblib.load("best_worad_rf.pkl")  # Load the latest trained model
+# Compiled forest exported by gridsearchrf.py (or `python compiled_forest.py`)
+COMPILED_MODEL_PATH = "best_worad_rf"
 
-# Load feature names from training data
-df_train = pd.read_csv("latest.csv")
-feature_columns = df_train.drop(columns=["Label"]).columns
+# Array-native inference: parse straight into a reused float32 row and run the
+# scaler and trees on raw arrays. Set to False to use the DataFrame path.
+FAST_PATH = True
+
+# Run the compiled model's first stage (if gridsearchrf.py exported one) and
+# only fall back to the full forest for readings it is unsure of
+CASCADE = True
+
+# Classify through a running inference_service.py ("host:port" or a Unix
+# socket path) instead of loading the model here, so several rigs share one
+# model and their readings are batched together. None runs the model in
+# this process.
+SERVICE_ADDRESS = None
+
+# Per-stage timings (receive, parse, feature, openset, scale, predict, write)
+# and counters, exported to metrics_predict.prom; see metrics.py
+METRICS = False
+stages = metrics.setup("predict", enabled=METRICS)
+
+service = None
+cascade = None
+if SERVICE_ADDRESS:
+    from inference_service import INVALID_LABEL, InferenceClient
+    service = InferenceClient(SERVICE_ADDRESS)
+elif FAST_PATH and os.path.isdir(COMPILED_MODEL_PATH):
+    # The compiled model carries its own schema, so pandas, sklearn and the
+    # training CSV are never loaded; the arrays are memory-mapped
+    predictor = CompiledForest.load(COMPILED_MODEL_PATH)
+    feature_columns = predictor.feature_names
+    label_dict = predictor.labels
+    aliases = predictor.aliases
+    feature_config = predictor.features
+    openset = predictor.openset
+    if CASCADE:
+        cascade = Cascade.load(COMPILED_MODEL_PATH, predictor)
+        if cascade is not None:
+            predictor = cascade
+else:
+    import joblib
+    import pandas as pd
+    from inference import ArrayPredictor
+    from sensors import LABELS, SENSOR_ALIASES
+
+    # Load trained pipeline model
+    model = joblib.load("best_worad_rf.pkl")  # Load the latest trained model
+
+    # Feature names are stored on the pipeline; older models need the training data
+    feature_columns = getattr(model, "feature_names_in_", None)
+    if feature_columns is None:
+        df_train = pd.read_csv("latest.csv")
+        feature_columns = df_train.drop(columns=["Label"]).columns
+    feature_columns = list(feature_columns)
+
+    # Assign labels
+    label_dict = LABELS
+    aliases = SENSOR_ALIASES
+    feature_config = getattr(model, "rolling_features_", None)
+    openset = getattr(model, "openset_", None)
+    predictor = ArrayPredictor(model)
+
+# Models trained on rolling-window features classify the recent history rather
+# than one reading: readings are parsed into the raw channels and the feature
+# engine turns each one into the model's input
+rolling = None
+if service is None:
+    input_columns = feature_columns
+    if feature_config:
+        rolling = RollingFeatures.from_config(feature_config)
+        input_columns = rolling.columns
+
+if FAST_PATH and service is None:
+    parser = RecordParser(input_columns, aliases=aliases)
+    row = parser.new_row()
 
 # Serial settings
 SERIAL_PORT = "COM7"
 BAUD_RATE = 115200
 ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=1)
 
+# Read the port on its own thread so inference never stalls it
+reader = SerialReader(ser).start()
+
 print("Listening for data...")
 
 try:
-    while True:
-        line = ser.readline().decode('utf-8').strip()
-        if line.startswith("Data;"):
+    for line in reader:
+        t = stages.now()
+        if service is not None:
+            # Parsing, features and the prediction all happen in the service;
+            # this rig is one stream, named after its port
+            label = service.predict(SERIAL_PORT, line)
+            if label == INVALID_LABEL:
+                stages.count("parse_errors")
+                continue
+            prediction = None if label == UNKNOWN_LABEL else label
+            t = stages.lap("predict", t)
+
+            print("Raw Sensor Data:", line.decode("utf-8", errors="replace").strip())
+        elif FAST_PATH:
+            # Parse the raw bytes straight into the preallocated row (no decode/dict)
+            if parser.parse_into(line, row[0]) < 0:
+                stages.count("parse_errors")
+                continue
+            t = stages.lap("parse", t)
+
+            x = row
+            if rolling is not None:
+                x = rolling.update(row[0])[None, :]
+                t = stages.lap("feature", t)
+
+            # Readings that fit none of the trained classes skip the forest
+            unknown = False
+            if openset is not None:
+                unknown = openset.is_unknown_one(x)
+                t = stages.lap("openset", t)
+
+            # The compiled forest has the scaler folded into its thresholds
+            prediction = None if unknown else predictor.predict_one(x)
+            t = stages.lap("predict", t)
+
+            print("Raw Sensor Data:", dict(zip(input_columns, row[0].tolist())))
+        else:
+            line = line.decode('utf-8').strip()  # Malformed UTF-8 is dropped by the reader
+            if not line.startswith("Data;"):
+                stages.count("parse_errors")
+                continue
+
             # Parse serial data
             data_parts = line.replace("Data;", "").split(";")
             data_dict = {key_value.split(":")[0]: float(key_value.split(":")[1]) for key_value in data_parts if ":" in key_value}
@@ -28,23 +146,52 @@ try:
             df_input = pd.DataFrame([data_dict])
 
             # Ensure feature order matches training data
-            df_input = df_input.reindex(columns=feature_columns, fill_value=0)
+            df_input = df_input.reindex(columns=input_columns, fill_value=0)
+
+            raw_input = df_input
+            t = stages.lap("parse", t)
+
+            if rolling is not None:
+                df_input = pd.DataFrame([rolling.update(df_input.to_numpy()[0])], columns=feature_columns)
+                t = stages.lap("feature", t)
+
+            unknown = False
+            if openset is not None:
+                unknown = openset.is_unknown_one(df_input.to_numpy())
+                t = stages.lap("openset", t)
+
+            # Predict: the pipeline's scaler, then its forest
+            prediction = None
+            if not unknown:
+                scaled = model[:-1].transform(df_input)
+                t = stages.lap("scale", t)
+                prediction = model[-1].predict(scaled)[0]
+                t = stages.lap("predict", t)
 
-            print("Raw Sensor Data:", df_input)
+            print("Raw Sensor Data:", raw_input)
 
-            # Predict (scaling is handled inside the model pipeline)
-            prediction = model.predict(df_input)[0]
+        if service is None:
+            label = label_dict.get(prediction, UNKNOWN_LABEL)
 
-            # Assign labels
-            label_dict = {
-                1: "Ethanol",
-                2: "Isopropanol",
-                3: "Acetone"
-            }
-            label = label_dict.get(prediction, "Clean Air")
+        print(f"Detected: {label}")
+        t = stages.lap("write", t)
 
-            print(f"Detected: {label}")
+        # From the frame's arrival at the serial thread to the printed label
+        stages.observe("end_to_end", t - reader.received_at)
+        stages.count("predictions")
+        if prediction is None:
+            stages.count("unknown")
 
 except KeyboardInterrupt:
     print("Stopping detection.")
+finally:
+    reader.stop()
     ser.close()
+    if service is not None:
+        service.close()
+    print(reader.stats())
+    if cascade is not None:
+        print(cascade.stats())
+    stages.close()
+    if stages.enabled:
+        print(stages.summary())
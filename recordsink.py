@@ -0,0 +1,175 @@
+import csv
+import io
+import os
+import time
+from datetime import datetime
+
+# Suffix of the file currently being written; renamed away on close/rotation
+PARTIAL_SUFFIX = ".partial"
+
+
+def recover_partial(path, aside=False):
+    """Finalises a `.partial` file left behind by a crash.
+
+    Anything after the last newline (a row cut off mid-write) is dropped and the
+    file is renamed to its final name, or to a `_recovered_` name if that is
+    taken or `aside` is set (a new capture is about to write `path`). Returns
+    the recovered path, or None.
+    """
+    partial_path = path + PARTIAL_SUFFIX
+    if not os.path.exists(partial_path):
+        return None
+    with open(partial_path, "rb+") as file:
+        content = file.read()
+        file.truncate(content.rfind(b"\n") + 1)
+    final_path = path
+    if aside or os.path.exists(final_path):
+        stem, ext = os.path.splitext(path)
+        final_path = f"{stem}_recovered_{datetime.now().strftime('%Y%m%d_%H%M%S')}{ext}"
+    os.replace(partial_path, final_path)
+    return final_path
+
+
+class CSVRecordSink:
+    """Append-only CSV writer for streaming captures.
+
+    The schema is fixed by `fieldnames` (or the first record's keys): missing
+    fields are written empty and unknown ones are counted and dropped. Rows are
+    buffered and appended every `flush_every` rows or `flush_interval` seconds,
+    so memory stays bounded however long the capture runs. The open file is
+    written as `<name>.partial` and only gets its final name on rotation or
+    close; each flush writes whole rows, so a crash loses at most the unflushed
+    buffer. With `rotate_bytes` / `rotate_seconds`, each segment is named
+    `<stem>_<YYYYmmdd_HHMMSS>.csv`.
+    """
+
+    def __init__(self, path, fieldnames=None, flush_every=10, flush_interval=5.0,
+                 rotate_bytes=None, rotate_seconds=None, fsync=True):
+        self.path = path
+        self.fieldnames = list(fieldnames) if fieldnames else None
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.fsync = fsync
+
+        self.rows_written = 0
+        self.dropped_fields = 0
+        self.files_written = []
+
+        self._known = None
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+        self._pending = 0
+        self._file = None
+        self._file_path = None
+        self._file_bytes = 0
+        self._opened_at = 0.0
+        self._last_flush = time.monotonic()
+
+    @property
+    def current_path(self):
+        """Final name of the file currently being written."""
+        return self._file_path or self.path
+
+    @property
+    def writing_path(self):
+        """The `.partial` file rows are appended to right now (None before the
+        first flush); it is renamed to current_path on rotation or close."""
+        return self._file_path + PARTIAL_SUFFIX if self._file is not None else None
+
+    def _segment_path(self):
+        if self.rotate_bytes is None and self.rotate_seconds is None:
+            return self.path
+        stem, ext = os.path.splitext(self.path)
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        path = f"{stem}_{stamp}{ext}"
+        counter = 1
+        while os.path.exists(path) or os.path.exists(path + PARTIAL_SUFFIX):
+            # Several rotations within the same second
+            path = f"{stem}_{stamp}_{counter}{ext}"
+            counter += 1
+        return path
+
+    def _open(self):
+        self._file_path = self._segment_path()
+        recover_partial(self._file_path, aside=True)
+        self._file = open(self._file_path + PARTIAL_SUFFIX, "wb")
+        self._file_bytes = 0
+        self._opened_at = time.monotonic()
+        header = io.StringIO()
+        csv.writer(header).writerow(self.fieldnames)
+        self._write(header.getvalue())
+
+    def _write(self, text):
+        # Encoded here so rotate_bytes counts bytes on disk, not characters
+        data = text.encode("utf-8")
+        self._file.write(data)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self._file_bytes += len(data)
+
+    def _finalise(self):
+        self._file.close()
+        os.replace(self._file_path + PARTIAL_SUFFIX, self._file_path)
+        self.files_written.append(self._file_path)
+        self._file = None
+
+    def _should_rotate(self):
+        if self.rotate_bytes is not None and self._file_bytes >= self.rotate_bytes:
+            return True
+        return self.rotate_seconds is not None and time.monotonic() - self._opened_at >= self.rotate_seconds
+
+    def write(self, record):
+        """Buffers one record (a dict) and flushes if the buffer is full or stale.
+        Returns True if the buffer was flushed to disk."""
+        if self.fieldnames is None:
+            self.fieldnames = list(record)
+        if self._known is None:
+            self._known = set(self.fieldnames)
+        extra = record.keys() - self._known
+        if extra:
+            self.dropped_fields += len(extra)
+        self._writer.writerow([record.get(key, "") for key in self.fieldnames])
+        self._pending += 1
+        if self._pending >= self.flush_every or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+            return True
+        return False
+
+    def write_row(self, values):
+        """Like write(), for a sequence already in `fieldnames` order."""
+        self._writer.writerow(values)
+        self._pending += 1
+        if self._pending >= self.flush_every or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+            return True
+        return False
+
+    def flush(self):
+        """Appends buffered rows to the current file, rotating first if it is due."""
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return
+        if self._file is not None and self._should_rotate():
+            self._finalise()
+        if self._file is None:
+            self._open()
+        self._write(self._buffer.getvalue())
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        self.rows_written += self._pending
+        self._pending = 0
+
+    def close(self):
+        """Flushes remaining rows and gives the current file its final name."""
+        self.flush()
+        if self._file is not None:
+            self._finalise()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,212 @@
+import itertools
+import math
+import time
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import ParameterGrid, StratifiedKFold
+from sklearn.preprocessing import StandardScaler
+from cvcache import hash_arrays, timed
+
+# Pipeline step name used in gridsearchrf.py's parameter grid
+FOREST_STEP = "randomforestclassifier__"
+
+
+class FoldData:
+    """One cross-validation fold with the scaler fitted and applied once, so
+    every candidate and every rung reuses the same preprocessed arrays."""
+
+    def __init__(self, X_train, y_train, X_val, y_val):
+        # Identifies the fold's content for the CV cache
+        self.digest = hash_arrays(X_train, y_train, X_val, y_val)
+        scaler = StandardScaler().fit(X_train)
+        self.X_train = scaler.transform(X_train)
+        self.y_train = np.asarray(y_train)
+        self.X_val = scaler.transform(X_val)
+        self.y_val = np.asarray(y_val)
+
+
+def make_folds(X, y, cv=5):
+    """Same splits GridSearchCV(cv=5) uses for a classifier (unshuffled StratifiedKFold)."""
+    X = np.asarray(X)
+    y = np.asarray(y)
+    splitter = StratifiedKFold(n_splits=cv)
+    return [FoldData(X[train], y[train], X[val], y[val]) for train, val in splitter.split(X, y)]
+
+
+def _fit_and_score(params, fold, random_state):
+    """Fits one forest on a fold and returns (validation accuracy, fit seconds)."""
+    forest = RandomForestClassifier(random_state=random_state, **params)
+    _, fit_time = timed(forest.fit, fold.X_train, fold.y_train)
+    return forest.score(fold.X_val, fold.y_val), fit_time
+
+
+class CachedGridSearch:
+    """Exhaustive grid search with the same folds and best-candidate rule as
+    GridSearchCV, where every (parameters, fold) score is stored in a CVCache
+    as soon as it is computed. Re-running after a crash or with an unchanged
+    dataset only fits the combinations that are missing from the cache."""
+
+    def __init__(self, param_grid, cache, cv=5, random_state=42, n_jobs=-1, verbose=1):
+        self.param_grid = {key.replace(FOREST_STEP, ""): values for key, values in param_grid.items()}
+        self.cache = cache
+        self.cv = cv
+        self.random_state = random_state
+        self.n_jobs = n_jobs
+        self.verbose = verbose
+
+    def fit(self, X, y):
+        start = time.monotonic()
+        folds = make_folds(X, y, self.cv)
+        candidates = list(ParameterGrid(self.param_grid))
+        scores = np.full((len(candidates), len(folds)), np.nan)
+
+        pending = []
+        for index, params in enumerate(candidates):
+            for fold_index, fold in enumerate(folds):
+                key = self.cache.key(fold.digest, params, self.random_state)
+                record = self.cache.get(key)
+                if record is None:
+                    pending.append((index, fold_index, key))
+                else:
+                    scores[index, fold_index] = record["score"]
+
+        if self.verbose:
+            print(f"Fitting {len(pending)} of {scores.size} fold/parameter combinations "
+                  f"({scores.size - len(pending)} cached)")
+        # Results are cached as they arrive, so an interrupted run loses at most the in-flight fits
+        results = Parallel(n_jobs=self.n_jobs, return_as="generator", verbose=self.verbose)(
+            delayed(_fit_and_score)(candidates[index], folds[fold_index], self.random_state)
+            for index, fold_index, _ in pending)
+        for (index, fold_index, key), (score, fit_time) in zip(pending, results):
+            scores[index, fold_index] = score
+            self.cache.put(key, {"score": score, "fit_time": fit_time, "params": candidates[index]})
+
+        mean_scores = scores.mean(axis=1)
+        self.cv_results_ = [{"params": params, "mean_test_score": float(mean), "std_test_score": float(std)}
+                            for params, mean, std in zip(candidates, mean_scores, scores.std(axis=1))]
+        # First candidate with the highest mean score, like GridSearchCV
+        best = int(np.argmax(mean_scores))
+        self.best_score_ = float(mean_scores[best])
+        self.best_params_ = {FOREST_STEP + key: value for key, value in candidates[best].items()}
+        self.elapsed_ = time.monotonic() - start
+        return self
+
+
+class HalvingSearch:
+    """Successive halving over a RandomForest grid with n_estimators as the resource.
+
+    Every combination of the other parameters starts with the smallest
+    n_estimators value. After each rung only the best 1/factor candidates are
+    kept, and their forests grow to the next n_estimators value with
+    warm_start, adding trees rather than refitting from scratch. With the same
+    random_state a warm-started forest has exactly the trees of a fresh fit.
+    The search stops once `time_budget` seconds have passed and reports the
+    best candidate evaluated so far.
+    """
+
+    def __init__(self, param_grid, cv=5, factor=3, time_budget=None, random_state=42, n_jobs=-1, verbose=1,
+                 cache=None):
+        self.param_grid = {key.replace(FOREST_STEP, ""): values for key, values in param_grid.items()}
+        self.cache = cache
+        self.cv = cv
+        self.factor = factor
+        self.time_budget = time_budget
+        self.random_state = random_state
+        self.n_jobs = n_jobs
+        self.verbose = verbose
+
+    def _candidates(self):
+        grid = {key: values for key, values in self.param_grid.items() if key != "n_estimators"}
+        keys = list(grid)
+        return [dict(zip(keys, values)) for values in itertools.product(*(grid[key] for key in keys))]
+
+    def _out_of_time(self):
+        return self.time_budget is not None and time.monotonic() - self._start > self.time_budget
+
+    def _grow(self, forest, params, n_estimators, fold):
+        """Fits a new forest or adds trees to an existing one, and scores it on the fold."""
+        if forest is None:
+            forest = RandomForestClassifier(random_state=self.random_state, n_jobs=self.n_jobs,
+                                            warm_start=True, **params)
+        n_new = n_estimators - len(getattr(forest, "estimators_", []))
+        forest.set_params(n_estimators=n_estimators)
+        _, fit_time = timed(forest.fit, fold.X_train, fold.y_train)
+        self.n_trees_fitted_ += n_new
+        return forest, forest.score(fold.X_val, fold.y_val), fit_time
+
+    def _score(self, forests, index, params, n_estimators, fold_index, fold):
+        """Validation score of one candidate on one fold, from the cache when possible."""
+        params = dict(params, n_estimators=n_estimators)
+        key = self.cache.key(fold.digest, params, self.random_state) if self.cache else None
+        record = self.cache.get(key) if self.cache else None
+        if record is not None:
+            # A cached score has no forest to warm-start from; the next rung refits if it must
+            forests.pop((index, fold_index), None)
+            return record["score"]
+        forest, score, fit_time = self._grow(forests.get((index, fold_index)), params, n_estimators, fold)
+        forests[index, fold_index] = forest
+        if self.cache:
+            self.cache.put(key, {"score": score, "fit_time": fit_time, "params": params})
+        return score
+
+    def fit(self, X, y):
+        self._start = time.monotonic()
+        resources = sorted(self.param_grid.get("n_estimators", [100]))
+        folds = make_folds(X, y, self.cv)
+        candidates = self._candidates()
+        alive = list(range(len(candidates)))
+        # One growing forest per (candidate, fold)
+        forests = {}
+        self.cv_results_ = []
+        self.budget_exhausted_ = False
+        self.n_trees_fitted_ = 0
+
+        for rung, n_estimators in enumerate(resources):
+            rung_results = []
+            for index in alive:
+                scores = []
+                for fold_index, fold in enumerate(folds):
+                    if self._out_of_time():
+                        self.budget_exhausted_ = True
+                        break
+                    scores.append(self._score(forests, index, candidates[index], n_estimators,
+                                              fold_index, fold))
+                if len(scores) < len(folds):
+                    break  # Partial folds are not comparable, drop this candidate
+                result = {
+                    "candidate": index,
+                    "params": dict(candidates[index], n_estimators=n_estimators),
+                    "mean_test_score": float(np.mean(scores)),
+                    "std_test_score": float(np.std(scores)),
+                    "rung": rung,
+                }
+                rung_results.append(result)
+                if self.verbose > 1:
+                    print(f"[rung {rung}] {result['params']} -> {result['mean_test_score']:.4f}")
+
+            self.cv_results_.extend(rung_results)
+            if self.verbose:
+                print(f"Rung {rung}: {len(rung_results)} candidates x {len(folds)} folds at "
+                      f"n_estimators={n_estimators} ({time.monotonic() - self._start:.1f}s elapsed)")
+            if self.budget_exhausted_:
+                print(f"Time budget of {self.time_budget}s reached, stopping the search")
+                break
+
+            # Keep the best 1/factor candidates for the next rung
+            rung_results.sort(key=lambda result: result["mean_test_score"], reverse=True)
+            n_keep = max(1, math.ceil(len(rung_results) / self.factor))
+            alive = [result["candidate"] for result in rung_results[:n_keep]]
+            forests = {key: forest for key, forest in forests.items() if key[0] in alive}
+
+        self.elapsed_ = time.monotonic() - self._start
+        if not self.cv_results_:
+            raise RuntimeError("Time budget ran out before any candidate was evaluated")
+
+        # Best candidate of the highest rung reached (low-tree scores are noisier)
+        top_rung = max(result["rung"] for result in self.cv_results_)
+        best = max((result for result in self.cv_results_ if result["rung"] == top_rung),
+                   key=lambda result: result["mean_test_score"])
+        self.best_score_ = best["mean_test_score"]
+        self.best_params_ = {FOREST_STEP + key: best["params"][key] for key in sorted(best["params"])}
+        return self
@@ -0,0 +1,25 @@
+# Sensor schema shared by the training and detection scripts
+
+# Feature columns in training order (latest.csv without Label)
+FEATURE_COLUMNS = ["SGP_VRaw", "SGP_NRaw", "SGP_Vin", "SGP_Nin", "STC_CO2", "STC_Temp", "ENS_VOC",
+                   "MiCO", "MiNO2", "MiNH3", "GMVOC", "GMODO", "GMSMO", "GMETH", "GMH2S"]
+
+# Default class labels (combined.py takes them from dataset.json)
+LABELS = {
+    0: "Clean Air",
+    1: "Ethanol",
+    2: "Isopropanol",
+    3: "Acetone",
+}
+
+# Keys used by the BLE firmware / CSVprocess.py -> training column names
+SENSOR_ALIASES = {
+    "SGPVRaw": "SGP_VRaw",
+    "SGPNRaw": "SGP_NRaw",
+    "SGPVin": "SGP_Vin",
+    "SGPNin": "SGP_Nin",
+    "STCCO2": "STC_CO2",
+    "STCTemp": "STC_Temp",
+    "ENSVoc": "ENS_VOC",
+    "GNH2S": "GMH2S",
+}
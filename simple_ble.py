@@ -1,5 +1,6 @@
 import asyncio
 from bleak import BleakClient
+from frameparser import FrameReassembler
 
 # BLE Device Address
 DEVICE_ADDRESS = "C9:6D:69:38:E7:03"
@@ -8,21 +9,15 @@ DEVICE_ADDRESS = "C9:6D:69:38:E7:03"
 WRITE_CHAR_UUID = "6e400002-b5a3-f393-e0a9-e50e24dcca9e"
 READ_CHAR_UUID = "6e400003-b5a3-f393-e0a9-e50e24dcca9e"
 
-# Buffer to store fragmented BLE packets
-received_data = []
+# Buffer to store fragmented BLE packets; a message ends at a newline or ";GMWIN:"
+reassembler = FrameReassembler(end_marker=b";GMWIN:")
 
 # Callback to handle incoming notifications
 def notification_handler(sender, data):
     """Handles BLE notifications and reconstructs split messages."""
-    global received_data
-    text = data.decode("utf-8")  # Convert bytes to string
-    received_data.append(text)  # Store fragment
-
-    # Check for end of message (assuming a newline '\n' or semicolon as an end marker)
-    if "\n" in text or text.endswith(";GMWIN:"):
-        full_message = "".join(received_data)  # Merge all fragments
+    for frame in reassembler.feed(data):
+        full_message = frame.decode("utf-8", errors="replace")  # Convert bytes to string
         print(f"\n[BLE Full Message] {full_message}\n> ")
-        received_data.clear()  # Reset buffer for next message
 
 async def receive_notifications(client):
     """ Continuously listens for notifications. """
@@ -0,0 +1,109 @@
+import asyncio
+import pytest
+from ackpolicy import AckPolicy
+
+
+class Link:
+    """Stand-in for the GATT write: records ACKs, optionally slow or failing."""
+
+    def __init__(self, delay=0.0, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.acks = 0
+
+    async def send(self):
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise OSError("write failed")
+        self.acks += 1
+
+
+def run(policy, readings):
+    async def main():
+        for _ in range(readings):
+            policy.on_reading()
+            await asyncio.sleep(0)
+        await policy.close()
+    asyncio.run(main())
+
+
+def test_every_acknowledges_each_reading():
+    link = Link()
+    policy = AckPolicy(link.send, mode="every")
+    run(policy, 5)
+    assert link.acks == policy.acks_sent == 5
+    assert policy.readings_coalesced == 0
+
+
+def test_every_n_and_close_covers_the_rest():
+    link = Link()
+    policy = AckPolicy(link.send, mode="every_n", every_n=4)
+    run(policy, 10)
+    # Two full groups, plus one on close for the last two readings
+    assert link.acks == 3
+    assert policy.readings_coalesced == 7
+
+
+def test_window_covers_readings_inside_it_with_one_ack():
+    link = Link()
+    policy = AckPolicy(link.send, mode="window", window=60)
+    run(policy, 20)
+    # The first reading opens the window; close() covers the other 19
+    assert link.acks == 2
+    assert policy.readings_coalesced == 18
+
+
+def test_window_ack_sent_when_it_closes():
+    link = Link()
+    policy = AckPolicy(link.send, mode="window", window=0.02)
+
+    async def main():
+        for _ in range(3):
+            policy.on_reading()
+        await asyncio.sleep(0.1)
+        assert link.acks == 2
+        await policy.close()
+    asyncio.run(main())
+    assert link.acks == 2
+
+
+def test_coalesce_keeps_one_ack_in_flight():
+    async def main():
+        released = asyncio.Event()
+        acks = []
+
+        async def send():
+            await released.wait()
+            acks.append(policy.readings)
+
+        policy = AckPolicy(send, mode="coalesce")
+        for _ in range(10):
+            policy.on_reading()
+            await asyncio.sleep(0)
+            assert policy._in_flight == 1
+        released.set()
+        await policy.close()
+        return policy, acks
+    policy, acks = asyncio.run(main())
+    # The first reading's ACK, then one for the nine that arrived while it was in flight
+    assert len(acks) == 2
+    assert policy.readings_coalesced == 8
+
+
+def test_failed_writes_are_counted():
+    policy = AckPolicy(Link(fail=True).send, mode="every")
+    run(policy, 3)
+    assert (policy.acks_sent, policy.acks_failed) == (0, 3)
+    assert "3 failed" in policy.stats()
+
+
+def test_latencies_are_recorded():
+    policy = AckPolicy(Link(delay=0.01).send, mode="every")
+    run(policy, 3)
+    assert policy.latency_percentile(50) >= 0.009
+    assert policy.max_latency >= policy.latency_percentile(99)
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError, match="Unknown ACK mode"):
+        AckPolicy(Link().send, mode="sometimes")
@@ -0,0 +1,37 @@
+import pytest
+from acquisition import READ_CHAR_UUID, AcquisitionEngine, DeviceRegistry
+
+
+@pytest.fixture
+def registry(tmp_path):
+    return DeviceRegistry(str(tmp_path / "ble_devices.json"))
+
+
+def test_ack_settings_per_device(registry):
+    engine = AcquisitionEngine(["aa:01", "AA:02"], pipeline=None, registry=registry, ack_mode="window",
+                               ack_every_n=4, ack_window=0.5,
+                               ack_devices={"aa:02": {"mode": "every_n", "every_n": 7}})
+    assert engine.ack_settings("AA:01") == {"mode": "window", "every_n": 4, "window": 0.5}
+    assert engine.ack_settings("aa:02") == {"mode": "every_n", "every_n": 7, "window": 0.5}
+
+
+def test_ack_can_be_turned_on_for_one_device(registry):
+    engine = AcquisitionEngine(["AA:01", "AA:02"], pipeline=None, registry=registry,
+                               ack_devices={"AA:02": {"mode": "coalesce"}})
+    assert engine.ack_settings("AA:01")["mode"] is None
+    assert engine.ack_settings("AA:02")["mode"] == "coalesce"
+
+
+def test_unknown_ack_mode_is_rejected_up_front(registry):
+    with pytest.raises(ValueError, match="AA:02"):
+        AcquisitionEngine(["AA:01", "AA:02"], pipeline=None, registry=registry,
+                          ack_devices={"AA:02": {"mode": "sometimes"}})
+
+
+def test_find_characteristic_prefers_the_known_uuid(registry):
+    assert registry.find_characteristic("AA:01", "notify", READ_CHAR_UUID) == READ_CHAR_UUID
+    registry.devices["AA:01"] = {"services": {"battery": {"2a19": ["read", "notify"]},
+                                              "uart": {READ_CHAR_UUID.upper(): ["notify"]}}}
+    assert registry.find_characteristic("AA:01", "notify", READ_CHAR_UUID) == READ_CHAR_UUID
+    registry.devices["AA:01"] = {"services": {"battery": {"2a19": ["read", "notify"]}}}
+    assert registry.find_characteristic("aa:01", "notify", READ_CHAR_UUID) == "2a19"
@@ -0,0 +1,100 @@
+import os
+import shutil
+import pandas as pd
+import pytest
+from archive import Archive
+
+
+def write_session(path, values, header="2025-03-11 14:00:00", devices=None):
+    """A BLEcomms.py-style session file; with `devices`, the readings are
+    tagged as multi_capture.py does, one device per reading in turn."""
+    lines = [f"Recording Session: {header}"]
+    for i, value in enumerate(values):
+        tag = f"[{devices[i % len(devices)]}] " if devices else ""
+        lines.append(f"2025-03-11 14:00:{i % 60:02d}.000: {tag}Data;SGPVRaw:{value};BME688:{value + 1}")
+    with open(path, "w") as file:
+        file.write("\n".join(lines) + "\n")
+
+
+@pytest.fixture
+def archive(tmp_path):
+    archive = Archive(str(tmp_path / "archive"), config_path=str(tmp_path / "dataset.json"))
+    yield archive
+    archive.close()
+
+
+@pytest.fixture
+def captures(tmp_path):
+    path = tmp_path / "captures"
+    path.mkdir()
+    return path
+
+
+def total_rows(archive):
+    return sum(session["rows"] for session in archive.sessions())
+
+
+def test_ingest_once(archive, captures):
+    write_session(captures / "reading_250311_1400.txt", [10, 20, 30])
+    summary = archive.ingest([str(captures)], label="Ethanol")
+    assert (summary["files"], summary["sessions"], summary["rows"]) == (1, 1, 3)
+    assert archive.ingest([str(captures)], label="Ethanol")["unchanged"] == 1
+
+    frame = archive.read()
+    assert frame["SGP_VRaw"].tolist() == [10, 20, 30]
+    assert frame["Label"].astype(str).tolist() == ["Ethanol"] * 3
+
+
+def test_copy_is_skipped_as_duplicate(archive, captures):
+    write_session(captures / "a.txt", [1, 2])
+    archive.ingest([str(captures / "a.txt")])
+    shutil.copy(captures / "a.txt", captures / "b.txt")
+    assert archive.ingest([str(captures / "b.txt")])["sessions"] == 0
+    assert total_rows(archive) == 2
+
+
+def test_relabelling_the_original_of_a_copy_keeps_its_readings(archive, captures):
+    write_session(captures / "a.txt", [1, 2])
+    archive.ingest([str(captures / "a.txt")])
+    shutil.copy(captures / "a.txt", captures / "b.txt")
+    archive.ingest([str(captures / "b.txt")])
+
+    summary = archive.ingest([str(captures / "a.txt")], label="Ethanol")
+    assert summary["relabelled"] == 1
+    sessions = archive.sessions()
+    assert [(os.path.basename(s["path"]), s["label"], s["rows"]) for s in sessions] == [("a.txt", "Ethanol", 2)]
+
+
+def test_editing_the_original_of_a_copy_reads_the_copy(archive, captures):
+    write_session(captures / "a.txt", [1, 2])
+    archive.ingest([str(captures / "a.txt")])
+    shutil.copy(captures / "a.txt", captures / "b.txt")
+    archive.ingest([str(captures / "b.txt")])
+
+    write_session(captures / "a.txt", [5, 6, 7])
+    summary = archive.ingest([str(captures / "a.txt")])
+    assert summary["sessions"] == 2
+    rows = {os.path.basename(s["path"]): s["rows"] for s in archive.sessions()}
+    assert rows == {"a.txt": 3, "b.txt": 2}
+    assert sorted(archive.read()["SGP_VRaw"].tolist()) == [1, 2, 5, 6, 7]
+
+
+def test_device_tags_in_the_file_win_over_device(archive, captures):
+    write_session(captures / "multi_reading_250311_140000.txt", [1, 2, 3, 4], devices=["AA", "BB"])
+    write_session(captures / "reading_250311_1400.txt", [9])
+    archive.ingest([str(captures)], device="CC")
+    assert sorted((s["device"], s["rows"]) for s in archive.sessions()) == [("AA", 2), ("BB", 2), ("CC", 1)]
+
+
+def test_label_column_wins_over_label(archive, captures):
+    pd.DataFrame({"SGP_VRaw": [1, 2, 3, 4], "Label": [0, 1, 1, None]}).to_csv(captures / "mixed.csv", index=False)
+    archive.ingest([str(captures)], label="Acetone")
+    labels = sorted((s["label"], s["rows"]) for s in archive.sessions())
+    assert labels == [("Acetone", 1), ("Clean Air", 1), ("Ethanol", 2)]
+
+
+def test_read_filters_by_time(archive, captures):
+    write_session(captures / "reading_250311_1400.txt", [1, 2, 3, 4])
+    archive.ingest([str(captures)])
+    frame = archive.read(start="2025-03-11 14:00:01", end="2025-03-11 14:00:03")
+    assert frame["SGP_VRaw"].tolist() == [2, 3]
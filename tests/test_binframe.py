@@ -0,0 +1,76 @@
+import random
+import struct
+import pytest
+import binframe
+
+
+def random_values(schema_id, rng):
+    """Values that fit every channel's struct code."""
+    return [rng.uniform(-1000, 1000) if code == "f" else rng.randint(0, 30000)
+            for _, code in binframe.SCHEMAS[schema_id]]
+
+
+@pytest.mark.parametrize("schema_id", sorted(binframe.SCHEMAS))
+def test_encode_decode_round_trip(schema_id):
+    rng = random.Random(schema_id)
+    for seq in (0, 1, 65535, 65536 + 7):
+        values = random_values(schema_id, rng)
+        frame = binframe.encode(values, seq=seq, schema_id=schema_id)
+        assert len(frame) == binframe.FRAME_SIZES[schema_id]
+        assert binframe.is_binary(frame)
+        assert binframe.frame_size(frame) == len(frame)
+
+        decoded_seq, decoded_schema, decoded = binframe.decode(frame)
+        assert decoded_seq == seq & 0xFFFF
+        assert decoded_schema == schema_id
+        for value, got, (_, code) in zip(values, decoded, binframe.SCHEMAS[schema_id]):
+            if code == "f":
+                assert got == struct.unpack("<f", struct.pack("<f", value))[0]
+            else:
+                assert got == value
+
+
+def test_encode_from_dict_fills_missing_channels():
+    name, _ = binframe.SCHEMAS[1][0]
+    _, _, values = binframe.decode(binframe.encode({name: 12}))
+    assert values[0] == 12
+    assert all(value == 0 for value in values[1:])
+
+
+def test_to_text_matches_schema_keys():
+    frame = binframe.encode(list(range(len(binframe.SCHEMAS[2]))), schema_id=2)
+    text = binframe.to_text(frame)
+    assert text.startswith("Data;BME688:0;SGPVRaw:1;")
+    assert text.count(":") == len(binframe.SCHEMAS[2])
+
+
+@pytest.mark.parametrize("position", [1, 2, 5, 10, -5, -1])
+def test_corrupted_byte_fails_crc(position):
+    frame = bytearray(binframe.encode(random_values(1, random.Random(0)), seq=3))
+    frame[position] ^= 0x40
+    frame = bytes(frame)
+    with pytest.raises(binframe.FrameError):
+        binframe.decode(frame)
+    if position > 4 or position < 0:
+        # Header intact: only the CRC can tell
+        assert not binframe.crc_ok(frame)
+
+
+def test_truncated_and_unknown_frames_are_rejected():
+    frame = binframe.encode(random_values(1, random.Random(1)))
+    with pytest.raises(binframe.FrameError):
+        binframe.decode(frame[:3])
+    with pytest.raises(binframe.FrameError):
+        binframe.decode(frame[:-1])
+    assert binframe.frame_size(frame[:3]) is None
+
+    unknown = bytearray(frame)
+    unknown[4] = 99  # Schema ID
+    assert binframe.frame_size(unknown) == -1
+    with pytest.raises(binframe.FrameError):
+        binframe.decode(bytes(unknown))
+
+
+def test_text_frames_are_not_binary():
+    assert not binframe.is_binary(b"Data;A:1")
+    assert not binframe.is_binary(b"")
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+import cascade
+
+CLASSES = ["a", "b", "c"]
+
+
+def proba(*top):
+    """Rows whose most likely class and confidence are given as (class, p)."""
+    rows = []
+    for label, p in top:
+        row = np.full(len(CLASSES), (1 - p) / (len(CLASSES) - 1))
+        row[CLASSES.index(label)] = p
+        rows.append(row)
+    return np.array(rows)
+
+
+def test_calibrate_all_correct_takes_lowest_confidence():
+    P = proba(("a", 0.9), ("b", 0.6), ("c", 0.8))
+    assert cascade.calibrate(P, ["a", "b", "c"], CLASSES, min_accuracy=1.0) == pytest.approx(0.6)
+
+
+def test_calibrate_stops_before_the_first_wrong_answer():
+    P = proba(("a", 0.9), ("b", 0.7), ("c", 0.6))
+    assert cascade.calibrate(P, ["a", "b", "a"], CLASSES, min_accuracy=1.0) == pytest.approx(0.7)
+
+
+def test_calibrate_never_splits_equal_confidences():
+    P = proba(("a", 0.9), ("b", 0.8), ("c", 0.8), ("a", 0.7))
+    # One of the two readings at 0.8 is wrong: both are left to the full forest
+    assert cascade.calibrate(P, ["a", "b", "a", "a"], CLASSES, min_accuracy=1.0) == pytest.approx(0.9)
+
+
+def test_calibrate_allows_errors_down_to_min_accuracy():
+    P = proba(("a", 0.9), ("b", 0.8), ("c", 0.7))
+    y = ["a", "a", "a"]
+    assert cascade.calibrate(P, y, CLASSES, min_accuracy=0.5) == pytest.approx(0.8)
+    assert cascade.calibrate(P, y, CLASSES, min_accuracy=0.3) == pytest.approx(0.7)
+
+
+def test_calibrate_respects_min_threshold():
+    P = proba(("a", 0.9), ("b", 0.55), ("c", 0.4))
+    y = ["a", "b", "c"]
+    assert cascade.calibrate(P, y, CLASSES, min_accuracy=1.0, min_threshold=0.5) == pytest.approx(0.55)
+    assert cascade.calibrate(P, y, CLASSES, min_accuracy=1.0, min_threshold=0.0) == pytest.approx(0.4)
+
+
+def test_calibrate_returns_none_when_unreachable():
+    P = proba(("a", 0.9), ("b", 0.8))
+    assert cascade.calibrate(P, ["b", "b"], CLASSES, min_accuracy=0.999) is None
+    assert cascade.calibrate(proba(("a", 0.45)), ["a"], CLASSES) is None  # Below MIN_THRESHOLD
+
+
+def test_first_stage_walk_matches_compiled_forest():
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import StandardScaler
+    from compiled_forest import CompiledForest, compile_pipeline
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(400, 4)).astype(np.float32)
+    y = (X[:, 0] + X[:, 1] > 0).astype(int) + (X[:, 2] > 1)
+    pipeline = make_pipeline(StandardScaler(), RandomForestClassifier(random_state=0, **cascade.FIRST_STAGE_PARAMS))
+    forest = CompiledForest(*compile_pipeline(pipeline.fit(X, y)))
+    stage = cascade.FirstStage(forest)
+    for row in rng.normal(size=(200, 4)).astype(np.float32):
+        expected = forest.predict_proba_one(row)
+        k, confidence = stage.top_one(row)
+        assert k == expected.argmax()
+        assert confidence == expected.max()
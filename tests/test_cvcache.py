@@ -0,0 +1,57 @@
+import os
+import numpy as np
+from cvcache import CVCache, hash_arrays
+from search import CachedGridSearch, make_folds
+
+
+def test_put_then_get(tmp_path):
+    cache = CVCache(str(tmp_path))
+    key = cache.key("data", {"max_depth": 3}, 42)
+    assert cache.get(key) is None
+    cache.put(key, {"score": 0.9, "fit_time": 2.0})
+    assert cache.get(key) == {"score": 0.9, "fit_time": 2.0}
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.saved_seconds == 2.0
+    assert not [name for _, _, names in os.walk(tmp_path) for name in names if name.endswith(".tmp")]
+
+
+def test_key_depends_on_data_params_and_seed():
+    key = CVCache.key("data", {"a": 1, "b": 2}, 42)
+    assert key == CVCache.key("data", {"b": 2, "a": 1}, 42)
+    assert key != CVCache.key("other", {"a": 1, "b": 2}, 42)
+    assert key != CVCache.key("data", {"a": 1, "b": 3}, 42)
+    assert key != CVCache.key("data", {"a": 1, "b": 2}, 0)
+
+
+def test_hash_arrays_sees_shape_and_dtype():
+    a = np.arange(6)
+    assert hash_arrays(a) == hash_arrays(a.copy())
+    assert hash_arrays(a) != hash_arrays(a.reshape(2, 3))
+    assert hash_arrays(a) != hash_arrays(a.astype(np.int32))
+
+
+def test_put_evicts_least_recently_used(tmp_path):
+    cache = CVCache(str(tmp_path), max_bytes=10_000)
+    keys = [cache.key("data", {"i": i}, 0) for i in range(5)]
+    for age, key in enumerate(keys):
+        cache.put(key, {"score": 0.5, "padding": "x" * 3000})
+        # Oldest first, without relying on the file system's timestamp resolution
+        os.utime(cache._path(key), (1000 + age, 1000 + age))
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[-1]) is not None
+    assert cache._scan()[1] <= cache.max_bytes
+
+
+def test_grid_search_reuses_every_fold_on_the_same_data(tmp_path):
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(120, 3))
+    y = (X[:, 0] > 0).astype(int)
+    assert [fold.digest for fold in make_folds(X, y)] == [fold.digest for fold in make_folds(X.copy(), y.copy())]
+
+    grid = {"randomforestclassifier__n_estimators": [3], "randomforestclassifier__max_depth": [2, 4]}
+    first = CachedGridSearch(grid, CVCache(str(tmp_path)), n_jobs=1, verbose=0).fit(X, y)
+    cache = CVCache(str(tmp_path))
+    second = CachedGridSearch(grid, cache, n_jobs=1, verbose=0).fit(X, y)
+    assert (cache.hits, cache.misses) == (10, 0)
+    assert second.best_params_ == first.best_params_
+    assert second.best_score_ == first.best_score_
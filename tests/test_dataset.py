@@ -0,0 +1,95 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+import dataset
+from dataset import build_dataset, compact_dtype, load_config, load_dataset, save_dataset
+
+
+@pytest.mark.parametrize("is_integer, low, high, expected", [
+    (True, 0, 100, np.int8),
+    (True, -129, 0, np.int16),
+    (True, 0, 40000, np.int32),
+    (True, 0, 2 ** 40, np.int64),
+    (False, 0, 1, np.float32),
+])
+def test_compact_dtype(is_integer, low, high, expected):
+    assert compact_dtype(is_integer, low, high) == np.dtype(expected)
+
+
+@pytest.fixture
+def config(tmp_path):
+    clean = pd.DataFrame({"A": [1, 2, None, 4, 5, 6, 7], "B": [0.5, 1.5, 2.5, 3.5, None, 5.5, 6.5]})
+    ethanol = pd.DataFrame({"A": [300, 301, 302, 303], "B": [1.0, 2.0, 3.0, 4.0]})
+    clean.to_csv(tmp_path / "clean.csv", index=False)
+    ethanol.to_csv(tmp_path / "ethanol.csv", index=False)
+    path = tmp_path / "dataset.json"
+    path.write_text(json.dumps({"classes": [
+        {"label": "0", "name": "Clean Air", "files": [str(tmp_path / "clean.csv")]},
+        {"label": 1, "name": "Ethanol", "files": [str(tmp_path / "ethanol.csv")]},
+    ]}))
+    return load_config(str(path))
+
+
+def test_load_config_makes_labels_integers(config):
+    assert [entry["label"] for entry in config["classes"]] == [0, 1]
+
+
+def test_build_dataset_streams_every_source(tmp_path, config):
+    output = str(tmp_path / "latest_dataset")
+    csv_path = str(tmp_path / "latest.csv")
+    schema = build_dataset(config, output, chunk_rows=3, csv_path=csv_path)
+    assert schema["n_rows"] == 9
+    assert [source["rows"] for source in schema["sources"]] == [5, 4]
+    assert {column["name"]: column["dtype"] for column in schema["columns"]} == {"A": "<i2", "B": "<f4"}
+
+    X, y, loaded = load_dataset(output)
+    assert loaded == schema
+    assert X["A"].tolist() == [1, 2, 4, 6, 7, 300, 301, 302, 303]
+    assert X["B"].tolist() == [0.5, 1.5, 3.5, 5.5, 6.5, 1, 2, 3, 4]
+    assert y.tolist() == [0] * 5 + [1] * 4
+    assert dataset.labels(schema) == {0: "Clean Air", 1: "Ethanol"}
+
+    combined = pd.read_csv(csv_path)
+    assert combined["A"].tolist() == X["A"].tolist()
+    assert combined["Label"].tolist() == y.tolist()
+
+
+def test_column_missing_from_a_source_drops_its_rows(tmp_path, config):
+    pd.DataFrame({"A": [9, 9]}).to_csv(tmp_path / "partial.csv", index=False)
+    config["classes"][1]["files"].append(str(tmp_path / "partial.csv"))
+    schema = build_dataset(config, str(tmp_path / "out"), chunk_rows=2)
+    X, y, _ = load_dataset(str(tmp_path / "out"))
+    assert schema["n_rows"] == len(X) == len(y) == 9
+    assert 9 not in X["A"].tolist()
+
+
+def test_save_dataset_round_trip(tmp_path):
+    X = pd.DataFrame({"A": [1.0, 2.0, 3.0], "B": [0.25, 0.5, 1e6]})
+    schema = save_dataset(X, [2, 0, 2], {0: "Clean Air", 2: "Isopropanol"}, str(tmp_path / "out"))
+    assert schema["label_dtype"] == "|i1"
+    loaded, y, _ = load_dataset(str(tmp_path / "out"), mmap=False)
+    assert loaded["A"].dtype == np.int8
+    assert np.array_equal(loaded.to_numpy(dtype=np.float64), X.to_numpy())
+    assert y.tolist() == [2, 0, 2]
+
+
+def test_rebuilding_replaces_the_dataset(tmp_path, config):
+    output = str(tmp_path / "out")
+    build_dataset(config, output)
+    config["classes"] = config["classes"][:1]
+    assert build_dataset(config, output)["n_rows"] == 5
+    assert not (tmp_path / "out.tmp").exists()
+
+
+def test_load_training_frame_falls_back_to_the_csv(tmp_path, config):
+    csv_path = str(tmp_path / "latest.csv")
+    pd.DataFrame({"A": [1, None], "Label": [0, 1]}).to_csv(csv_path, index=False)
+    frame, names = dataset.load_training_frame(str(tmp_path / "missing"), csv_path)
+    assert names is None
+    assert frame["A"].tolist() == [1]
+
+    build_dataset(config, str(tmp_path / "out"))
+    frame, names = dataset.load_training_frame(str(tmp_path / "out"), csv_path)
+    assert names == {0: "Clean Air", 1: "Ethanol"}
+    assert len(frame) == 9 and "Label" in frame
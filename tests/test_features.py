@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+from features import STATS, RollingFeatures
+
+
+def naive(X, window):
+    """Every stat over the trailing `window` readings (fewer at the start)."""
+    frame = pd.DataFrame(X)
+    rolling = frame.rolling(window, min_periods=1)
+    slopes = np.zeros_like(X)
+    for i in range(len(X)):
+        rows = X[max(0, i - window + 1):i + 1]
+        if len(rows) > 1:
+            slopes[i] = np.polyfit(np.arange(len(rows)), rows, 1)[0]
+    return {
+        "mean": rolling.mean().to_numpy(),
+        "slope": slopes,
+        "min": rolling.min().to_numpy(),
+        "max": rolling.max().to_numpy(),
+        "ewma": frame.ewm(span=window, adjust=False).mean().to_numpy(),
+    }
+
+
+@pytest.mark.parametrize("window", [1, 2, 5, 16])
+def test_matches_naive_rolling_stats(window):
+    rng = np.random.default_rng(window)
+    X = rng.normal(100, 10, size=(75, 3)).cumsum(axis=0)
+    engine = RollingFeatures(["a", "b", "c"], windows=[window], dtype=np.float64)
+    features = engine.transform(X)
+    expected = naive(X, window)
+    assert np.allclose(features[:, :3], X)
+    for i, stat in enumerate(STATS):
+        block = features[:, 3 + 3 * i:6 + 3 * i]
+        assert np.allclose(block, expected[stat], rtol=1e-9, atol=1e-6), stat
+
+
+def test_feature_names_and_layout():
+    engine = RollingFeatures(["a", "b"], windows=[3, 10], stats=["max", "mean"], include_raw=False)
+    # Stats are kept in STATS order whatever order they are given in
+    assert engine.feature_names == ["a_mean3", "b_mean3", "a_max3", "b_max3",
+                                    "a_mean10", "b_mean10", "a_max10", "b_max10"]
+    assert len(engine) == 8
+    assert engine.update([1, 2]).tolist() == [1, 2, 1, 2, 1, 2, 1, 2]
+
+
+def test_update_matches_transform():
+    X = np.random.default_rng(0).normal(size=(40, 2))
+    engine = RollingFeatures(["a", "b"], windows=[4, 9])
+    batch = engine.transform(X)
+    live = np.array([engine.update(x).copy() for x in X])
+    assert np.array_equal(batch, live)
+
+
+def test_segments_reset_the_history():
+    X = np.arange(12, dtype=float).reshape(-1, 1)
+    segments = [0] * 6 + [1] * 6
+    engine = RollingFeatures(["a"], windows=[4], stats=["mean"])
+    features = engine.transform(X, segments=segments)
+    separate = np.concatenate([engine.transform(X[:6]), engine.transform(X[6:])])
+    assert np.array_equal(features, separate)
+    assert features[6, 1] == 6  # First reading of the second segment: no history
+
+
+def test_config_round_trip():
+    engine = RollingFeatures(["a", "b"], windows=[5], stats=["slope"], include_raw=False)
+    copy = RollingFeatures.from_config(engine.config())
+    assert copy.feature_names == engine.feature_names
+    X = np.random.default_rng(1).normal(size=(20, 2))
+    assert np.array_equal(copy.transform(X), engine.transform(X))
+
+
+def test_unknown_stat():
+    with pytest.raises(ValueError, match="median"):
+        RollingFeatures(["a"], stats=["mean", "median"])
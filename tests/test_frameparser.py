@@ -0,0 +1,190 @@
+import random
+import numpy as np
+import pytest
+import binframe
+from frameparser import FrameReassembler, RecordParser
+
+
+def mixed_frames(n, seed=0):
+    """Text and binary frames as the reassembler should return them."""
+    rng = random.Random(seed)
+    frames = []
+    for seq in range(n):
+        if rng.random() < 0.3:
+            frames.append(binframe.encode([rng.randint(0, 30000) for _ in binframe.SCHEMAS[1]], seq=seq))
+        else:
+            frames.append(b"Data;" + b";".join(b"K%d:%d" % (i, rng.randint(0, 999))
+                                               for i in range(rng.randint(1, 15))))
+    return frames
+
+
+def to_stream(frames):
+    return b"".join(frame if binframe.is_binary(frame) else frame + b"\n" for frame in frames)
+
+
+def feed_all(reassembler, fragments):
+    out = []
+    for fragment in fragments:
+        out += reassembler.feed(fragment)
+    return out
+
+
+def random_split(data, max_fragment, rng):
+    fragments = []
+    pos = 0
+    while pos < len(data):
+        step = rng.randint(1, max_fragment)
+        fragments.append(data[pos:pos + step])
+        pos += step
+    return fragments
+
+
+@pytest.mark.parametrize("max_fragment", [1, 2, 3, 7, 20, 64, 244, 4096])
+def test_random_fragment_splits(max_fragment):
+    frames = mixed_frames(60)
+    stream = to_stream(frames)
+    rng = random.Random(max_fragment)
+    for _ in range(20):
+        reassembler = FrameReassembler()
+        assert feed_all(reassembler, random_split(stream, max_fragment, rng)) == frames
+        assert reassembler.frames == len(frames)
+        assert reassembler.pending() == 0
+        assert reassembler.crc_errors == 0
+
+
+def test_every_two_piece_split():
+    frames = mixed_frames(6, seed=1)
+    stream = to_stream(frames)
+    for cut in range(len(stream) + 1):
+        assert feed_all(FrameReassembler(), [stream[:cut], stream[cut:]]) == frames
+
+
+def test_incomplete_frame_stays_pending():
+    reassembler = FrameReassembler()
+    assert reassembler.feed(b"Data;A:1") == []
+    assert reassembler.feed(b";B:2") == []
+    assert reassembler.pending() == len(b"Data;A:1;B:2")
+    assert reassembler.feed(b"\nData;A") == [b"Data;A:1;B:2"]
+    assert reassembler.pending() == len(b"Data;A")
+
+
+def test_multi_byte_delimiter_split_across_fragments():
+    reassembler = FrameReassembler(delimiter=b"\r\n")
+    assert feed_all(reassembler, [b"Data;A:1\r", b"\nData;A:2\r\n"]) == [b"Data;A:1", b"Data;A:2"]
+
+
+def test_end_marker_closes_frame():
+    reassembler = FrameReassembler(end_marker=b";GMWIN:")
+    assert reassembler.feed(b"Data;A:1;GMWIN:") == [b"Data;A:1;GMWIN:"]
+    assert feed_all(reassembler, [b"Data;A:2", b";GMW", b"IN:"]) == [b"Data;A:2;GMWIN:"]
+    assert reassembler.feed(b"Data;A:3\n") == [b"Data;A:3"]
+
+
+def test_corrupt_binary_frame_resynchronises():
+    good = binframe.encode(list(range(len(binframe.SCHEMAS[1]))), seq=9)
+    corrupt = bytearray(good)
+    corrupt[-1] ^= 0xFF
+    stream = b"Data;A:1\n" + bytes(corrupt) + b"\nData;A:2\n" + good
+    for max_fragment in (1, 5, 20, len(stream)):
+        reassembler = FrameReassembler()
+        frames = feed_all(reassembler, random_split(stream, max_fragment, random.Random(max_fragment)))
+        assert reassembler.crc_errors >= 1
+        assert frames[0] == b"Data;A:1"
+        assert frames[-2:] == [b"Data;A:2", good]
+
+
+def test_overflow_drops_garbage_and_recovers():
+    reassembler = FrameReassembler(max_frame_bytes=16)
+    frames = feed_all(reassembler, [b"x" * 10] * 4 + [b"\nData;A:1\n"])
+    assert reassembler.overflows >= 1
+    assert frames[-1] == b"Data;A:1"
+    assert reassembler.pending() == 0
+
+
+COLUMNS = ["A", "B", "C"]
+
+
+@pytest.mark.parametrize("frame, written, expected, errors", [
+    (b"Data;A:1;B:2;C:3", 3, [1, 2, 3], 0),
+    (b"Data;A:1;B:2;C:3;\r\n", 3, [1, 2, 3], 0),
+    ("Data;A:1;C:3", 2, [1, 0, 3], 0),  # str input, missing key keeps the fill value
+    (b"Data;Z:9;A:1", 1, [1, 0, 0], 0),  # unknown key ignored
+    (b"Data; A : 1;B:2", 2, [1, 2, 0], 0),  # padded key
+    (b"Data;A:1;;B:2;", 2, [1, 2, 0], 0),  # empty field
+    (b"Data;A;B:2", 1, [0, 2, 0], 0),  # bare key
+    (b"Data;A:1:5;B:2", 1, [0, 2, 0], 1),  # ':' inside a value
+    (b"Data;A:x;B:2", 1, [0, 2, 0], 1),  # not a number
+    (b"Data;A:1:2;B", 0, [0, 0, 0], 1),  # as many ':' as fields, but not one per field
+    (b"Data;A;B:1:2", 0, [0, 0, 0], 1),
+    (b"Data;A:1:2;B;C:3", 1, [0, 0, 3], 1),
+    (b"Data;", 0, [0, 0, 0], 0),
+])
+def test_parse_into_malformed_frames(frame, written, expected, errors):
+    parser = RecordParser(COLUMNS)
+    row = parser.new_row()[0]
+    assert parser.parse_into(frame, row) == written
+    assert row.tolist() == expected
+    assert parser.parse_errors == errors
+
+
+@pytest.mark.parametrize("frame", [b"", b"Hello", b"A:1;B:2", b"\x00\x01", b"Recording Session: 2025"])
+def test_parse_into_rejects_non_data_frames(frame):
+    parser = RecordParser(COLUMNS)
+    assert parser.parse_into(frame, parser.new_row()[0]) == -1
+
+
+def test_parse_into_aliases():
+    parser = RecordParser(["SGP_VRaw"], aliases={"SGPVRaw": "SGP_VRaw"})
+    row = parser.new_row()[0]
+    assert parser.parse_into(b"Data;SGPVRaw:42", row) == 1
+    assert row[0] == 42
+
+
+def test_parse_into_binary_frames():
+    names = [name for name, _ in binframe.SCHEMAS[1]]
+    parser = RecordParser(names)
+    row = parser.new_row()[0]
+    values = list(range(1, len(names) + 1))
+    assert parser.parse_into(binframe.encode(values, seq=0), row) == len(names)
+    assert row.tolist() == values
+
+    assert parser.parse_into(binframe.encode(values, seq=3), row) == len(names)
+    assert parser.lost_frames == 2
+
+    corrupt = bytearray(binframe.encode(values, seq=4))
+    corrupt[-1] ^= 1
+    assert parser.parse_into(bytes(corrupt), row) == -1
+    assert parser.parse_errors == 1
+
+
+@pytest.mark.parametrize("line, written, expected", [
+    (b"Data;A:1;B:x", 2, ["1", "x", ""]),
+    (b"Data;A:1;B:2;C:3\r\n", 3, ["1", "2", "3"]),
+    (b"A:1;C:3", 2, ["1", "", "3"]),  # no prefix
+    ("Data;C: 7 ;Z:1", 1, ["", "", "7"]),
+    (b"Data;A:1:5", 1, ["1:5", "", ""]),
+    (b"Data;A:1:2;B", 1, ["1:2", "", ""]),
+    (b"Data;A;B:1:2", 1, ["", "1:2", ""]),
+    (b"nothing here", 0, ["", "", ""]),
+    (b"", 0, ["", "", ""]),
+])
+def test_split_into(line, written, expected):
+    parser = RecordParser(COLUMNS)
+    out = ["stale"] * len(COLUMNS)
+    assert parser.split_into(line, out) == written
+    assert out == expected
+
+
+def test_split_into_binary_frame():
+    parser = RecordParser(["BME688", "MiCO", "Missing"])
+    frame = binframe.encode({"BME688": 1.5, "MiCO": 7}, schema_id=2)
+    out = [""] * 3
+    assert parser.split_into(frame, out) == 2
+    assert out == ["1.5", "7", ""]
+
+
+def test_from_frame_columns_in_order():
+    parser = RecordParser.from_frame(b"B:1;A:2;B:3;C")
+    assert parser.columns == ["B", "A"]
+    assert len(parser) == 2
+    assert np.all(parser.new_batch(4) == 0)
@@ -0,0 +1,99 @@
+import copy
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+import incremental
+from incremental import Reservoir
+from sensors import FEATURE_COLUMNS, SENSOR_ALIASES
+
+FIRMWARE_KEYS = {name: key for key, name in SENSOR_ALIASES.items()}
+
+
+@pytest.fixture(scope="module")
+def model():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(100, 20, size=(300, len(FEATURE_COLUMNS))), columns=FEATURE_COLUMNS)
+    y = (X["SGP_VRaw"] > 100).astype(int) + 2 * (X["MiCO"] > 110)
+    return make_pipeline(StandardScaler(), RandomForestClassifier(n_estimators=5, random_state=0)).fit(X, y)
+
+
+def write_txt(path, n, columns=FEATURE_COLUMNS):
+    lines = ["Recording Session: 2025-03-11 14:00:00"]
+    for i in range(n):
+        fields = ";".join(f"{FIRMWARE_KEYS.get(name, name)}:{100 + i}" for name in columns)
+        lines.append(f"2025-03-11 14:00:{i:02d}.000: Data;{fields}")
+    path.write_text("\n".join(lines) + "\n")
+
+
+def test_reservoir_fills_then_samples():
+    reservoir = Reservoir.empty(10, 1)
+    rng = np.random.default_rng(0)
+    reservoir.add(np.arange(4).reshape(-1, 1), np.arange(4), rng)
+    assert reservoir.y.tolist() == [0, 1, 2, 3]
+    reservoir.add(np.arange(4, 1000).reshape(-1, 1), np.arange(4, 1000), rng)
+    assert len(reservoir.y) == 10
+    assert reservoir.seen == 1000
+    assert (reservoir.X[:, 0] == reservoir.y).all()
+    assert reservoir.y.max() >= 100  # Later rows made it in
+
+
+def test_reservoir_is_uniform():
+    counts = np.zeros(100)
+    for seed in range(300):
+        reservoir = Reservoir.empty(10, 1)
+        reservoir.add(np.zeros((100, 1)), np.arange(100), np.random.default_rng(seed))
+        counts[reservoir.y] += 1
+    # Every row has a 10% chance of being kept: 30 of 300 runs on average
+    assert counts[:50].sum() == pytest.approx(counts[50:].sum(), rel=0.2)
+
+
+def test_rescale_thresholds_keeps_decisions(model):
+    rng = np.random.default_rng(1)
+    X = pd.DataFrame(rng.normal(100, 20, size=(200, len(FEATURE_COLUMNS))), columns=FEATURE_COLUMNS)
+    before = model.predict(X)
+    updated = copy.deepcopy(model)
+    scaler = updated[0]
+    old_mean, old_scale = scaler.mean_.copy(), scaler.scale_.copy()
+    scaler.partial_fit(X + 50)
+    incremental.rescale_thresholds(updated[-1], old_mean, old_scale, scaler.mean_, scaler.scale_)
+    assert (updated.predict(X) == before).all()
+
+
+def test_read_session_reads_txt_sessions(tmp_path, model):
+    write_txt(tmp_path / "reading_250311_1400.txt", 5)
+    X, files = incremental.read_session([str(tmp_path)], model)
+    assert len(files) == 1
+    assert list(X.columns) == FEATURE_COLUMNS
+    assert X["SGP_VRaw"].tolist() == [100, 101, 102, 103, 104]
+
+
+def test_read_session_prefers_txt_to_its_csv(tmp_path, model):
+    write_txt(tmp_path / "reading_250311_1400.txt", 3)
+    pd.DataFrame({"BME688": [1]}).to_csv(tmp_path / "reading_250311_1400.csv", index=False)
+    X, _ = incremental.read_session([str(tmp_path)], model)
+    assert len(X) == 3
+
+
+def test_read_session_rejects_files_without_model_channels(tmp_path, model):
+    # CSVprocess.py output: firmware keys, no STC_Temp or GMODO
+    keys = [FIRMWARE_KEYS.get(name, name) for name in FEATURE_COLUMNS if name not in ("STC_Temp", "GMODO")]
+    pd.DataFrame([[1] * len(keys)], columns=keys).to_csv(tmp_path / "session.csv", index=False)
+    with pytest.raises(ValueError, match="GMODO, STC_Temp"):
+        incremental.read_session([str(tmp_path)], model)
+
+
+def test_resolve_label():
+    labels = {0: "Clean Air", 2: "Isopropanol"}
+    assert incremental.resolve_label("isopropanol", labels) == 2
+    assert incremental.resolve_label("0", labels) == 0
+    with pytest.raises(ValueError, match="Unknown class"):
+        incremental.resolve_label("Acetone", labels)
+
+
+def test_dataset_labels_from_config(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "dataset.json").write_text('{"classes": [{"label": 5, "name": "Toluene", "files": []}]}')
+    assert incremental.dataset_labels() == {5: "Toluene"}
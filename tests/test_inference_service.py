@@ -0,0 +1,119 @@
+import asyncio
+import numpy as np
+import pandas as pd
+import pytest
+from frameparser import RecordParser
+from inference_service import InferenceService, MicroBatcher, ServiceModel, parse_address
+
+
+class StubModel:
+    """Labels a reading "big" or "small" by its first value; 13 fails the batch."""
+
+    feature_columns = ["A", "B"]
+    cascade = None
+
+    def __init__(self):
+        self.batches = []
+
+    def new_stream(self):
+        return RecordParser(self.feature_columns), None
+
+    def predict_labels(self, X):
+        self.batches.append(len(X))
+        if (X[:, 0] == 13).any():
+            raise RuntimeError("boom")
+        return [b"big" if x > 10 else b"small" for x in X[:, 0]]
+
+
+def exchange(service, *requests):
+    """Sends each group of request lines over one connection and returns
+    every reply, waiting for a group's replies before sending the next."""
+    async def main():
+        service.start_pool()
+        server = await asyncio.start_server(service.handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        replies = []
+        for lines in requests:
+            writer.write(b"".join(lines))
+            await writer.drain()
+            for _ in lines:
+                replies.append((await asyncio.wait_for(reader.readline(), 5)).decode().strip())
+        writer.close()
+        server.close()
+        await server.wait_closed()
+        return replies
+    return asyncio.run(main())
+
+
+def test_replies_in_order_with_a_sequence_per_stream():
+    service = InferenceService(StubModel(), max_delay=0.001)
+    replies = exchange(service, [b"rig1 Data;A:1;B:2\n", b"rig2 Data;A:20;B:2\n", b"rig1 Data;A:30\r\n",
+                                 b"rig2 hello\n"])
+    assert replies == ["rig1 1 small", "rig2 1 big", "rig1 2 big", "rig2 2 Invalid"]
+    assert service.invalid == 1
+
+
+def test_over_long_lines_are_invalid_and_skipped():
+    service = InferenceService(StubModel(), max_delay=0.001)
+    replies = exchange(service, [b"rig1 Data;A:1;B:" + b"9" * 200000 + b"\n",
+                                 b"rig2 Data;A:" + b"7" * 70000 + b"\n",
+                                 b"rig1 Data;A:3;B:2\n"])
+    assert replies == ["rig1 1 Invalid", "rig2 1 Invalid", "rig1 2 small"]
+
+
+def test_failed_batch_replies_error_and_carries_on():
+    model = StubModel()
+    service = InferenceService(model, max_delay=0.001)
+    replies = exchange(service, [b"rig1 Data;A:13\n"], [b"rig1 Data;A:20\n"])
+    assert replies == ["rig1 1 Error", "rig1 2 big"]
+    assert service.errors == 1
+
+
+def test_batcher_flushes_when_full_or_at_the_deadline():
+    model = StubModel()
+
+    async def main():
+        batcher = MicroBatcher(2, model.predict_labels, max_batch=4, max_delay=0.01)
+        futures = [batcher.submit([i, 0]) for i in range(10)]
+        assert model.batches == [4, 4]
+        labels = await asyncio.gather(*futures)
+        return batcher, labels
+    batcher, labels = asyncio.run(main())
+    assert model.batches == [4, 4, 2]
+    assert labels == [b"small"] * 10
+    assert (batcher.readings, batcher.batches, batcher.max_batch_seen) == (10, 3, 4)
+
+
+@pytest.mark.parametrize("address, expected", [
+    ("127.0.0.1:8765", ("tcp", ("127.0.0.1", 8765))),
+    (":9000", ("tcp", ("127.0.0.1", 9000))),
+    ("/tmp/worad.sock", ("unix", "/tmp/worad.sock")),
+])
+def test_parse_address(address, expected):
+    assert parse_address(address) == expected
+
+
+def test_compiled_model_labels_match_the_pipeline(tmp_path):
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import StandardScaler
+    from compiled_forest import export_pipeline
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(300, 3)), columns=["SGP_VRaw", "MiCO", "GMVOC"])
+    y = (X["SGP_VRaw"] > 0).astype(int) + (X["MiCO"] > 1)
+    pipeline = make_pipeline(StandardScaler(), RandomForestClassifier(n_estimators=5, random_state=0)).fit(X, y)
+    labels = {0: "Clean Air", 1: "Ethanol", 2: "Acetone"}
+    export_pipeline(pipeline, str(tmp_path / "model"), feature_names=list(X.columns), labels=labels,
+                    aliases={"SGPVRaw": "SGP_VRaw"})
+
+    model = ServiceModel(str(tmp_path / "model"), cascade=False)
+    rows = rng.normal(size=(50, 3)).astype(np.float32)
+    expected = [labels[label].encode() for label in pipeline.predict(pd.DataFrame(rows, columns=X.columns))]
+    assert model.predict_labels(rows) == expected
+
+    parser, rolling = model.new_stream()
+    assert rolling is None
+    row = parser.new_row()
+    assert parser.parse_into(b"Data;SGPVRaw:1.5;MiCO:2;GMVOC:0", row[0]) == 3
+    assert row[0].tolist() == [1.5, 2, 0]
@@ -0,0 +1,95 @@
+import random
+import urllib.request
+import pytest
+import metrics
+from metrics import N_BUCKETS, Histogram, Metrics, bucket_bound, bucket_index
+
+DURATIONS = list(range(0, 300)) + [random.Random(0).randrange(1, 2 ** 42) for _ in range(3000)]
+
+
+def test_inlined_observe_matches_bucket_index():
+    for ns in DURATIONS:
+        histogram = Histogram()
+        histogram.observe(ns)
+        assert histogram.counts.index(1) == bucket_index(ns)
+
+
+def test_buckets_bound_their_durations():
+    for ns in DURATIONS:
+        index = bucket_index(ns)
+        if index == N_BUCKETS - 1:
+            continue  # Overflow bucket
+        assert ns < bucket_bound(index)
+        assert index == 0 or bucket_bound(index - 1) <= ns
+
+
+def test_buckets_are_at_most_a_quarter_wide():
+    for index in range(8, N_BUCKETS):
+        low, high = bucket_bound(index - 1), bucket_bound(index)
+        assert low < high <= low * 1.25
+
+
+def test_quantiles_within_a_bucket():
+    histogram = Histogram()
+    values = [random.Random(1).randrange(1000, 10 ** 7) for _ in range(10000)]
+    for ns in values:
+        histogram.observe(ns)
+    values.sort()
+    for q in (0.5, 0.9, 0.99):
+        exact = values[int(q * len(values)) - 1]
+        assert exact <= histogram.quantile(q) <= exact * 1.25
+    assert histogram.quantile(1.0) == histogram.max == values[-1]
+    assert (histogram.count, histogram.total) == (len(values), sum(values))
+
+
+def test_render_is_cumulative_prometheus_text():
+    registry = Metrics("test")
+    for ns in (100, 100, 5000):
+        registry.observe("parse", ns)
+    registry.count("frames", 3)
+    registry.gauge("queue", 7)
+    text = registry.render()
+    assert "worad_test_frames_total 3\n" in text
+    assert "worad_test_queue 7\n" in text
+    buckets = [line for line in text.splitlines() if line.startswith("worad_test_stage_seconds_bucket")]
+    assert [int(line.rsplit(" ", 1)[1]) for line in buckets] == [2, 3, 3]
+    assert buckets[-1].startswith('worad_test_stage_seconds_bucket{stage="parse",le="+Inf"}')
+    assert 'worad_test_stage_seconds_count{stage="parse"} 3' in text
+
+
+def test_lap_chains_stages():
+    registry = Metrics("test")
+    start = registry.now()
+    t = registry.lap("parse", start)
+    registry.lap("write", t)
+    assert registry.histograms["parse"].count == registry.histograms["write"].count == 1
+    assert "parse" in registry.summary() and "write" in registry.summary()
+
+
+def test_disabled_metrics_do_nothing():
+    stages = metrics.setup("test", enabled=False)
+    assert stages is metrics.get()
+    assert not stages.enabled
+    assert stages.lap("parse", stages.now()) == 0
+    stages.count("frames")
+    assert stages.summary() == ""
+
+
+def test_export_to_file_and_http(tmp_path):
+    path = str(tmp_path / "metrics_{name}.prom")
+    stages = metrics.setup("test", path=path, port=0, interval=60)
+    try:
+        stages.count("frames", 2)
+        port = stages._exporter.server.server_address[1]
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+            assert "worad_test_frames_total 2" in response.read().decode()
+    finally:
+        stages.close()
+        metrics.setup("test", enabled=False)
+    # A last snapshot is written on close
+    assert "worad_test_frames_total 2" in (tmp_path / "metrics_test.prom").read_text()
+
+
+@pytest.mark.parametrize("ns, text", [(500, "500 ns"), (1500, "1.5 us"), (2.5e6, "2.5 ms"), (3e9, "3.00 s")])
+def test_format_ns(ns, text):
+    assert metrics.format_ns(ns) == text
@@ -0,0 +1,73 @@
+import os
+import numpy as np
+import pytest
+from openset import OpenSetScorer
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(0)
+    centres = np.array([[0, 0, 0], [50, 0, 500], [0, 80, 1000]], dtype=float)
+    scales = np.array([1, 5, 100], dtype=float)
+    X = np.concatenate([centre + rng.normal(size=(400, 3)) * scales for centre in centres])
+    y = np.repeat([3, 5, 7], 400)
+    return X, y
+
+
+def test_distances_match_mahalanobis(data):
+    X, y = data
+    scorer = OpenSetScorer.fit(X, y, shrinkage=0.0)
+    rows = X[::97]
+    for k, label in enumerate(scorer.classes):
+        members = X[y == label]
+        inverse = np.linalg.inv(np.cov(members, rowvar=False))
+        diff = rows - members.mean(axis=0)
+        expected = np.einsum("nd,de,ne->n", diff, inverse, diff)
+        assert np.allclose(scorer.distances(rows)[:, k], expected, rtol=1e-6)
+
+
+def test_training_readings_are_known_outliers_are_not(data):
+    X, y = data
+    scorer = OpenSetScorer.fit(X, y, quantile=0.99)
+    assert scorer.is_unknown(X).mean() <= 0.02
+    outliers = np.array([[500, 500, 500], [0, 0, 5000], [-50, 40, 250]])
+    assert scorer.is_unknown(outliers).all()
+
+
+def test_each_class_threshold_is_its_quantile(data):
+    X, y = data
+    scorer = OpenSetScorer.fit(X, y, quantile=0.9)
+    distances = scorer.distances(X)
+    for k, label in enumerate(scorer.classes):
+        assert np.mean(distances[y == label, k] <= scorer.thresholds[k]) == pytest.approx(0.9, abs=0.01)
+
+
+def test_score_one_matches_score(data):
+    X, y = data
+    scorer = OpenSetScorer.fit(X, y)
+    rows = X[::50]
+    assert np.allclose([scorer.score_one(row) for row in rows], scorer.score(rows))
+    assert scorer.is_unknown_one(np.array([1e4, 1e4, 1e4]))
+
+
+def test_constant_channel_is_usable():
+    rng = np.random.default_rng(1)
+    X = np.column_stack([rng.normal(size=200), np.full(200, 7.0)])
+    scorer = OpenSetScorer.fit(X, np.zeros(200, dtype=int))
+    assert np.isfinite(scorer.score(X)).all()
+    assert scorer.is_unknown_one(np.array([0.0, 9.0]))
+
+
+def test_save_load_remove(tmp_path, data):
+    X, y = data
+    scorer = OpenSetScorer.fit(X, y, quantile=0.98)
+    path = str(tmp_path / "model")
+    scorer.save(path)
+    loaded = OpenSetScorer.load(path)
+    assert loaded.meta["quantile"] == 0.98
+    assert loaded.classes.tolist() == [3, 5, 7]
+    assert np.array_equal(loaded.score(X[:20]), scorer.score(X[:20]))
+
+    OpenSetScorer.remove(path)
+    assert OpenSetScorer.load(path) is None
+    assert os.listdir(path) == []
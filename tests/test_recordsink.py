@@ -0,0 +1,83 @@
+import csv
+import os
+from recordsink import PARTIAL_SUFFIX, CSVRecordSink, recover_partial
+
+
+def read_rows(path):
+    with open(path, newline="", encoding="utf-8") as file:
+        return list(csv.reader(file))
+
+
+def test_rows_are_appended_and_renamed_on_close(tmp_path):
+    path = str(tmp_path / "out.csv")
+    sink = CSVRecordSink(path, fieldnames=["A", "B"], flush_every=2, fsync=False)
+    assert sink.writing_path is None
+    assert sink.write({"A": 1, "B": 2}) is False
+    assert sink.write({"A": 3, "Z": 9}) is True
+    assert sink.writing_path == path + PARTIAL_SUFFIX
+    assert os.path.exists(path + PARTIAL_SUFFIX) and not os.path.exists(path)
+    sink.write_row(["5", "6"])
+    sink.close()
+    assert not os.path.exists(path + PARTIAL_SUFFIX)
+    assert read_rows(path) == [["A", "B"], ["1", "2"], ["3", ""], ["5", "6"]]
+    assert (sink.rows_written, sink.dropped_fields) == (3, 1)
+
+
+def test_fieldnames_from_first_record(tmp_path):
+    path = str(tmp_path / "out.csv")
+    with CSVRecordSink(path, fsync=False) as sink:
+        sink.write({"B": 1, "A": 2})
+        sink.write({"A": 3})
+    assert read_rows(path) == [["B", "A"], ["1", "2"], ["", "3"]]
+
+
+def test_rotation_counts_bytes_on_disk(tmp_path):
+    path = str(tmp_path / "out.csv")
+    # 2-byte characters: rotating on characters would let each file grow past the limit
+    sink = CSVRecordSink(path, fieldnames=["Name"], flush_every=1, rotate_bytes=40, fsync=False)
+    for _ in range(12):
+        sink.write({"Name": "éééééééé"})
+    sink.close()
+    assert len(sink.files_written) > 1
+    rows = []
+    for segment in sink.files_written:
+        assert os.path.basename(segment).startswith("out_")
+        # A file only rotates once it has reached the limit, so it overshoots by at most one flush
+        assert os.path.getsize(segment) < 40 + 20
+        content = read_rows(segment)
+        assert content[0] == ["Name"]
+        rows += content[1:]
+    assert len(rows) == 12
+
+
+def test_recover_partial_drops_the_cut_off_row(tmp_path):
+    path = str(tmp_path / "out.csv")
+    assert recover_partial(path) is None
+    with open(path + PARTIAL_SUFFIX, "wb") as file:
+        file.write(b"A,B\r\n1,2\r\n3,")
+    assert recover_partial(path) == path
+    assert read_rows(path) == [["A", "B"], ["1", "2"]]
+
+
+def test_recover_partial_keeps_an_existing_file(tmp_path):
+    path = str(tmp_path / "out.csv")
+    with open(path, "w") as file:
+        file.write("A\n1\n")
+    with open(path + PARTIAL_SUFFIX, "w") as file:
+        file.write("A\n2\n")
+    recovered = recover_partial(path)
+    assert recovered != path and "_recovered_" in recovered
+    assert read_rows(path) == [["A"], ["1"]]
+    assert read_rows(recovered) == [["A"], ["2"]]
+
+
+def test_a_new_sink_recovers_what_a_crash_left(tmp_path):
+    path = str(tmp_path / "out.csv")
+    crashed = CSVRecordSink(path, fieldnames=["A"], flush_every=1, fsync=False)
+    crashed.write({"A": 1})
+    crashed._file.close()  # Never closed properly
+    with CSVRecordSink(path, fieldnames=["A"], flush_every=1, fsync=False) as sink:
+        sink.write({"A": 2})
+    recovered = [name for name in os.listdir(tmp_path) if "_recovered_" in name]
+    assert read_rows(tmp_path / recovered[0]) == [["A"], ["1"]]
+    assert read_rows(path) == [["A"], ["2"]]